@@ -15,7 +15,7 @@ _set_version()
 from sqlito.database import Database
 from sqlito.table import Table
 from sqlito.query import Query
-from sqlito.builders import TableBuilder, RowBuilder
+from sqlito.builders import TableBuilder, RowBuilder, IndexBuilder
 from sqlito.utils import *
 from sqlito.exceptions import SQLitoError, SQLitoTypeError, SQLitoValueError
 
@@ -25,6 +25,8 @@ __all__ = [
     "Query",
     "TableBuilder",
     "RowBuilder",
+    "IndexBuilder",
+    "sqlite_to_db",
     "SQLitoError",
     "SQLitoTypeError",
     "SQLitoValueError"
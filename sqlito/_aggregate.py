@@ -0,0 +1,238 @@
+class Accumulator:
+    """
+    Base class for the streaming state of one aggregate function. Values are
+    fed one at a time with `update`, never NULL, and `result` returns the
+    value of the aggregate so far.
+    """
+    # Result of the aggregate when it saw no (non-NULL) values
+    empty = None
+
+    def __init__(self):
+        self.count = 0
+
+    def update(self, value):
+        raise NotImplementedError(f"{type(self).__name__}.update() not implemented")
+
+    def result(self):
+        raise NotImplementedError(f"{type(self).__name__}.result() not implemented")
+
+    def merge(self, other):
+        # Adds the values other saw after those this one did (e.g., from
+        # the next morsel of a parallel scan)
+        raise NotImplementedError(f"{type(self).__name__}.merge() not implemented")
+
+class CountAccumulator(Accumulator):
+    empty = 0
+
+    def update(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+    def merge(self, other):
+        self.count += other.count
+
+class SumAccumulator(Accumulator):
+    empty = 0
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0
+
+    def update(self, value):
+        self.count += 1
+        self.total = self.total + value
+
+    def result(self):
+        return self.total if self.count else self.empty
+
+    def merge(self, other):
+        if other.count:
+            self.total = self.total + other.total if self.count else other.total
+            self.count += other.count
+
+class AvgAccumulator(SumAccumulator):
+    empty = None
+
+    def result(self):
+        return self.total / self.count if self.count else self.empty
+
+class MaxAccumulator(Accumulator):
+    def __init__(self):
+        super().__init__()
+        self.value = None
+
+    def update(self, value):
+        # Keeps the first of equal maximums, like max()
+        if not self.count or value > self.value:
+            self.value = value
+        self.count += 1
+
+    def result(self):
+        return self.value
+
+    def merge(self, other):
+        if other.count:
+            self.update(other.value)
+            self.count += other.count - 1
+
+class MinAccumulator(Accumulator):
+    def __init__(self):
+        super().__init__()
+        self.value = None
+
+    def update(self, value):
+        # Keeps the first of equal minimums, like min()
+        if not self.count or value < self.value:
+            self.value = value
+        self.count += 1
+
+    def result(self):
+        return self.value
+
+    def merge(self, other):
+        if other.count:
+            self.update(other.value)
+            self.count += other.count - 1
+
+ACCUMULATORS = {
+    "COUNT": CountAccumulator,
+    "SUM": SumAccumulator,
+    "AVG": AvgAccumulator,
+    "MAX": MaxAccumulator,
+    "MIN": MinAccumulator,
+}
+
+def parse_aggregate(aggregate_call):
+    """
+    Splits an aggregate call such as "SUM(salary)" into its function and
+    field names.
+
+    :param aggregate_call: The aggregate call.
+    :type aggregate_call: str
+
+    :return: The aggregate function name and the field name.
+    :rtype: tuple[str, str]
+
+    :raises ValueError: If the aggregate function is unknown, or is not
+        COUNT but applied to *.
+    """
+    # Find name of function by finding first parenthesis
+    aggregate_name = aggregate_call[:aggregate_call.find('(')]
+    # Find name of field in between parenthesis
+    field_name = aggregate_call[aggregate_call.find('(')+1:aggregate_call.find(')')]
+
+    if aggregate_name not in ACCUMULATORS:
+        raise ValueError(f"Invalid aggregate function: {aggregate_name}")
+    if field_name == "*" and aggregate_name != "COUNT":
+        raise ValueError(f"Invalid aggregate function: {aggregate_call}. Only COUNT accepts *.")
+    return aggregate_name, field_name
+
+class Aggregation:
+    """
+    Evaluates a set of aggregate calls together, updating one accumulator per
+    call in a single pass over the rows.
+    """
+    def __init__(self, aggregate_calls, getter_for):
+        """
+        Parses the aggregate calls once and resolves the fields they read.
+
+        :param aggregate_calls: Aggregate calls, e.g. ["COUNT(*)", "SUM(x)"].
+        :type aggregate_calls: list[str]
+        :param getter_for: Maps a field name to a callable returning that
+            field's value for a row. Raises ValueError for unknown fields.
+        :type getter_for: callable
+
+        :raises ValueError: If an aggregate function or field is invalid.
+        """
+        self.calls = list(aggregate_calls)
+        self.specs = [parse_aggregate(call) for call in self.calls]
+
+        # Group the aggregates by field, so that every field is read once per
+        # row no matter how many aggregates use it. `*` stands for the row.
+        self.fields = {}
+        for i, (_, field_name) in enumerate(self.specs):
+            self.fields.setdefault(field_name, []).append(i)
+        self.getters = [
+            (lambda row: row) if field_name == "*" else getter_for(field_name)
+            for field_name in self.fields
+        ]
+
+    def new_state(self):
+        return [ACCUMULATORS[name]() for name, _ in self.specs]
+
+    def updater(self, state):
+        """
+        Returns a callable that feeds one row to the accumulators in state.
+
+        :param state: Accumulators, as returned by `new_state`.
+        :type state: list[Accumulator]
+
+        :return: A callable taking a row.
+        :rtype: callable
+        """
+        updates = [
+            (get, [(self.specs[i][0], state[i].update) for i in indexes])
+            for get, indexes in zip(self.getters, self.fields.values())
+        ]
+
+        def update(row):
+            for get, field_updates in updates:
+                value = get(row)
+                if value is None:
+                    continue
+                for aggregate_name, update_value in field_updates:
+                    try:
+                        update_value(value)
+                    except Exception as e:
+                        raise ValueError(f"Failed to apply aggregate function: {aggregate_name}. Error: {e}")
+        return update
+
+    def merge(self, state, other):
+        """
+        Merges the accumulators of other, fed the rows following those of
+        state, into state.
+        """
+        for accumulator, partial in zip(state, other):
+            accumulator.merge(partial)
+
+    def accumulate(self, data):
+        """
+        Feeds rows to a new state.
+
+        :return: The state, and the number of rows fed.
+        :rtype: tuple[list[Accumulator], int]
+        """
+        state = self.new_state()
+        update = self.updater(state)
+
+        rows = 0
+        for row in data:
+            rows += 1
+            update(row)
+        return state, rows
+
+    def results(self, state):
+        return {call: accumulator.result() for call, accumulator in zip(self.calls, state)}
+
+    def run(self, data):
+        """
+        Computes every aggregate over data in one pass.
+
+        :param data: Rows to aggregate.
+        :type data: iterable
+
+        :return: The value of each aggregate call, keyed by the call.
+        :rtype: dict
+
+        :raises ValueError: If there are no rows, or an aggregate fails.
+        """
+        state, rows = self.accumulate(data)
+        return self.finish(state, rows)
+
+    def finish(self, state, rows):
+        # The results of state, once fed every row
+        if not rows:
+            raise ValueError(f"No values found for field: {self.specs[0][1]}")
+        return self.results(state)
@@ -0,0 +1,68 @@
+import asyncio
+import itertools
+
+# Rows `Query.iter_async` pulls through the query in the executor at a time,
+# between which the event loop gets the rows (and serves other tasks)
+CHUNK_SIZE = 1_000
+
+async def run_coalesced(in_flight, key, function, executor=None):
+    """
+    Runs function in an executor and awaits its result. While it runs, runs
+    with the same key on the same event loop await that run instead of
+    starting their own.
+
+    :param in_flight: The runs in progress, keyed by event loop and key.
+    :type in_flight: dict
+    :param key: Identifies what function computes, or None to not share the
+        run.
+    :type key: hashable
+    :param function: Callable taking no arguments.
+    :type function: callable
+    :param executor: Executor to run function in. Defaults to the event
+        loop's default executor.
+    :type executor: concurrent.futures.Executor, optional
+
+    :return: The result of function.
+    """
+    loop = asyncio.get_running_loop()
+    if key is None:
+        return await loop.run_in_executor(executor, function)
+
+    key = (loop, key)
+    future = in_flight.get(key)
+    if future is None:
+        future = in_flight[key] = loop.run_in_executor(executor, function)
+        def done(future):
+            if in_flight.get(key) is future:
+                del in_flight[key]
+        future.add_done_callback(done)
+    # A waiter being cancelled must not cancel the run the others await
+    return await asyncio.shield(future)
+
+async def iter_async(make_rows, chunk_size=CHUNK_SIZE, executor=None):
+    """
+    Asynchronously iterates over rows produced in an executor: the iterator
+    is made there, and chunks of chunk_size rows are pulled from it there,
+    so the event loop only ever hands rows on.
+
+    :param make_rows: Callable taking no arguments and returning an iterator.
+    :type make_rows: callable
+    :param chunk_size: Rows pulled at a time.
+    :type chunk_size: int, optional
+    :param executor: Executor to run in. Defaults to the event loop's
+        default executor.
+    :type executor: concurrent.futures.Executor, optional
+    """
+    loop = asyncio.get_running_loop()
+    rows = await loop.run_in_executor(executor, make_rows)
+    take = lambda: list(itertools.islice(rows, chunk_size))
+    try:
+        while chunk := await loop.run_in_executor(executor, take):
+            for row in chunk:
+                yield row
+    finally:
+        # Stopped early: release what the query holds (e.g., parallel workers)
+        # off the event loop too
+        close = getattr(rows, "close", None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
@@ -0,0 +1,190 @@
+import itertools
+import operator
+from array import array
+
+# Compact array typecodes for the column types that fit in machine words.
+# Every other type (TEXT, BLOB, or unknown) is stored as a plain object list.
+ARRAY_TYPECODES = {
+    "int": "q",
+    "float": "d",
+}
+
+# Translates NULL flag bytes to the digits of a binary string
+NULL_FLAG_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+class Column:
+    """
+    Base class for the storage of a single column of a Table.
+
+    Values are addressed by row position. Subclasses decide how the values are
+    laid out in memory.
+    """
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, position):
+        return self.values[position]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def append(self, value):
+        raise NotImplementedError(f"{type(self).__name__}.append() not implemented")
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def getter(self):
+        """
+        Returns the fastest available callable mapping a row position to its
+        value. Query execution should fetch this once per scan instead of
+        indexing the column for every row.
+
+        :return: A callable taking a row position and returning its value.
+        :rtype: callable
+        """
+        return self.values.__getitem__
+
+class ObjectColumn(Column):
+    """Column backed by a list of Python objects. Used for TEXT and BLOB."""
+    def __init__(self, values=()):
+        self.values = list(values)
+
+    def append(self, value):
+        self.values.append(value)
+
+    def extend(self, values):
+        self.values.extend(values)
+
+class ArrayColumn(Column):
+    """
+    Column backed by an `array.array` for INTEGER and REAL values, with NULLs
+    tracked in a separate bitmap.
+
+    The bitmap is only allocated once the first NULL is stored. If a value
+    does not fit the array (e.g. an int wider than 64 bits, or a value of a
+    different type), the column degrades to a plain object list so that no
+    value is ever silently altered.
+    """
+    def __init__(self, typecode, values=()):
+        self.typecode = typecode
+        self.pytype = float if typecode == "d" else int
+        self.values = array(typecode)
+        self.nulls = None
+        self.extend(values)
+
+    def is_null(self, position):
+        if self.nulls is None:
+            return False
+        byte = position >> 3
+        return byte < len(self.nulls) and bool(self.nulls[byte] >> (position & 7) & 1)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self.values)
+        if self.is_null(position):
+            return None
+        return self.values[position]
+
+    def __iter__(self):
+        if self.nulls is None:
+            return iter(self.values)
+        return (self[position] for position in range(len(self.values)))
+
+    def append(self, value):
+        if not isinstance(self.values, array):
+            self.values.append(value)
+        elif value is None:
+            self.__set_null(len(self.values))
+            self.values.append(0)
+        elif type(value) is not self.pytype:
+            self.__degrade()
+            self.values.append(value)
+        else:
+            try:
+                self.values.append(value)
+            except OverflowError:
+                self.__degrade()
+                self.values.append(value)
+
+    def extend(self, values):
+        values = values if isinstance(values, list) else list(values)
+        value_types = set(map(type, values))
+        if isinstance(self.values, array) and value_types and value_types <= {self.pytype, type(None)}:
+            # No other types: convert the whole batch at once, before touching
+            # the column in case a value overflows, then mark its NULLs
+            has_nulls = type(None) in value_types
+            try:
+                batch = array(self.typecode, [0 if value is None else value for value in values] if has_nulls else values)
+            except OverflowError:
+                batch = None
+            if batch is not None:
+                start = len(self.values)
+                if has_nulls:
+                    self.__set_nulls(start, bytes(map(operator.is_, values, itertools.repeat(None))))
+                self.values.extend(batch)
+                return
+        for value in values:
+            self.append(value)
+
+    def getter(self):
+        if self.nulls is None:
+            return self.values.__getitem__
+
+        values, nulls = self.values, self.nulls
+        def get(position):
+            byte = position >> 3
+            if byte < len(nulls) and nulls[byte] >> (position & 7) & 1:
+                return None
+            return values[position]
+        return get
+
+    def __set_null(self, position):
+        if self.nulls is None:
+            self.nulls = bytearray()
+        byte = position >> 3
+        if byte >= len(self.nulls):
+            self.nulls.extend(bytes(byte - len(self.nulls) + 1))
+        self.nulls[byte] |= 1 << (position & 7)
+
+    def __set_nulls(self, start, flags):
+        # Marks the NULLs of a batch starting at position start, given one
+        # flag byte (0 or 1) per value. The flags are packed into bits all at
+        # once, through a binary string, rather than set one at a time.
+        offset, base = start & 7, start >> 3
+        bits = int(flags.translate(NULL_FLAG_DIGITS)[::-1], 2) << offset
+        packed = bytearray(bits.to_bytes((len(flags) + offset + 7) >> 3, "little"))
+
+        if self.nulls is None:
+            self.nulls = bytearray()
+        if len(self.nulls) < base:
+            self.nulls.extend(bytes(base - len(self.nulls)))
+        if len(self.nulls) > base:
+            # Earlier rows may have NULLs in the byte the batch starts in
+            packed[0] |= self.nulls[base]
+        # A single assignment, so concurrent readers never see the bits of
+        # the earlier rows in that byte missing
+        self.nulls[base:] = packed
+
+    def __degrade(self):
+        # Fall back to an object list, materializing NULLs from the bitmap
+        self.values = list(self)
+        self.nulls = None
+
+def make_column(type_name, values=()):
+    """
+    Creates the storage container for a column of the given type.
+
+    :param type_name: Python type name recorded in `Table.types` (e.g. "int").
+    :type type_name: str or None
+    :param values: Initial values of the column.
+    :type values: iterable
+
+    :return: The column container.
+    :rtype: Column
+    """
+    typecode = ARRAY_TYPECODES.get(type_name)
+    if typecode is None:
+        return ObjectColumn(values)
+    return ArrayColumn(typecode, values)
@@ -0,0 +1,211 @@
+import csv
+import itertools
+
+from sqlito.exceptions import SQLitoTypeError
+from sqlito.types import INTEGER, NONE, NUMERIC, REAL, TEXT
+from sqlito._storageclass import IntegerStorage, NullStorage, RealStorage, TextStorage
+
+# Rows read (or written) at a time
+CHUNK_SIZE = 10_000
+
+# Rows each column's type is inferred from
+SAMPLE_SIZE = 1_000
+
+# Storage class of the values of each type `NUMERIC.infer_type` infers
+STORAGE_CLASSES = {
+    INTEGER: IntegerStorage,
+    REAL: RealStorage,
+    TEXT: TextStorage,
+    NONE: NullStorage,
+}
+
+# Column type (as recorded in `Table.types`) of each storage class
+COLUMN_TYPES = {
+    IntegerStorage: int.__name__,
+    RealStorage: float.__name__,
+    TextStorage: str.__name__,
+}
+
+# Builtins that convert the well-formed values of a storage class exactly
+# like its `coerce` would, but without its checks
+FAST_CONVERTERS = {
+    IntegerStorage: int,
+    RealStorage: float,
+}
+
+
+def infer_storage(values):
+    """
+    Infers the storage class of a column from a sample of its values, as the
+    narrowest one holding every value: INTEGER, then REAL, then TEXT. NULLs
+    don't count, and a column of nothing but NULLs is TEXT.
+
+    :param values: Sample of the column's values, as read from the file.
+    :type values: list[str]
+
+    :return: IntegerStorage, RealStorage or TextStorage.
+    :rtype: type
+    """
+    storages = {STORAGE_CLASSES[NUMERIC.infer_type(value)] for value in values} - {NullStorage}
+    for storage in (TextStorage, RealStorage):
+        if storage in storages:
+            return storage
+    return IntegerStorage if storages else TextStorage
+
+def spellings(word):
+    # Every capitalization of a word, e.g. "null", "Null" and "NULL"
+    return {"".join(chars) for chars in itertools.product(*zip(word.lower(), word.upper()))}
+
+# Every spelling of the NULL tokens `NullStorage.coerce` accepts, other than
+# those padded with whitespace
+NULL_TOKENS = frozenset(spellings("null") | spellings("none") | {""})
+
+# Tokens INTEGER columns also accept, as `NUMERIC.infer_type` does
+BOOLEANS = {"true": 1, "false": 0}
+
+# Values of the tokens each storage class converts without a builtin
+TOKENS = {
+    IntegerStorage: dict.fromkeys(NULL_TOKENS) | {
+        spelling: value for word, value in BOOLEANS.items() for spelling in spellings(word)
+    },
+    RealStorage: dict.fromkeys(NULL_TOKENS),
+}
+
+def is_null(value):
+    return value in NULL_TOKENS or value.strip().lower() in ("null", "none", "")
+
+def coerce_column(storage, values):
+    """
+    Converts a batch of values of a column, as read from the file, to its
+    storage class. NULL tokens (as `NullStorage.coerce` accepts them) become
+    None. The whole batch is first converted with a builtin, and only
+    converted value by value if that fails, e.g. because of a NULL.
+
+    :param storage: Storage class of the column.
+    :type storage: type
+    :param values: The values.
+    :type values: list[str]
+
+    :return: The converted values.
+    :rtype: list
+
+    :raises SQLitoTypeError: If a value can't be coerced to the storage class.
+    """
+    if storage is TextStorage:
+        # Only values padded with whitespace need more than a set lookup
+        return [
+            None if value in NULL_TOKENS or (value[0].isspace() or value[-1].isspace()) and is_null(value) else value
+            for value in values
+        ]
+
+    convert = FAST_CONVERTERS[storage]
+    try:
+        return list(map(convert, values))
+    except ValueError:
+        pass
+    try:
+        # The usual reasons the builtin fails are NULLs and booleans. Those
+        # padded with whitespace still fail it, and are left to the exact
+        # path below.
+        tokens = TOKENS[storage]
+        return [tokens[value] if value in tokens else convert(value) for value in values]
+    except ValueError:
+        pass
+
+    def coerce(value):
+        if is_null(value):
+            return NullStorage.coerce(value)
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+        if storage is IntegerStorage and value.strip().lower() in BOOLEANS:
+            return BOOLEANS[value.strip().lower()]
+        return storage.coerce(value)
+    return list(map(coerce, values))
+
+def read_csv(path, types=None, delimiter=",", encoding="utf-8", sample_size=SAMPLE_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Reads a CSV file with a header row a chunk of rows at a time.
+
+    :param path: Path of the file.
+    :type path: str
+    :param types: SQL type of some or all columns, e.g. {"id": "INTEGER"}.
+        The others are inferred from the first sample_size rows.
+    :type types: dict, optional
+
+    :return: The column type names, keyed by column, and an iterator over
+        the chunks, each a dict of converted column values.
+    :rtype: tuple[dict, iterator[dict]]
+
+    :raises ValueError: If the file has no header, or a row has the wrong
+        number of fields.
+    :raises SQLitoTypeError: If a value doesn't fit the type of its column.
+    """
+    file = open(path, newline="", encoding=encoding)
+    try:
+        reader = csv.reader(file, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"{path} has no header row.")
+        sample = list(itertools.islice(reader, sample_size))
+    except BaseException:
+        file.close()
+        raise
+
+    sql_types = {"INTEGER": IntegerStorage, "REAL": RealStorage, "TEXT": TextStorage}
+    storages = {}
+    for i, col in enumerate(header):
+        if types and col in types:
+            storages[col] = sql_types[types[col].strip().upper()]
+        else:
+            storages[col] = infer_storage([row[i] for row in sample if i < len(row)])
+    return {col: COLUMN_TYPES[storage] for col, storage in storages.items()}, _read_chunks(file, reader, header, storages, sample, chunk_size)
+
+def _read_chunks(file, reader, header, storages, sample, chunk_size):
+    with file:
+        # The sampled rows come first
+        chunk, first = sample, 1
+        while chunk:
+            if set(map(len, chunk)) != {len(header)}:
+                i, row = next((i, row) for i, row in enumerate(chunk) if len(row) != len(header))
+                raise ValueError(f"Row {first + i} has {len(row)} fields, but the header has {len(header)}.")
+            columns = {}
+            for col, values in zip(header, zip(*chunk)):
+                try:
+                    columns[col] = coerce_column(storages[col], values)
+                except SQLitoTypeError as error:
+                    raise SQLitoTypeError(f"{error.message} (column '{col}', rows {first}-{first + len(chunk) - 1})") from None
+            yield columns
+            first += len(chunk)
+            chunk = list(itertools.islice(reader, chunk_size))
+
+def write_csv(path, fields, rows, delimiter=",", encoding="utf-8", chunk_size=CHUNK_SIZE):
+    """
+    Writes rows to a CSV file with a header row, a chunk of rows at a time.
+    NULLs are written as empty fields.
+
+    :param path: Path of the file.
+    :type path: str
+    :param fields: The header, or None to take it from the first row.
+    :type fields: list[str]
+    :param rows: The rows, as dicts.
+    :type rows: iterator[dict]
+
+    :return: The number of rows written.
+    :rtype: int
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is not None:
+        fields = list(first)
+        rows = itertools.chain([first], rows)
+
+    count = 0
+    with open(path, "w", newline="", encoding=encoding) as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow(fields or [])
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            writer.writerows(map(dict.values, chunk))
+            count += len(chunk)
+    return count
@@ -0,0 +1,384 @@
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from sqlito._column import ArrayColumn, Column, make_column
+
+# A table file is laid out as
+#
+#     MAGIC | column segments... | header (JSON) | header offset (u64) | MAGIC
+#
+# Array columns (INTEGER, REAL) are stored as one contiguous segment of
+# machine words, followed by their NULL bitmap if they have NULLs, so that
+# they can be read in place from the mapped file. Other columns are split in
+# pages of PAGE_ROWS values, each decoded the first time a scan touches it.
+MAGIC = b"SQLITO\x00\x01"
+FOOTER = struct.Struct("<Q")
+FILE_SUFFIX = ".sqlito"
+
+PAGE_SHIFT = 12
+PAGE_ROWS = 1 << PAGE_SHIFT
+
+# Decoded pages kept per object column
+PAGE_CACHE_SIZE = 64
+
+# Tags of the values of an object page
+TAG_NULL, TAG_STR, TAG_BYTES, TAG_INT, TAG_FLOAT, TAG_BOOL = range(6)
+FLOAT = struct.Struct("<d")
+
+def encode_value(value):
+    # Returns the tag and the encoded bytes of a value of an object page
+    if value is None:
+        return TAG_NULL, b""
+    if isinstance(value, str):
+        return TAG_STR, value.encode("utf-8")
+    if isinstance(value, bytes):
+        return TAG_BYTES, value
+    if isinstance(value, bool):
+        return TAG_BOOL, b"1" if value else b"0"
+    if isinstance(value, int):
+        return TAG_INT, str(value).encode("ascii")
+    if isinstance(value, float):
+        return TAG_FLOAT, FLOAT.pack(value)
+    raise TypeError(f"Cannot store value '{value}' of type {type(value).__name__}.")
+
+DECODERS = {
+    TAG_NULL: lambda data: None,
+    TAG_STR: lambda data: str(data, "utf-8"),
+    TAG_BYTES: bytes,
+    TAG_INT: int,
+    TAG_FLOAT: lambda data: FLOAT.unpack(data)[0],
+    TAG_BOOL: lambda data: data == b"1",
+}
+
+# Kinds of object pages: values encoded one by one, or TEXT values joined
+# into a single string, so that a page decodes with a single split
+PAGE_VALUES, PAGE_JOINED_TEXT = range(2)
+PAGE_HEADER = struct.Struct("<IB")
+TEXT_SEPARATOR = "\x00"
+
+def encode_page(values):
+    """
+    Encodes values as an object page: the number of values, the page kind,
+    a tag byte per value, and then either the joined text of the values or
+    the end offset of each value in the payload, and the payload.
+    """
+    values = list(values)
+    if all(value is None or type(value) is str for value in values):
+        tags = bytes(TAG_NULL if value is None else TAG_STR for value in values)
+        text = [value or "" for value in values]
+        if not any(TEXT_SEPARATOR in value for value in text):
+            return PAGE_HEADER.pack(len(values), PAGE_JOINED_TEXT) + tags + TEXT_SEPARATOR.join(text).encode("utf-8")
+
+    tags = bytearray()
+    ends = array("Q")
+    payload = bytearray()
+    for value in values:
+        tag, data = encode_value(value)
+        tags.append(tag)
+        payload += data
+        ends.append(len(payload))
+    if sys.byteorder != "little":
+        ends.byteswap()
+    return PAGE_HEADER.pack(len(values), PAGE_VALUES) + bytes(tags) + ends.tobytes() + bytes(payload)
+
+def decode_page(buffer):
+    count, kind = PAGE_HEADER.unpack_from(buffer)
+    start = PAGE_HEADER.size
+    tags = buffer[start:start + count]
+    start += count
+
+    if kind == PAGE_JOINED_TEXT:
+        values = str(buffer[start:], "utf-8").split(TEXT_SEPARATOR) if count else []
+        if TAG_NULL in tags:
+            values = [None if tag == TAG_NULL else value for tag, value in zip(tags, values)]
+        return values
+
+    ends = array("Q", bytes(buffer[start:start + 8 * count]))
+    if sys.byteorder != "little":
+        ends.byteswap()
+    payload = buffer[start + 8 * count:]
+
+    values = []
+    start = 0
+    for tag, end in zip(tags, ends):
+        values.append(DECODERS[tag](payload[start:end]))
+        start = end
+    return values
+
+class MappedColumn(Column):
+    """
+    Base class for columns read from a mapped table file. The rows stored in
+    the file are read in place; rows inserted since the file was opened are
+    kept in an in-memory tail column.
+    """
+    def __init__(self, count, tail):
+        self.count = count
+        self.tail = tail
+
+    def __len__(self):
+        return self.count + len(self.tail)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if position < self.count:
+            return self.read(position)
+        return self.tail[position - self.count]
+
+    def __iter__(self):
+        return itertools.chain(self.scan(), self.tail)
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+    def getter(self):
+        read, count = self.base_getter(), self.count
+        if not len(self.tail):
+            return read
+
+        tail = self.tail.getter()
+        def get(position):
+            return read(position) if position < count else tail(position - count)
+        return get
+
+    def read(self, position):
+        return self.base_getter()(position)
+
+    def scan(self):
+        raise NotImplementedError(f"{type(self).__name__}.scan() not implemented")
+
+    def base_getter(self):
+        raise NotImplementedError(f"{type(self).__name__}.base_getter() not implemented")
+
+class MappedArrayColumn(MappedColumn):
+    """INTEGER or REAL column read in place, as machine words, from the file."""
+    def __init__(self, buffer, typecode, count, nulls=None):
+        super().__init__(count, ArrayColumn(typecode))
+        self.typecode = typecode
+        self.pytype = float if typecode == "d" else int
+        self.values = buffer.cast(typecode)
+        self.nulls = nulls
+
+    def scan(self):
+        if self.nulls is None:
+            return iter(self.values)
+        get = self.base_getter()
+        return map(get, range(self.count))
+
+    def base_getter(self):
+        if self.nulls is None:
+            return self.values.__getitem__
+
+        values, nulls = self.values, self.nulls
+        def get(position):
+            if nulls[position >> 3] >> (position & 7) & 1:
+                return None
+            return values[position]
+        return get
+
+class MappedObjectColumn(MappedColumn):
+    """
+    Column of any other type, read from the file a page at a time. Decoded
+    pages are kept in a small cache, so memory stays bounded by the pages in
+    use rather than by the size of the column.
+
+    Readers run concurrently (with each other and with the writer), and all
+    of them update the cache, so it is only ever touched under its lock.
+    """
+    def __init__(self, buffer, pages, count, type_name):
+        super().__init__(count, make_column(type_name))
+        self.buffer = buffer
+        self.pages = pages
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def page(self, number):
+        with self.cache_lock:
+            page = self.cache.get(number)
+            if page is not None:
+                self.cache.move_to_end(number)
+                return page
+
+        # Decoded outside the lock; two readers missing the same page both
+        # decode it, and the second simply replaces the first's copy
+        offset, length = self.pages[number]
+        page = decode_page(self.buffer[offset:offset + length])
+        with self.cache_lock:
+            self.cache[number] = page
+            self.cache.move_to_end(number)
+            if len(self.cache) > PAGE_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return page
+
+    def scan(self):
+        for number in range(len(self.pages)):
+            yield from self.page(number)
+
+    def base_getter(self):
+        # Scans read consecutive positions, so the last page read is kept at
+        # hand rather than looked up in the cache for every row
+        current = [-1, None]
+        def get(position):
+            number = position >> PAGE_SHIFT
+            if number != current[0]:
+                current[0], current[1] = number, self.page(number)
+            return current[1][position & (PAGE_ROWS - 1)]
+        return get
+
+def column_typecode(column):
+    # Typecode of a column that can be written as machine words, or None
+    if isinstance(column, ArrayColumn) and isinstance(column.values, array):
+        return column.typecode
+    if isinstance(column, MappedArrayColumn) and isinstance(column.tail.values, array):
+        return column.typecode
+    return None
+
+def write_array_column(file, column, typecode, count):
+    # Writes the values of an array column, and returns the offset and length
+    # of its NULL bitmap, if it has NULLs
+    if isinstance(column, ArrayColumn):
+        file.write(column.values[:count])
+        nulls = bytes(column.nulls) if column.nulls is not None else None
+    else:
+        nulls = bytearray()
+        values = iter(column)
+        for start in range(0, count, PAGE_ROWS):
+            chunk = list(itertools.islice(values, min(PAGE_ROWS, count - start)))
+            file.write(array(typecode, [0 if value is None else value for value in chunk]))
+            for i, value in enumerate(chunk, start):
+                if value is None:
+                    byte = i >> 3
+                    if byte >= len(nulls):
+                        nulls.extend(bytes(byte - len(nulls) + 1))
+                    nulls[byte] |= 1 << (i & 7)
+        nulls = bytes(nulls) if nulls else None
+
+    if nulls is None:
+        return None
+    # Pad the bitmap to cover every row, so reads never go past its end
+    nulls = nulls.ljust((count + 7) >> 3, b"\x00")
+    offset = file.tell()
+    file.write(nulls)
+    return [offset, len(nulls)]
+
+def align(file):
+    # Pads the file to an 8-byte boundary, so array segments are aligned
+    file.write(b"\x00" * (-file.tell() % 8))
+
+def write_table(table, path, lsn=0):
+    """
+    Writes a table to a file, replacing the file at once when it is
+    complete so that a crash never leaves a partial table behind.
+
+    :param table: The table.
+    :type table: Table
+    :param path: Path of the table file.
+    :type path: str
+    :param lsn: Sequence number of the last write-ahead log record the
+        table reflects. Older records are not replayed onto it.
+    :type lsn: int
+    """
+    count = table.get_row_count()
+    header = {
+        "name": table.get_name(),
+        "types": table.types,
+        "row_count": count,
+        "lsn": lsn,
+        "byteorder": sys.byteorder,
+        "columns": {},
+        "indexes": table.index_kinds(),
+    }
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        for col_name in table.get_columns():
+            column = table.get_column(col_name)
+            typecode = column_typecode(column)
+            align(file)
+            if typecode is not None:
+                offset = file.tell()
+                nulls = write_array_column(file, column, typecode, count)
+                header["columns"][col_name] = {"typecode": typecode, "offset": offset, "nulls": nulls}
+            else:
+                pages = []
+                values = iter(column)
+                for start in range(0, count, PAGE_ROWS):
+                    page = encode_page(itertools.islice(values, min(PAGE_ROWS, count - start)))
+                    pages.append([file.tell(), len(page)])
+                    file.write(page)
+                header["columns"][col_name] = {"pages": pages}
+
+        header_offset = file.tell()
+        file.write(json.dumps(header, default=encode_json).encode("utf-8"))
+        file.write(FOOTER.pack(header_offset))
+        file.write(MAGIC)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def read_table(path, table_type):
+    """
+    Opens a table file, mapping it into memory. Only the header is read;
+    column data is read as queries touch it.
+
+    :param path: Path of the table file.
+    :type path: str
+    :param table_type: The Table class.
+    :type table_type: type
+
+    :return: The table, and the sequence number of the last write-ahead log
+        record it reflects.
+    :rtype: tuple[Table, int]
+
+    :raises ValueError: If the file is not a valid table file.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+
+    if len(buffer) < 2 * len(MAGIC) + FOOTER.size or buffer[:len(MAGIC)] != MAGIC or buffer[-len(MAGIC):] != MAGIC:
+        raise ValueError(f"{path} is not a SQLito table file.")
+    header_offset, = FOOTER.unpack_from(buffer, len(buffer) - len(MAGIC) - FOOTER.size)
+    header = json.loads(bytes(buffer[header_offset:len(buffer) - len(MAGIC) - FOOTER.size]), object_hook=decode_json)
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a machine with a different byte order.")
+
+    count = header["row_count"]
+    storage = {}
+    for col_name, layout in header["columns"].items():
+        if "typecode" in layout:
+            offset, typecode = layout["offset"], layout["typecode"]
+            values = buffer[offset:offset + count * array(typecode).itemsize]
+            nulls = None
+            if layout["nulls"] is not None:
+                nulls_offset, nulls_length = layout["nulls"]
+                nulls = buffer[nulls_offset:nulls_offset + nulls_length]
+            storage[col_name] = MappedArrayColumn(values, typecode, count, nulls)
+        else:
+            type_name = header["types"][col_name]["type"]
+            storage[col_name] = MappedObjectColumn(buffer, layout["pages"], count, type_name)
+
+    table = table_type.from_storage(header["name"], header["types"], storage, count, header["indexes"])
+    return table, header.get("lsn", 0)
+
+def encode_json(value):
+    # Column defaults may be bytes, which JSON has no type for
+    if isinstance(value, bytes):
+        return {"__bytes__": value.hex()}
+    raise TypeError(f"Cannot store value '{value}' of type {type(value).__name__}.")
+
+def decode_json(value):
+    if "__bytes__" in value:
+        return bytes.fromhex(value["__bytes__"])
+    return value
@@ -0,0 +1,192 @@
+import time
+
+def describe_condition(condition):
+    """
+    Renders a condition tree, as built by `Query.WHERE`, `AND` and `OR`, as
+    text, e.g. "age > 30 AND name LIKE 'J%'".
+    """
+    if isinstance(condition, dict):
+        logic = f" {condition.get('logic') or 'AND'} "
+        parts = [
+            f"({describe_condition(cond)})" if isinstance(cond, dict) else describe_condition(cond)
+            for cond in condition.get("conditions")
+        ]
+        return logic.join(parts)
+
+    field, op, value = condition
+    if op is None:
+        return field
+    if op in ("IS NULL", "IS NOT NULL"):
+        return f"{field} {op}"
+    if op == "IN":
+        return f"{field} IN ({', '.join(map(repr, value))})"
+    if op == "BETWEEN":
+        return f"{field} BETWEEN {value[0]!r} AND {value[1]!r}"
+    if op == "LIKE":
+        return f"{field} LIKE {value!r}"
+    return f"{field} {op} {value}"
+
+class PlanNode:
+    """
+    One operator of a query plan (a scan, filter, sort, limit, projection,
+    aggregation...) and the operators feeding it rows.
+
+    When the plan was run (`Query.explain(analyze=True)`), each node also
+    records the rows it produced, the time spent producing them and, for
+    operators evaluating conditions, how often each condition was evaluated
+    and matched. Times are inclusive of the operators feeding the node, as
+    rows are pulled through them; `self_time_ns` excludes them.
+    """
+    def __init__(self, operator, detail=None, children=()):
+        """
+        :param operator: Name of the operator, e.g. "Seq Scan".
+        :type operator: str
+        :param detail: What the operator works on, e.g. "on people".
+        :type detail: str, optional
+        :param children: Nodes feeding this one rows.
+        :type children: list[PlanNode]
+        """
+        self.operator = operator
+        self.detail = detail
+        self.children = list(children)
+        self.rows_out = 0
+        self.time_ns = 0
+        self.predicates = []
+
+    @property
+    def rows_in(self):
+        return sum(child.rows_out for child in self.children)
+
+    @property
+    def self_time_ns(self):
+        return self.time_ns - sum(child.time_ns for child in self.children)
+
+    def profile(self, make):
+        """
+        Returns the output of make (called with this node), with the rows
+        pulled from it counted and timed. make is only called once the first
+        row is pulled, so any work it does up front (e.g., sorting) is timed
+        as part of this operator, like the rest of its work.
+        """
+        clock = time.perf_counter_ns
+        start = clock()
+        rows = iter(make(self))
+        self.time_ns += clock() - start
+        while True:
+            start = clock()
+            try:
+                row = next(rows)
+            except StopIteration:
+                self.time_ns += clock() - start
+                return
+            self.time_ns += clock() - start
+            self.rows_out += 1
+            yield row
+
+    def count(self, condition, predicate):
+        """
+        Wraps the predicate of a condition so its evaluations and matches are
+        counted on this node. Meant as the `wrap` of `compile_condition`.
+        """
+        stats = {"condition": describe_condition(condition), "evaluations": 0, "matches": 0}
+        self.predicates.append(stats)
+        def counted(row):
+            stats["evaluations"] += 1
+            if predicate(row):
+                stats["matches"] += 1
+                return True
+            return False
+        return counted
+
+    def to_dict(self, analyze=True):
+        """
+        Returns the plan rooted at this node as nested dicts, with the
+        children of each node under "children".
+
+        :param analyze: Whether to include what was measured when it ran.
+        :type analyze: bool, optional
+        """
+        node = {"operator": self.operator, "detail": self.detail}
+        if analyze:
+            node.update(
+                rows_in=self.rows_in,
+                rows_out=self.rows_out,
+                time_ns=self.time_ns,
+                self_time_ns=self.self_time_ns,
+                predicates=[dict(stats) for stats in self.predicates],
+            )
+        node["children"] = [child.to_dict(analyze) for child in self.children]
+        return node
+
+    def render(self, analyze=True, depth=0):
+        """
+        Renders the plan rooted at this node as an indented tree, one
+        operator per line, its conditions below it.
+        """
+        line = "  " * depth + ("-> " if depth else "") + self.operator
+        if self.detail:
+            line += f" {self.detail}"
+        if analyze:
+            line += f" (rows={self.rows_out} time={self.time_ns / 1e6:.3f}ms self={self.self_time_ns / 1e6:.3f}ms)"
+        lines = [line]
+        if analyze:
+            for stats in self.predicates:
+                lines.append("  " * (depth + 1) + f"   {stats['condition']}: evaluated {stats['evaluations']}, matched {stats['matches']}")
+        lines.extend(child.render(analyze, depth + 1) for child in self.children)
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.render()
+
+class QueryPlan:
+    """
+    Builds the plan of a query as its pipeline is assembled, each operator
+    taking the one before it as its child.
+    """
+    def __init__(self, analyze=True):
+        """
+        :param analyze: Whether the query actually runs. If not, its operators
+            are assembled over no rows, which shows the plan without its cost.
+        :type analyze: bool, optional
+        """
+        self.analyze = analyze
+        self.root = None
+
+    def stage(self, operator, detail, make, lazy=True):
+        """
+        Adds an operator on top of the plan, and returns its output.
+
+        :param operator: Name of the operator.
+        :type operator: str
+        :param detail: What the operator works on.
+        :type detail: str
+        :param make: Callable taking the operator's node and returning its
+            output: an iterable of rows, or the dict of an aggregate-only
+            query.
+        :type make: callable
+        :param lazy: Whether to only call make once the output is iterated
+            (see `PlanNode.profile`). The operator at the top of the plan,
+            which may return a dict, is called right away instead.
+        :type lazy: bool, optional
+
+        :return: The output, profiled.
+        :rtype: iterable or dict
+        """
+        node = PlanNode(operator, detail, [self.root] if self.root else [])
+        self.root = node
+        if lazy:
+            return node.profile(make)
+
+        start = time.perf_counter_ns()
+        data = make(node)
+        node.time_ns += time.perf_counter_ns() - start
+        if isinstance(data, dict):
+            node.rows_out += 1
+            return data
+        return node.profile(lambda node: data)
+
+    def to_dict(self):
+        return self.root.to_dict(self.analyze)
+
+    def __str__(self):
+        return self.root.render(self.analyze)
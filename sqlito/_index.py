@@ -0,0 +1,391 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+import threading
+
+from sqlito._predicate import coerce_literal, like_prefix, prefix_successor, strip_quotes
+
+class HashIndex:
+    """
+    Secondary index mapping each value of a column to the positions of the
+    rows holding it. NULLs are indexed under `None`, so `IS NULL` can use the
+    index too.
+    """
+    kind = "HASH"
+
+    def __init__(self, column_name, column):
+        """
+        Builds the index over the current contents of a column.
+
+        :param column_name: Name of the indexed column.
+        :type column_name: str
+        :param column: Column storage to index.
+        :type column: Column
+        """
+        self.column_name = column_name
+        self.buckets = {}
+        for position, value in enumerate(column):
+            self.insert(value, position)
+
+    def insert(self, value, position):
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            self.buckets[value] = [position]
+        else:
+            bucket.append(position)
+
+    def insert_many(self, values, start):
+        # Inserts values at consecutive positions from start
+        buckets = self.buckets
+        for position, value in enumerate(values, start):
+            bucket = buckets.get(value)
+            if bucket is None:
+                buckets[value] = [position]
+            else:
+                bucket.append(position)
+
+    def contains(self, value):
+        return value in self.buckets
+
+    def contains_any(self, values):
+        return not self.buckets.keys().isdisjoint(values)
+
+    def lookup(self, value, rows=None):
+        """
+        Returns the positions of the rows equal to value, in ascending order.
+
+        :param value: Value to look up, already coerced to the column's type.
+        :type value: any
+        :param rows: Only rows at positions below this are returned, e.g.
+            the row count of a snapshot of the table. All by default.
+        :type rows: int, optional
+
+        :return: Row positions.
+        :rtype: list[int]
+        """
+        bucket = self.buckets.get(value, [])
+        if rows is None:
+            return bucket
+        # Buckets only grow at their end, so this copy is a stable snapshot
+        return bucket[:bisect_left(bucket, rows)]
+
+    def lookup_many(self, values, rows=None):
+        """
+        Returns the positions of the rows equal to any of values, in
+        ascending order.
+
+        :param values: Values to look up, already coerced to the column's type.
+        :type values: iterable
+        :param rows: Only rows at positions below this are returned.
+        :type rows: int, optional
+
+        :return: Row positions.
+        :rtype: list[int]
+        """
+        positions = set()
+        for value in set(values):
+            positions.update(self.lookup(value, rows))
+        return sorted(positions)
+
+class OrderedIndex:
+    """
+    Secondary index keeping the non-NULL values of a column in sorted order,
+    as a sorted array of keys and a parallel array of row positions. Serves
+    range predicates and returns rows in index order for ORDER BY.
+
+    Inserts go to a small buffer that is merged into the sorted arrays the
+    next time the index is read, so bulk inserts don't pay for a sorted
+    insertion each. A merge builds new arrays rather than changing the ones
+    concurrent readers may be using (unless it only appends to them).
+    """
+    kind = "ORDERED"
+
+    def __init__(self, column_name, column):
+        """
+        Builds the index over the current contents of a column.
+
+        :param column_name: Name of the indexed column.
+        :type column_name: str
+        :param column: Column storage to index.
+        :type column: Column
+        """
+        self.column_name = column_name
+        # The sorted keys and positions, replaced as a pair whenever the
+        # buffer is merged into them. Readers take the pair as it is when
+        # they start, and are never affected by a later merge.
+        self.sorted = ([], [])
+        self.nulls = []
+        self.buffer = []
+        self.merging = threading.Lock()
+        for position, value in enumerate(column):
+            self.insert(value, position)
+        self.__flush()
+
+    def insert(self, value, position):
+        if value is None:
+            self.nulls.append(position)
+        else:
+            self.buffer.append((value, position))
+
+    def insert_many(self, values, start):
+        # Inserts values at consecutive positions from start
+        if None not in values:
+            self.buffer.extend(zip(values, range(start, start + len(values))))
+            return
+        for position, value in enumerate(values, start):
+            if value is None:
+                self.nulls.append(position)
+            else:
+                self.buffer.append((value, position))
+
+    def __flush(self):
+        # Inserts only ever append to the buffer, and a merge only removes
+        # the entries it merged, so neither loses the other's entries. Merges
+        # are serialized, and only lock anything when there is one to do.
+        if not self.buffer:
+            return
+        with self.merging:
+            count = len(self.buffer)
+            if not count:
+                return
+
+            # Ties are ordered by position, so equal keys keep their row order
+            buffer = sorted(self.buffer[:count])
+            keys, positions = self.sorted
+            if not keys or keys[-1] <= buffer[0][0]:
+                # Appending in key order (e.g. increasing ids) needs no merge.
+                # The arrays are extended in place: readers of the pair only
+                # look at the entries already there, or that they can't see.
+                keys.extend(key for key, _ in buffer)
+                positions.extend(position for _, position in buffer)
+            else:
+                pairs = list(merge(zip(keys, positions), buffer))
+                self.sorted = ([key for key, _ in pairs], [position for _, position in pairs])
+            del self.buffer[:count]
+
+    def __pair(self):
+        # The sorted keys and positions, cut to the entries both have (keys
+        # are extended before positions)
+        keys, positions = self.sorted
+        return keys, positions, len(positions)
+
+    def lookup(self, value, rows=None):
+        if value is None:
+            return visible(list(self.nulls), rows)
+        # Equal keys are already in position order
+        return self.range(value, value, rows=rows)
+
+    def lookup_many(self, values, rows=None):
+        positions = []
+        for value in set(values):
+            positions.extend(self.range(value, value, rows=rows))
+        return sorted(positions)
+
+    def range(self, low=None, high=None, include_low=True, include_high=True, rows=None):
+        """
+        Returns the positions of the rows whose values lie between low and
+        high, in index order. NULLs are never part of a range.
+
+        :param low: Lower bound, or None for no lower bound.
+        :type low: any
+        :param high: Upper bound, or None for no upper bound.
+        :type high: any
+        :param include_low: Whether the lower bound is inclusive.
+        :type include_low: bool
+        :param include_high: Whether the upper bound is inclusive.
+        :type include_high: bool
+        :param rows: Only rows at positions below this are returned, e.g.
+            the row count of a snapshot of the table. All by default.
+        :type rows: int, optional
+
+        :return: Row positions, ordered by value and then by position.
+        :rtype: list[int]
+        """
+        self.__flush()
+        keys, positions, count = self.__pair()
+        if low is None:
+            start = 0
+        else:
+            start = (bisect_left if include_low else bisect_right)(keys, low, 0, count)
+        if high is None:
+            stop = count
+        else:
+            stop = (bisect_right if include_high else bisect_left)(keys, high, 0, count)
+        return visible(positions[start:stop], rows)
+
+    def ordered(self, direction="ASC", rows=None):
+        """
+        Yields every row position in the order `ORDER BY column direction`
+        would sort them: NULLs first when ascending and last when descending,
+        with ties kept in row order either way. Positions are produced as
+        they are pulled, so reading the first k costs about k steps rather
+        than a pass over the whole index.
+
+        :param direction: "ASC" or "DESC".
+        :type direction: str
+        :param rows: Only rows at positions below this are yielded.
+        :type rows: int, optional
+
+        :return: Row positions.
+        :rtype: iterator[int]
+        """
+        self.__flush()
+        keys, sorted_positions, count = self.__pair()
+        # NULLs are only ever appended, so those there now are a prefix
+        nulls, null_count = self.nulls, len(self.nulls)
+        if direction == "ASC":
+            yield from visible_iter(nulls, 0, null_count, rows)
+            yield from visible_iter(sorted_positions, 0, count, rows)
+            return
+
+        # Walk the runs of equal keys from the largest down, keeping each
+        # run in ascending position order like a stable sort would
+        end = count
+        while end > 0:
+            start = bisect_left(keys, keys[end - 1], 0, end)
+            yield from visible_iter(sorted_positions, start, end, rows)
+            end = start
+        yield from visible_iter(nulls, 0, null_count, rows)
+
+def visible(positions, rows):
+    # The positions below rows, or all of them if rows is None. Rows are only
+    # ever appended, so these are the rows of a snapshot of rows rows.
+    if rows is None:
+        return positions
+    return [position for position in positions if position < rows]
+
+def visible_iter(positions, start, stop, rows):
+    # Like visible, lazily, over positions[start:stop]
+    for i in range(start, stop):
+        position = positions[i]
+        if rows is None or position < rows:
+            yield position
+
+INDEX_TYPES = {
+    HashIndex.kind: HashIndex,
+    OrderedIndex.kind: OrderedIndex,
+}
+
+def find_index(table, field, kinds=(HashIndex.kind, OrderedIndex.kind)):
+    for kind in kinds:
+        index = table.get_index(field, kind)
+        if index is not None:
+            return index
+    return None
+
+def lookup_condition(table, condition, rows=None):
+    """
+    Uses the table's indexes to find the candidate rows for a condition tree.
+
+    A single `=`, `IN` or `IS NULL` condition on an indexed column is answered
+    by the index, and so are `<`, `<=`, `>`, `>=` and `BETWEEN` on a column
+    with an ordered index. A LIKE pattern without wildcards is answered like
+    `=`, and one with a literal prefix (e.g. 'abc%') by a range of an ordered
+    index. An AND group uses the first such child it finds,
+    and an OR group is answered only if every child can be. The candidates
+    are a superset of the matching rows, so the full predicate must still be
+    applied to them.
+
+    :param table: Table being queried.
+    :type table: Table
+    :param condition: Condition tree built by `Query.WHERE`, `AND` and `OR`.
+    :type condition: tuple or dict
+    :param rows: Only rows at positions below this are returned, e.g. the
+        row count of a snapshot of the table. All by default.
+    :type rows: int, optional
+
+    :return: Candidate row positions in ascending order, or None if the table
+        must be scanned.
+    :rtype: list[int] or None
+    """
+    lookup = plan_lookup(table, condition, rows)
+    return lookup() if lookup is not None else None
+
+def plan_lookup(table, condition, rows=None):
+    """
+    Finds the indexes that answer a condition tree, as `lookup_condition`
+    does, but defers looking anything up in them.
+
+    :return: A callable taking no arguments and returning what
+        `lookup_condition` would, or None if no index answers the condition.
+        The callable still returns None for a literal that turns out not to
+        be comparable with the indexed values.
+    :rtype: callable or None
+    """
+    if isinstance(condition, tuple):
+        field, op, value = condition
+        table_name, _, col = field.rpartition(".")
+        if table_name == table.get_name():
+            # Qualified by the table name (e.g., "people.id")
+            field = col
+        col_type = table.types[field]["type"]
+        point_index = find_index(table, field)
+        range_index = table.get_index(field, OrderedIndex.kind)
+        if op == "=" and point_index:
+            lookup = lambda: point_index.lookup(coerce_literal(strip_quotes(value), col_type), rows)
+        elif op == "IN" and point_index:
+            lookup = lambda: point_index.lookup_many((coerce_literal(val, col_type) for val in value), rows)
+        elif op == "IS NULL" and point_index:
+            lookup = lambda: point_index.lookup(None, rows)
+        elif op == "BETWEEN" and range_index:
+            def lookup():
+                low, high = (coerce_literal(val, col_type) for val in value)
+                return sorted(range_index.range(low, high, rows=rows))
+        elif op in ("<", "<=") and range_index:
+            lookup = lambda: sorted(range_index.range(
+                high=coerce_literal(strip_quotes(value), col_type), include_high=(op == "<="), rows=rows
+            ))
+        elif op in (">", ">=") and range_index:
+            lookup = lambda: sorted(range_index.range(
+                low=coerce_literal(strip_quotes(value), col_type), include_low=(op == ">="), rows=rows
+            ))
+        elif op == "LIKE" and isinstance(value, str):
+            pattern = strip_quotes(value)
+            prefix = like_prefix(pattern)
+            if prefix == pattern and point_index:
+                # No wildcards: the pattern is a plain equality
+                lookup = lambda: point_index.lookup(pattern, rows)
+            elif prefix and range_index:
+                # Every match starts with prefix, i.e. is in the range
+                # [prefix, prefix with its last character incremented)
+                lookup = lambda: sorted(range_index.range(prefix, prefix_successor(prefix), include_high=False, rows=rows))
+            else:
+                return None
+        else:
+            return None
+
+        def run():
+            try:
+                return lookup()
+            except TypeError:
+                # A literal that can't be hashed or compared against the
+                # indexed values: fall back to a scan
+                return None
+        return run
+    elif isinstance(condition, dict):
+        logic = condition.get("logic")
+        lookups = [plan_lookup(table, cond, rows) for cond in condition.get("conditions")]
+
+        if logic == "AND" or logic is None:
+            lookups = [lookup for lookup in lookups if lookup is not None]
+            if not lookups:
+                return None
+            def run():
+                for lookup in lookups:
+                    positions = lookup()
+                    if positions is not None:
+                        return positions
+                return None
+            return run
+        elif logic == "OR":
+            if any(lookup is None for lookup in lookups):
+                return None
+            def run():
+                positions = set()
+                for lookup in lookups:
+                    candidates = lookup()
+                    if candidates is None:
+                        return None
+                    positions.update(candidates)
+                return sorted(positions)
+            return run
+    return None
@@ -0,0 +1,75 @@
+from sqlito._index import find_index
+
+def join_rows(rows, left_key, table, column, kind="INNER", row_count=None):
+    """
+    Equi-joins rows with a table on `left_key(row) = table.column`.
+
+    Rows are tuples with one row position per table joined so far. Each output
+    row extends a left row with the position of a matching row of table, or
+    with None for unmatched rows of a LEFT join. NULL keys never match.
+
+    If the joined column has an index, every left row probes it (index nested
+    loop). Otherwise a hash table is built on the smaller input and probed
+    with the other one, for O(n + m) time. LEFT joins, and left inputs of
+    unknown size, always build on table. The probing input is streamed, and
+    the output follows its order.
+
+    :param rows: Left input rows.
+    :type rows: iterable[tuple]
+    :param left_key: Maps a left row to its join key.
+    :type left_key: callable
+    :param table: Right input table.
+    :type table: Table
+    :param column: Column of table to join on.
+    :type column: str
+    :param kind: "INNER" or "LEFT".
+    :type kind: str
+    :param row_count: Number of left input rows, if known.
+    :type row_count: int, optional
+
+    :return: An iterator over the joined rows.
+    :rtype: iterator[tuple]
+    """
+    # Only the rows of table when the join starts are joined, even if more
+    # are inserted while it runs
+    table_rows = table.get_row_count()
+    index = find_index(table, column)
+    if index is not None:
+        return probe(rows, left_key, lambda key: index.lookup(key, table_rows), kind)
+
+    right_key = table.get_column(column).getter()
+    right_positions = range(table_rows)
+
+    if kind == "INNER" and row_count is not None and row_count < len(right_positions):
+        # Build on the (smaller) left rows and probe with the table
+        build = {}
+        for row in rows:
+            key = left_key(row)
+            if key is not None:
+                build.setdefault(key, []).append(row)
+        return probe_built(build, right_key, right_positions)
+
+    # Build on the table and probe with the left rows
+    build = {}
+    for position in right_positions:
+        key = right_key(position)
+        if key is not None:
+            build.setdefault(key, []).append(position)
+    return probe(rows, left_key, build.get, kind)
+
+def probe(rows, left_key, lookup, kind):
+    for row in rows:
+        key = left_key(row)
+        matches = lookup(key) if key is not None else None
+        if matches:
+            for position in matches:
+                yield row + (position,)
+        elif kind == "LEFT":
+            yield row + (None,)
+
+def probe_built(build, right_key, right_positions):
+    for position in right_positions:
+        matches = build.get(right_key(position))
+        if matches:
+            for row in matches:
+                yield row + (position,)
@@ -0,0 +1,131 @@
+import csv
+import io
+import itertools
+import sys
+
+# Rows formatted and written to the stream at a time
+CHUNK_SIZE = 1_000
+
+# Rows the 'table' mode sizes its columns from
+WIDTH_SAMPLE_SIZE = 1_000
+
+class Formatter:
+    """
+    Writes query results to a text stream, a chunk of rows at a time: each
+    chunk is formatted into a single string and written with one call, so
+    the stream isn't written to (and flushed) once per row.
+
+    Subclasses format the header and the rows; see FORMATTERS.
+    """
+    def __init__(self, fields, stream=None):
+        """
+        :param fields: The fields of the result, for its header. Rows may
+            carry other keys (e.g., aggregate calls), in which case the keys
+            of the first row are used.
+        :type fields: list[str]
+        :param stream: Stream to write to. Defaults to standard output.
+        :type stream: io.TextIOBase, optional
+        """
+        self.fields = list(fields)
+        self.stream = stream or sys.stdout
+
+    def header(self, fields):
+        # Text written before the first row
+        return ""
+
+    def format_rows(self, rows):
+        raise NotImplementedError(f"{type(self).__name__}.format_rows() not implemented")
+
+    def write(self, result):
+        """
+        Writes a whole result: a list of rows, or the dict of an aggregate-only
+        query.
+        """
+        for _ in self.iter(iter([result]) if isinstance(result, dict) else result):
+            pass
+
+    def iter(self, rows):
+        """
+        Writes rows as they are pulled through, yielding each one on.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        fields = list(first) if first is not None else self.fields
+        rows = itertools.chain([first], rows) if first is not None else rows
+
+        rows = self.start(fields, rows)
+        self.stream.write(self.header(fields))
+        while chunk := list(itertools.islice(rows, CHUNK_SIZE)):
+            self.stream.write(self.format_rows(chunk))
+            yield from chunk
+        self.stream.flush()
+
+    def start(self, fields, rows):
+        # Hook for formatters that need to see rows before the header
+        return rows
+
+class PythonFormatter(Formatter):
+    """Each row as a Python dict; a whole result as a list of them."""
+    def write(self, result):
+        self.stream.write(f"{result!r}\n")
+        self.stream.flush()
+
+    def format_rows(self, rows):
+        return "".join(f"{row!r}\n" for row in rows)
+
+class TabsFormatter(Formatter):
+    """Values separated by tabs, without a header."""
+    def format_rows(self, rows):
+        return "".join("\t".join(map(str, row.values())) + "\n" for row in rows)
+
+class CsvFormatter(Formatter):
+    """RFC 4180 CSV with a header row. NULLs are empty fields."""
+    def header(self, fields):
+        return self.__format([fields])
+
+    def format_rows(self, rows):
+        return self.__format(map(dict.values, rows))
+
+    def __format(self, lines):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(lines)
+        return buffer.getvalue()
+
+class TableFormatter(Formatter):
+    """
+    Values aligned in columns under a header, numbers to the right. Column
+    widths come from the header and the first WIDTH_SAMPLE_SIZE rows, which
+    are held back until then; longer values in later rows overflow their
+    column, shifting the rest of their row, rather than being cut short.
+    """
+    def start(self, fields, rows):
+        sample = list(itertools.islice(rows, WIDTH_SAMPLE_SIZE))
+        self.widths = [len(str(field)) for field in fields]
+        for row in sample:
+            self.widths = list(map(max, self.widths, map(len, map(self.__cell, row.values()))))
+        return itertools.chain(sample, rows)
+
+    def header(self, fields):
+        names = " | ".join(str(field).ljust(width) for field, width in zip(fields, self.widths))
+        return f"{names}\n{'-+-'.join('-' * width for width in self.widths)}\n"
+
+    def format_rows(self, rows):
+        lines = []
+        for row in rows:
+            cells = []
+            for value, width in zip(row.values(), self.widths):
+                cell = self.__cell(value)
+                cells.append(cell.rjust(width) if isinstance(value, (int, float)) else cell.ljust(width))
+            lines.append(" | ".join(cells))
+        return "\n".join(lines) + "\n"
+
+    def __cell(self, value):
+        return "NULL" if value is None else str(value)
+
+# Formatter of each output mode ('off' has none)
+FORMATTERS = {
+    "python": PythonFormatter,
+    "tabs": TabsFormatter,
+    "csv": CsvFormatter,
+    "table": TableFormatter,
+}
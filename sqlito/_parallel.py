@@ -0,0 +1,70 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Rows each worker scans at a time. Workers take the next morsel as soon as
+# they finish one, so uneven morsels (e.g., mostly matching rows) balance out.
+MORSEL_SIZE = 100_000
+
+# Tables smaller than this are scanned serially, as starting the workers
+# would cost more than the scan
+PARALLEL_MIN_ROWS = 500_000
+
+# Work of the scans in progress, keyed by id. Workers are forked once it is
+# registered, and inherit it (with the tables it reads) instead of having it
+# pickled to them; only morsel bounds and partial results are.
+_work = {}
+_work_ids = itertools.count()
+
+def fork_available():
+    # Workers inherit the data they scan by being forked
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def fork_safe():
+    # A forked child only keeps the thread that forked it, but every lock,
+    # including those other threads hold (a table's write lock, an ordered
+    # index merging its runs, the write-ahead log's). Nothing would ever
+    # release those in the child, so workers are only forked while no other
+    # thread runs.
+    return threading.active_count() == 1
+
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def morsels(row_count):
+    return [(start, min(start + MORSEL_SIZE, row_count)) for start in range(0, row_count, MORSEL_SIZE)]
+
+def _run_morsel(work_id, start, stop):
+    return _work[work_id](start, stop)
+
+def map_morsels(work, row_count, workers):
+    """
+    Runs work over the rows of a table, a morsel at a time, in a pool of
+    forked worker processes. The pool lives for this call only, so workers
+    see the table as it is now.
+
+    :param work: Callable taking the start and stop positions of a morsel
+        and returning a picklable partial result.
+    :type work: callable
+    :param row_count: Number of rows to scan.
+    :type row_count: int
+    :param workers: Number of worker processes.
+    :type workers: int
+
+    :return: The partial result of each morsel, in row order.
+    :rtype: iterator
+    """
+    bounds = morsels(row_count)
+    work_id = next(_work_ids)
+    _work[work_id] = work
+    try:
+        with ProcessPoolExecutor(min(workers, len(bounds)) or 1, mp_context=multiprocessing.get_context("fork")) as pool:
+            starts, stops = zip(*bounds) if bounds else ((), ())
+            yield from pool.map(_run_morsel, itertools.repeat(work_id), starts, stops)
+    finally:
+        del _work[work_id]
@@ -0,0 +1,197 @@
+import math
+
+from sqlito._predicate import coerce_literal, like_prefix, prefix_successor, strip_quotes
+
+# Relative costs of the work a plan does, per row
+ROW_COST = 1.0          # reading a row of a scan
+CANDIDATE_COST = 1.5    # a candidate row from an index, which is also sorted
+SORT_COST = 0.2         # a comparison of ORDER BY
+
+# Relative cost of evaluating each kind of condition on a row
+PREDICATE_COSTS = {
+    "IS NULL": 0.5,
+    "IS NOT NULL": 0.5,
+    None: 0.1,
+    "IN": 1.2,
+    "BETWEEN": 1.3,
+    "LIKE": 3.0,
+}
+COMPARISON_COST = 1.0
+
+# Selectivities assumed when statistics don't help
+DEFAULT_EQUAL = 0.005
+DEFAULT_RANGE = 1 / 3
+DEFAULT_LIKE = 0.1
+
+class Planner:
+    """
+    Estimates the selectivity (the fraction of rows matching) and the cost of
+    conditions from the statistics of the columns they test, to pick how a
+    query reads its rows and in which order it evaluates its conditions.
+    """
+    def __init__(self, column_for):
+        """
+        :param column_for: Maps a field to its table and column name.
+        :type column_for: callable
+        """
+        self.column_for = column_for
+
+    def selectivity(self, condition):
+        """
+        Estimates the fraction of rows matching a condition tree. Conditions
+        are assumed independent of each other.
+
+        :param condition: Condition tree built by `Query.WHERE`, `AND` and `OR`.
+        :type condition: tuple or dict
+
+        :return: The fraction, between 0 and 1.
+        :rtype: float
+        """
+        if isinstance(condition, dict):
+            fractions = [self.selectivity(cond) for cond in condition.get("conditions")]
+            if condition.get("logic") == "OR":
+                return 1 - math.prod(1 - fraction for fraction in fractions)
+            return math.prod(fractions)
+
+        field, op, value = condition
+        table, col = self.column_for(field)
+        stats = table.get_stats(col)
+        col_type = table.types[col]["type"]
+        try:
+            fraction = self.__comparison_selectivity(stats, col_type, op, value)
+        except (TypeError, ValueError):
+            # A literal of another type, which the condition itself will
+            # report, or the Parameter of a prepared query, not bound yet
+            fraction = None
+        if fraction is None:
+            fraction = DEFAULT_EQUAL if op in ("=", "IN") else DEFAULT_RANGE
+        return min(max(fraction, 0.0), 1.0)
+
+    def __comparison_selectivity(self, stats, col_type, op, value):
+        if op is None:
+            # A bare field never matches
+            return 0.0
+        if op == "IS NULL":
+            return stats.null_fraction
+        if op == "IS NOT NULL":
+            return 1 - stats.null_fraction
+        if op == "=":
+            return stats.equal_fraction()
+        if op in ("!=", "<>"):
+            return 1 - stats.null_fraction - stats.equal_fraction()
+        if op == "IN":
+            return len(set(value)) * stats.equal_fraction()
+
+        if op == "BETWEEN":
+            low, high = (coerce_literal(val, col_type) for val in value)
+            return stats.range_fraction(low, high)
+        if op == "LIKE":
+            pattern = strip_quotes(value)
+            prefix = like_prefix(pattern)
+            if prefix == pattern:
+                return stats.equal_fraction()
+            if not prefix:
+                return DEFAULT_LIKE
+            fraction = stats.range_fraction(prefix, prefix_successor(prefix), include_high=False)
+            if fraction is not None and pattern != prefix + "%":
+                # Values with the prefix still have to match the rest
+                fraction *= DEFAULT_LIKE
+            return fraction
+
+        literal = coerce_literal(strip_quotes(value), col_type)
+        if op in ("<", "<="):
+            return stats.range_fraction(high=literal, include_high=(op == "<="))
+        if op in (">", ">="):
+            return stats.range_fraction(low=literal, include_low=(op == ">="))
+        return None
+
+    def cost(self, condition):
+        """
+        Estimates the cost of evaluating a condition tree on a row, with its
+        children evaluated in order until one decides the result.
+        """
+        if isinstance(condition, dict):
+            total, reached = 0.0, 1.0
+            is_or = condition.get("logic") == "OR"
+            for cond in condition.get("conditions"):
+                total += reached * self.cost(cond)
+                # Only rows the child didn't decide reach the next one
+                fraction = self.selectivity(cond)
+                reached *= (1 - fraction) if is_or else fraction
+            return total
+        return PREDICATE_COSTS.get(condition[1], COMPARISON_COST)
+
+    def order(self, condition):
+        """
+        Reorders the children of every AND and OR group of a condition tree
+        so that the cheapest and most decisive are evaluated first: for AND,
+        those that reject the most rows for their cost, and for OR, those
+        that accept the most. The result is the same in any order.
+
+        :param condition: Condition tree built by `Query.WHERE`, `AND` and `OR`.
+        :type condition: tuple or dict
+
+        :return: The reordered condition tree.
+        :rtype: tuple or dict
+        """
+        if not isinstance(condition, dict):
+            return condition
+
+        is_or = condition.get("logic") == "OR"
+        def rank(cond):
+            fraction = self.selectivity(cond)
+            decided = fraction if is_or else 1 - fraction
+            return self.cost(cond) / max(decided, 1e-9)
+
+        conditions = [self.order(cond) for cond in condition.get("conditions")]
+        return {"logic": condition.get("logic"), "conditions": sorted(conditions, key=rank)}
+
+    def skipped(self, condition, field, descending=False):
+        """
+        Estimates the fraction of rows a scan in the order of a field passes
+        before reaching the first that can match a condition tree: those
+        below (or above, if descending) the range the AND children comparing
+        the field allow.
+        """
+        column = self.column_for(field)
+        fraction = 0.0
+        for cond in self.lookups(condition):
+            if isinstance(cond, dict) or self.column_for(cond[0]) != column:
+                continue
+            _, op, value = cond
+            table, col = column
+            try:
+                fraction = max(fraction, self.__skipped(table.get_stats(col), table.types[col]["type"], op, value, descending) or 0.0)
+            except (TypeError, ValueError):
+                continue
+        return fraction
+
+    def __skipped(self, stats, col_type, op, value, descending):
+        if op == "BETWEEN":
+            low, high = (coerce_literal(val, col_type) for val in value)
+            if descending:
+                return stats.range_fraction(low=high, include_low=False)
+            return stats.range_fraction(high=low, include_high=False)
+        if op not in ("=", "<", "<=", ">", ">="):
+            return None
+        literal = coerce_literal(strip_quotes(value), col_type)
+        if descending and op in ("=", "<", "<="):
+            return stats.range_fraction(low=literal, include_low=(op == "<"))
+        if not descending and op in ("=", ">", ">="):
+            return stats.range_fraction(high=literal, include_high=(op == ">"))
+        return None
+
+    def lookups(self, condition):
+        """
+        Returns the parts of a condition tree an index could answer on its
+        own: each child of an AND group, or else the whole condition.
+        """
+        if isinstance(condition, dict) and condition.get("logic") in ("AND", None):
+            return list(condition.get("conditions"))
+        return [condition]
+
+def sort_cost(rows, limit=None):
+    # Comparisons of a sort, or of keeping the top `limit` rows in a heap
+    if rows <= 1:
+        return 0.0
+    return rows * math.log2(min(rows, limit or rows) + 1) * SORT_COST
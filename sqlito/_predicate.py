@@ -0,0 +1,218 @@
+import functools
+import operator
+import re
+import sys
+
+# Column types (as recorded in `Table.types`) whose literals are numeric
+NUMERIC_TYPES = {"int", "float", "bool"}
+
+COMPARISONS = {
+    '=' : operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<' : operator.lt,
+    '<=': operator.le,
+    '>' : operator.gt,
+    '>=': operator.ge,
+}
+
+def strip_quotes(value):
+    return value.strip("'").strip('"') if isinstance(value, str) else value
+
+def coerce_literal(value, col_type):
+    """
+    Converts a literal from a condition to the type of the column it is
+    compared against. Numeric strings become an int, or a float if they
+    contain a decimal point. Literals for any other column are left as is.
+
+    :param value: Literal to coerce.
+    :type value: any
+    :param col_type: Python type name of the column, from `Table.types`.
+    :type col_type: str or None
+
+    :return: The coerced literal.
+    :rtype: any
+
+    :raises ValueError: If a literal for a numeric column is not numeric.
+    """
+    if col_type not in NUMERIC_TYPES or not isinstance(value, str):
+        return value
+    return float(value) if '.' in value else int(value)
+
+def like_to_regex(pattern):
+    """
+    Converts a SQL LIKE pattern to a compiled regex.
+    SQL LIKE uses `%` for any number of characters and `_` for exactly one character.
+    """
+    # - `%` becomes `.*` (zero or more characters)
+    # - `_` becomes `.` (exactly one character)
+    # - anything else matches itself, even if it means something in a regex
+    parts = ("." if char == "_" else ".*" if char == "%" else re.escape(char) for char in pattern)
+    return re.compile("".join(parts), re.DOTALL)
+
+def like_prefix(pattern):
+    """
+    Returns the literal prefix of a LIKE pattern, i.e. everything before its
+    first wildcard. Every value matching the pattern starts with it.
+    """
+    for i, char in enumerate(pattern):
+        if char in "%_":
+            return pattern[:i]
+    return pattern
+
+def prefix_successor(prefix):
+    """
+    Returns the smallest string greater than every string starting with
+    prefix, or None if there is none.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+@functools.lru_cache(maxsize=256)
+def like_matcher(pattern):
+    """
+    Compiles a LIKE pattern into a callable taking a string and returning
+    whether it matches. Common shapes avoid regexes altogether: a pattern
+    without wildcards is an equality test, and `abc%`, `%abc` and `%abc%`
+    are `startswith`, `endswith` and substring tests. Compiled patterns are
+    cached, so a pattern is only ever translated once.
+
+    :param pattern: The LIKE pattern.
+    :type pattern: str
+
+    :return: A callable taking a string.
+    :rtype: callable
+    """
+    literal = pattern.strip("%")
+    if "%" not in literal and "_" not in literal:
+        starts, ends = pattern.startswith("%"), pattern.endswith("%")
+        if not starts and not ends:
+            return literal.__eq__
+        if not starts:
+            return operator.methodcaller("startswith", literal)
+        if not ends:
+            return operator.methodcaller("endswith", literal)
+        return operator.methodcaller("__contains__", literal)
+
+    return like_to_regex(pattern).fullmatch
+
+def compile_condition(condition, getter_for, type_for, wrap=None):
+    """
+    Compiles a condition tree, as built by `Query.WHERE`, `AND` and `OR`, into
+    a single predicate. Operators are resolved and literals are coerced once,
+    here, rather than for every row the predicate is applied to.
+
+    :param condition: A condition tuple `(field, operator, value)`, or a dict
+        with a "logic" operator and a list of "conditions".
+    :type condition: tuple or dict
+    :param getter_for: Maps a field name to a callable returning that field's
+        value for a row.
+    :type getter_for: callable
+    :param type_for: Maps a field name to its column type name.
+    :type type_for: callable
+    :param wrap: Called with each condition tuple and its predicate, and
+        returning the predicate to use instead (e.g., to count evaluations).
+    :type wrap: callable, optional
+
+    :return: A callable taking a row and returning whether it matches.
+    :rtype: callable
+
+    :raises ValueError: If the condition, operator or a literal is invalid.
+    """
+    if isinstance(condition, tuple):
+        field, op, value = condition
+        predicate = compile_comparison(getter_for(field), op, strip_quotes(value), type_for(field))
+        return wrap(condition, predicate) if wrap is not None else predicate
+    elif isinstance(condition, dict):
+        logic = condition.get("logic")
+        predicates = [
+            compile_condition(cond, getter_for, type_for, wrap)
+            for cond in condition.get("conditions")
+        ]
+        if logic == "AND" or logic is None:
+            return conjunction(predicates)
+        elif logic == "OR":
+            return disjunction(predicates)
+        else:
+            raise ValueError(f"Invalid logic operator: {logic}")
+    else:
+        raise ValueError(f"Invalid condition: {condition}")
+
+def compile_comparison(get, op, value, col_type):
+    if op == "IS NULL":
+        return lambda row: get(row) is None
+    if op == "IS NOT NULL":
+        return lambda row: get(row) is not None
+    if op is None:
+        # A bare field without an operator never matches
+        return lambda row: False
+
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        literal = coerce_literal(value, col_type)
+    elif op == "IN":
+        literal = [coerce_literal(val, col_type) for val in value]
+        try:
+            literal = frozenset(literal)
+        except TypeError:
+            # Unhashable members; fall back to a linear membership test
+            pass
+        def predicate(row):
+            field_value = get(row)
+            return field_value is not None and field_value in literal
+        return predicate
+    elif op == "BETWEEN":
+        low, high = (coerce_literal(val, col_type) for val in value)
+        def predicate(row):
+            field_value = get(row)
+            return field_value is not None and low <= field_value <= high
+        return predicate
+    elif op == "LIKE":
+        match = like_matcher(value)
+        if col_type == str.__name__:
+            def predicate(row):
+                field_value = get(row)
+                return field_value is not None and match(field_value)
+        else:
+            # Only strings can match a pattern
+            def predicate(row):
+                field_value = get(row)
+                return isinstance(field_value, str) and match(field_value)
+        return predicate
+    else:
+        raise ValueError(f"Invalid operator: {op}")
+
+    def predicate(row):
+        field_value = get(row)
+        return field_value is not None and compare(field_value, literal)
+    return predicate
+
+def conjunction(predicates):
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda row: first(row) and second(row)
+
+    def predicate(row):
+        for pred in predicates:
+            if not pred(row):
+                return False
+        return True
+    return predicate
+
+def disjunction(predicates):
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda row: first(row) or second(row)
+
+    def predicate(row):
+        for pred in predicates:
+            if pred(row):
+                return True
+        return False
+    return predicate
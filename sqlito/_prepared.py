@@ -0,0 +1,270 @@
+import copy
+import itertools
+import re
+import threading
+from collections import OrderedDict
+
+# `?` is a positional placeholder and `:name` a named one
+PLACEHOLDER_PATTERN = re.compile(r"\?|:(\w+)")
+
+def placeholder(value):
+    """
+    Returns the placeholder a literal stands for: "?" for a positional one, the
+    name for a named one, or None if the literal is not a placeholder.
+    """
+    if not isinstance(value, str):
+        return None
+    match = PLACEHOLDER_PATTERN.fullmatch(value.strip())
+    if not match:
+        return None
+    return match.group(1) or "?"
+
+def find_placeholders(condition):
+    # Placeholders of a condition tree, in the order they are bound
+    if condition is None:
+        return []
+    if isinstance(condition, dict):
+        return [name for cond in condition["conditions"] for name in find_placeholders(cond)]
+
+    _, _, value = condition
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [name for name in map(placeholder, values) if name is not None]
+
+class Parameter:
+    """
+    Stands in for a placeholder in the condition tree of a prepared query:
+    `?` by its position among the positional placeholders, and `:name` by
+    its name. The values bound to them are looked up by these keys.
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return isinstance(other, Parameter) and other.key == self.key
+
+    def __hash__(self):
+        return hash((Parameter, self.key))
+
+    def __repr__(self):
+        return f":{self.key}" if isinstance(self.key, str) else "?"
+
+def parameterize(condition, positions):
+    # Returns a copy of a condition tree with its placeholders replaced by
+    # Parameters, numbering the `?` ones from positions (an iterator)
+    if condition is None:
+        return None
+    if isinstance(condition, dict):
+        return {
+            "logic": condition.get("logic"),
+            "conditions": [parameterize(cond, positions) for cond in condition["conditions"]],
+        }
+
+    def replace(value):
+        name = placeholder(value)
+        if name is None:
+            return value
+        return Parameter(next(positions) if name == "?" else name)
+
+    field, op, value = condition
+    if isinstance(value, (list, tuple)):
+        value = type(value)(replace(val) for val in value)
+    else:
+        value = replace(value)
+    return (field, op, value)
+
+def bind_parameters(condition, values):
+    """
+    Returns a copy of a condition tree with each Parameter replaced by the
+    value bound to it. Everything else is shared with the original tree.
+
+    :param condition: Condition tree with Parameters.
+    :type condition: tuple or dict or None
+    :param values: Value of each Parameter, keyed by its key.
+    :type values: dict
+    """
+    if condition is None:
+        return None
+    if isinstance(condition, dict):
+        return {
+            "logic": condition.get("logic"),
+            "conditions": [bind_parameters(cond, values) for cond in condition["conditions"]],
+        }
+
+    field, op, value = condition
+    if type(value) is Parameter:
+        return (field, op, values[value.key])
+    if isinstance(value, (list, tuple)):
+        value = type(value)(values[val.key] if type(val) is Parameter else val for val in value)
+        return (field, op, value)
+    return condition
+
+def freeze(value):
+    # Hashable form of (part of) a query, for use in a cache key
+    if isinstance(value, dict):
+        return tuple((key, freeze(val)) for key, val in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(val) for val in value)
+    if hasattr(value, "get_name"):
+        return value.get_name()
+    return value
+
+def query_shape(query):
+    """
+    Returns a hashable key identifying the shape of a query: everything about
+    it, with placeholders in place of the values bound at execution.
+
+    :param query: The query.
+    :type query: Query
+
+    :return: The cache key.
+    :rtype: tuple
+    """
+    return freeze((
+        query.table,
+        query.joins,
+        query.select_items,
+        query.conditional_fields,
+        query.group_by,
+        query.having,
+        query.order_by,
+        query.order_direction,
+        query.limit,
+        query.parameters,
+    ))
+
+class PreparedQuery:
+    """
+    A query built once, with `?` or `:name` placeholders in its WHERE and
+    HAVING literals, and executed any number of times with values bound to
+    them. The query is parsed once, when it is built, and then planned once
+    per schema version (or once its tables grow enough to make the plan
+    stale): its fields stay resolved, and the way it reads its rows and the
+    order of its conditions are reused. Each execution only binds values.
+    """
+    def __init__(self, db, query):
+        """
+        :param db: The database the query runs against.
+        :type db: Database
+        :param query: The query, built with placeholders.
+        :type query: Query
+        """
+        self.db = db
+        self.schema_version = db.schema_version
+        self.placeholders = find_placeholders(query.conditional_fields) + find_placeholders(query.having)
+        self.positional_count = self.placeholders.count("?")
+        self.named = {name for name in self.placeholders if name != "?"}
+
+        # Every execution runs a copy of this query, sharing its resolved
+        # fields and plans, with only the values of its Parameters set
+        positions = itertools.count()
+        self.query = copy.copy(query)
+        self.query.conditional_fields = parameterize(query.conditional_fields, positions)
+        self.query.having = parameterize(query.having, positions)
+        self.query.parameters = {}
+        self.query.plans = {}
+
+    def bind(self, *args, **kwargs):
+        """
+        Returns a copy of the query with the given values bound to its
+        placeholders. The prepared query itself is never modified, so it can
+        be executed concurrently.
+
+        :param args: Values of the `?` placeholders, in order.
+        :type args: tuple
+        :param kwargs: Values of the `:name` placeholders.
+        :type kwargs: dict
+
+        :return: The bound query.
+        :rtype: Query
+
+        :raises ValueError: If the values don't match the placeholders, or a
+            table of the query was dropped or replaced since it was prepared.
+        """
+        if len(args) != self.positional_count:
+            raise ValueError(f"Expected {self.positional_count} positional parameters, got {len(args)}.")
+        missing = self.named - kwargs.keys()
+        if missing:
+            raise ValueError(f"Missing named parameters: {sorted(missing)}")
+        self.__check_schema()
+
+        values = dict(enumerate(args))
+        values.update(kwargs)
+        # A shallow copy, without going through copy.copy's protocol
+        bound = object.__new__(type(self.query))
+        bound.__dict__.update(self.query.__dict__)
+        bound.parameters = values
+        return bound
+
+    def execute(self, *args, **kwargs):
+        return self.bind(*args, **kwargs).execute()
+
+    def iter(self, *args, **kwargs):
+        return self.bind(*args, **kwargs).iter()
+
+    def __check_schema(self):
+        if self.schema_version == self.db.schema_version:
+            return
+
+        # New indexes are picked up once the query is planned again, but the
+        # query holds on to its tables, which must still be the database's
+        for table in [self.query.table] + [join["table"] for join in self.query.joins]:
+            if self.db.get_table(table.get_name()) is not table:
+                raise ValueError(f"Table {table.get_name()} changed since the query was prepared. Prepare it again.")
+        self.schema_version = self.db.schema_version
+
+class PlanCache:
+    """
+    Least-recently-used cache of prepared queries, keyed by query shape or by
+    a key of the caller's choosing. Cleared whenever the schema of the
+    database changes.
+    """
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.plans = OrderedDict()
+        self.lock = threading.Lock()
+
+    def prepare(self, db, query, key=None):
+        """
+        Returns the prepared query for key, or for the shape of query if no
+        key is given, preparing and caching it if it's not cached yet.
+
+        :param db: The database the query runs against.
+        :type db: Database
+        :param query: The query, built with placeholders, or a callable
+            taking no arguments and building it. The callable is only called
+            when the query isn't cached yet, so with a key, a cached query
+            is found without building it again.
+        :type query: Query or callable
+        :param key: Hashable identifying the query, e.g. its SQL text or a
+            name. Defaults to the shape of the query.
+        :type key: hashable, optional
+
+        :return: The prepared query.
+        :rtype: PreparedQuery
+        """
+        if key is None:
+            query = query() if callable(query) else query
+            key = ("shape", query_shape(query))
+        else:
+            key = ("key", key)
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+                return plan
+
+        # Built outside the lock, so that building may prepare other queries.
+        # Of concurrent callers, the first to finish caches its query.
+        plan = PreparedQuery(db, query() if callable(query) else query)
+        with self.lock:
+            plan = self.plans.setdefault(key, plan)
+            self.plans.move_to_end(key)
+            if len(self.plans) > self.capacity:
+                self.plans.popitem(last=False)
+            return plan
+
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
@@ -0,0 +1,163 @@
+import random
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+# Rows sampled per column by ANALYZE. Columns up to this size are read whole,
+# and their statistics are exact.
+SAMPLE_SIZE = 10_000
+
+# Buckets of each equi-depth histogram
+HISTOGRAM_BUCKETS = 100
+
+# Statistics are sampled again once the table has grown by this fraction
+# (plus STALE_ROWS) since they were last
+STALE_FRACTION = 0.2
+STALE_ROWS = 1_000
+
+def is_stale(sampled_rows, row_count):
+    # Whether what was worked out from sampled_rows rows (statistics, or a
+    # plan made from them) is stale now that the table holds row_count
+    return row_count > sampled_rows * (1 + STALE_FRACTION) + STALE_ROWS
+
+class ColumnStats:
+    """
+    Statistics of a column, as sampled by ANALYZE: the number of rows, the
+    fraction of them that are NULL, an estimate of the number of distinct
+    non-NULL values, and an equi-depth histogram of the non-NULL values.
+
+    The histogram's bounds split the sorted values into buckets holding the
+    same number of rows each, so the fraction of rows below a value is found
+    by locating its bucket, wherever the values are dense or sparse.
+    """
+    def __init__(self, row_count, null_fraction, distinct, bounds):
+        """
+        :param row_count: Rows in the column when it was sampled.
+        :type row_count: int
+        :param null_fraction: Fraction of the rows that are NULL.
+        :type null_fraction: float
+        :param distinct: Estimated number of distinct non-NULL values.
+        :type distinct: int
+        :param bounds: Histogram bounds, from the smallest value to the
+            largest, or None if the values can't be ordered.
+        :type bounds: list or None
+        """
+        self.row_count = row_count
+        self.null_fraction = null_fraction
+        self.distinct = distinct
+        self.bounds = bounds
+
+    def is_stale(self, row_count):
+        return is_stale(self.row_count, row_count)
+
+    def equal_fraction(self):
+        # Values are assumed uniformly spread among the distinct ones
+        if not self.distinct:
+            return 0.0
+        return (1 - self.null_fraction) / self.distinct
+
+    def range_fraction(self, low=None, high=None, include_low=True, include_high=True):
+        """
+        Estimates the fraction of the rows whose values lie between low and
+        high (None for no bound). NULLs are never in a range.
+
+        :return: The fraction, or None if the values can't be ordered, or
+            can't be compared with a bound.
+        :rtype: float or None
+        """
+        if not self.bounds:
+            return None
+        try:
+            below_high = self.__fraction_below(high, include_high) if high is not None else 1.0
+            below_low = self.__fraction_below(low, not include_low) if low is not None else 0.0
+        except TypeError:
+            return None
+        return max(below_high - below_low, 0.0) * (1 - self.null_fraction)
+
+    def __fraction_below(self, value, inclusive):
+        # Fraction of the non-NULL values below (or at, if inclusive) value
+        bounds = self.bounds
+        buckets = len(bounds) - 1
+        position = (bisect_right if inclusive else bisect_left)(bounds, value)
+        if position == 0:
+            return 0.0
+        if position > buckets:
+            return 1.0
+
+        bucket = position - 1
+        low, high = bounds[bucket], bounds[bucket + 1]
+        within = 0.5
+        if isinstance(value, (int, float)) and isinstance(low, (int, float)) and high > low:
+            # Numbers are assumed uniformly spread within their bucket
+            within = min(max((value - low) / (high - low), 0.0), 1.0)
+        return (bucket + within) / buckets
+
+def analyze_column(column, row_count, distinct=None):
+    """
+    Samples a column and computes its statistics.
+
+    :param column: Column storage.
+    :type column: Column
+    :param row_count: Number of rows of the column.
+    :type row_count: int
+    :param distinct: Exact number of distinct non-NULL values, if known
+        (e.g., from a hash index).
+    :type distinct: int, optional
+
+    :return: The statistics.
+    :rtype: ColumnStats
+    """
+    get = column.getter()
+    if row_count <= SAMPLE_SIZE:
+        sample = [get(position) for position in range(row_count)]
+    else:
+        # Random rows (in order, for locality), seeded so that the same data
+        # always gets the same statistics. Evenly spaced rows would alias
+        # with any period in the data.
+        positions = sorted(random.Random(row_count).sample(range(row_count), SAMPLE_SIZE))
+        sample = [get(position) for position in positions]
+
+    values = [value for value in sample if value is not None]
+    null_fraction = 1 - len(values) / len(sample) if sample else 0.0
+
+    if distinct is None:
+        distinct = estimate_distinct(values, row_count * (1 - null_fraction))
+
+    bounds = None
+    try:
+        values.sort()
+    except TypeError:
+        # Values of mixed types can't be ordered
+        values = []
+    if values:
+        buckets = min(HISTOGRAM_BUCKETS, len(values))
+        bounds = [values[(len(values) - 1) * i // buckets] for i in range(buckets + 1)]
+    return ColumnStats(row_count, null_fraction, distinct, bounds)
+
+def estimate_distinct(sample, total):
+    """
+    Estimates the number of distinct values of a column from a sample of its
+    values, with the estimator of Haas and Stokes (1998): values seen once in
+    the sample are the ones likely to have more unseen peers.
+
+    :param sample: Sampled non-NULL values.
+    :type sample: list
+    :param total: Number of non-NULL values of the column.
+    :type total: float
+
+    :return: The estimate.
+    :rtype: int
+    """
+    n = len(sample)
+    if not n:
+        return 0
+    try:
+        counts = Counter(sample)
+    except TypeError:
+        # Unhashable values; assume they are all distinct
+        return int(total)
+    d = len(counts)
+    if n >= total:
+        return d
+    singletons = sum(1 for count in counts.values() if count == 1)
+    estimate = n * d / (n - singletons + singletons * n / total)
+    return int(min(max(estimate, d), total))
@@ -0,0 +1,332 @@
+import functools
+import operator
+from array import array
+
+from sqlito._aggregate import ACCUMULATORS, parse_aggregate
+from sqlito._column import ArrayColumn
+from sqlito._disk import MappedArrayColumn
+from sqlito._predicate import COMPARISONS, coerce_literal, strip_quotes
+
+# Typecodes of ArrayColumn storage, and the NumPy dtypes sharing their layout
+DTYPES = {
+    "q": "int64",
+    "d": "float64",
+}
+
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+# Floats represent every integer in this range exactly
+FLOAT_EXACT_INT = 2**53
+
+def load_numpy():
+    # NumPy is optional, and only imported once the vectorized engine is used
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The vectorized engine requires NumPy. Install it with `pip install numpy`.") from None
+    return numpy
+
+class Unsupported(Exception):
+    """Raised when part of a query can't be vectorized exactly."""
+
+class VectorScan:
+    """
+    Evaluates WHERE conditions and aggregates over the INTEGER and REAL
+    columns of a table with NumPy, as boolean masks and reductions over whole
+    columns rather than one row at a time.
+
+    Only what gives the exact results of the interpreted engine is vectorized.
+    Everything else (TEXT columns, LIKE, columns that degraded to object
+    lists, literals that don't fit the column type) is left to it.
+    """
+    def __init__(self, table):
+        """
+        :param table: Table to scan. Rows inserted after this point are not
+            seen by the scan.
+        :type table: Table
+        """
+        self.np = load_numpy()
+        self.table = table
+        self.row_count = table.get_row_count()
+        self.arrays = {}
+
+    def column(self, name):
+        """
+        Returns the values of a column as a NumPy array, with a boolean array
+        marking its NULLs (or None when it has none). The values are copied,
+        so the table's storage stays free to grow while they are in use.
+
+        :param name: The column name.
+        :type name: str
+
+        :return: The values and NULLs of the column.
+        :rtype: tuple
+
+        :raises Unsupported: If the column is not stored as an array.
+        """
+        if name in self.arrays:
+            return self.arrays[name]
+
+        column = self.storage(name)
+        np, n = self.np, self.row_count
+        if isinstance(column, ArrayColumn):
+            dtype = DTYPES[column.typecode]
+            # Slicing copies the values without exporting the array's buffer,
+            # which would keep a concurrent insert from resizing it
+            values = np.frombuffer(column.values[:n], dtype=dtype) if n else np.empty(0, dtype=dtype)
+        else:
+            # Mapped files are never written to, so they are read in place
+            dtype = DTYPES[column.typecode]
+            values = np.frombuffer(column.values, dtype=dtype, count=n) if n else np.empty(0, dtype=dtype)
+
+        nulls = None
+        if column.nulls is not None:
+            # The bitmap only extends as far as the last NULL, least
+            # significant bit first
+            bits = np.unpackbits(np.frombuffer(bytes(column.nulls), dtype=np.uint8), bitorder="little")[:n]
+            nulls = np.zeros(n, dtype=bool)
+            nulls[:len(bits)] = bits
+        self.arrays[name] = (values, nulls, column.pytype)
+        return self.arrays[name]
+
+    def storage(self, name):
+        """
+        Returns the storage of a column, without reading any of it.
+
+        :raises Unsupported: If the column is not stored as an array.
+        """
+        if not self.table.has_column(self.column_name(name)):
+            # Let the interpreted engine report the invalid field
+            raise Unsupported(name)
+        column = self.table.get_column(self.column_name(name))
+        if isinstance(column, ArrayColumn) and isinstance(column.values, array):
+            return column
+        if isinstance(column, MappedArrayColumn) and self.row_count <= column.count:
+            return column
+        raise Unsupported(name)
+
+    def column_name(self, field):
+        # Fields may be qualified by the table name (e.g., "people.id")
+        table_name, _, col = field.rpartition(".")
+        return col if table_name == self.table.get_name() else field
+
+    def split(self, condition):
+        """
+        Splits a condition tree into a mask of the rows matching its
+        vectorized part, and the part left to evaluate one row at a time. For
+        an AND group, every child that can be vectorized is, and the others
+        are left; any other condition is vectorized whole or not at all.
+
+        :param condition: Condition tree built by `Query.WHERE`, `AND` and `OR`.
+        :type condition: tuple or dict
+
+        :return: The mask, or None if nothing was vectorized, and the
+            remaining condition, or None if everything was.
+        :rtype: tuple
+        """
+        mask, _, residual = self.plan(condition)
+        return (mask() if mask is not None else None), residual
+
+    def plan(self, condition):
+        """
+        Splits a condition tree like `split`, but defers computing the mask,
+        so that nothing is read until it is needed.
+
+        :param condition: Condition tree built by `Query.WHERE`, `AND` and `OR`.
+        :type condition: tuple or dict
+
+        :return: A callable taking no arguments and returning the mask, or
+            None if nothing can be vectorized; the vectorized part of the
+            condition; and the remaining condition, or None if everything
+            can be vectorized. The callable raises Unsupported if a column
+            it reads stopped being stored as an array in the meantime.
+        :rtype: tuple
+        """
+        if isinstance(condition, dict) and condition.get("logic") in ("AND", None):
+            masks, vectorized, residual = [], [], []
+            for cond in condition.get("conditions"):
+                try:
+                    masks.append(self.compile(cond))
+                    vectorized.append(cond)
+                except Unsupported:
+                    residual.append(cond)
+
+            if not masks:
+                return None, None, condition
+            mask = lambda: functools.reduce(operator.and_, (cond_mask() for cond_mask in masks))
+            vectorized = {"logic": condition.get("logic"), "conditions": vectorized}
+            if not residual:
+                return mask, vectorized, None
+            return mask, vectorized, {"logic": condition.get("logic"), "conditions": residual}
+
+        try:
+            return self.compile(condition), condition, None
+        except Unsupported:
+            return None, None, condition
+
+    def mask(self, condition):
+        """
+        Returns a boolean array marking the rows matching a condition tree.
+
+        :raises Unsupported: If any part of the condition can't be vectorized.
+        """
+        return self.compile(condition)()
+
+    def compile(self, condition):
+        """
+        Checks that a condition tree can be vectorized, and returns a callable
+        taking no arguments and returning the boolean array marking the rows
+        matching it.
+
+        :raises Unsupported: If any part of the condition can't be vectorized.
+        """
+        np = self.np
+        if isinstance(condition, dict):
+            logic = condition.get("logic")
+            if logic not in ("AND", None, "OR"):
+                raise Unsupported(logic)
+            masks = [self.compile(cond) for cond in condition.get("conditions")]
+            if logic == "OR":
+                return lambda: functools.reduce(operator.or_, (mask() for mask in masks), np.zeros(self.row_count, dtype=bool))
+            return lambda: functools.reduce(operator.and_, (mask() for mask in masks), np.ones(self.row_count, dtype=bool))
+        if not isinstance(condition, tuple):
+            raise Unsupported(condition)
+
+        field, op, value = condition
+        pytype = self.storage(field).pytype
+        col_type = self.table.types[self.column_name(field)]["type"]
+        value = strip_quotes(value)
+
+        if op == "IS NULL":
+            def compute():
+                _, nulls, _ = self.column(field)
+                return nulls.copy() if nulls is not None else np.zeros(self.row_count, dtype=bool)
+            return compute
+        if op == "IS NOT NULL":
+            def compute():
+                _, nulls, _ = self.column(field)
+                return ~nulls if nulls is not None else np.ones(self.row_count, dtype=bool)
+            return compute
+        if op is None:
+            # A bare field without an operator never matches
+            return lambda: np.zeros(self.row_count, dtype=bool)
+
+        if op in COMPARISONS:
+            literal = self.__scalar(coerce_literal(value, col_type), pytype)
+            compare = lambda values: COMPARISONS[op](values, literal)
+        elif op == "IN":
+            literals = [self.__scalar(coerce_literal(val, col_type), pytype) for val in value]
+            compare = lambda values: np.isin(values, np.array(literals, dtype=values.dtype))
+        elif op == "BETWEEN":
+            low, high = (self.__scalar(coerce_literal(val, col_type), pytype) for val in value)
+            compare = lambda values: (values >= low) & (values <= high)
+        else:
+            # LIKE, or an invalid operator the interpreted engine reports
+            raise Unsupported(op)
+
+        def compute():
+            values, nulls, _ = self.column(field)
+            mask = compare(values)
+            # NULLs never match, and their slots hold a placeholder 0
+            return mask & ~nulls if nulls is not None else mask
+        return compute
+
+    def __scalar(self, literal, pytype):
+        # Only compare a column against a literal NumPy represents exactly in
+        # the column's dtype, so every comparison agrees with Python's
+        if type(literal) is pytype:
+            if pytype is int and not INT64_MIN <= literal <= INT64_MAX:
+                raise Unsupported(literal)
+            return literal
+        if pytype is float and type(literal) is int and -FLOAT_EXACT_INT <= literal <= FLOAT_EXACT_INT:
+            return float(literal)
+        if pytype is int and type(literal) is float and literal.is_integer() and INT64_MIN <= literal <= INT64_MAX:
+            return int(literal)
+        raise Unsupported(literal)
+
+    def aggregate(self, aggregate_calls, condition):
+        """
+        Computes aggregate calls over the rows matching condition, with one
+        reduction per call over the selected values of its column.
+
+        :param aggregate_calls: Aggregate calls, e.g. ["COUNT(*)", "SUM(x)"].
+        :type aggregate_calls: list[str]
+        :param condition: The WHERE condition tree, or None.
+        :type condition: tuple or dict
+
+        :return: The value of each aggregate call, keyed by the call, or None
+            if the condition or a column can't be vectorized.
+        :rtype: dict or None
+
+        :raises ValueError: If an aggregate call is invalid, or no rows match.
+        """
+        np = self.np
+        specs = [parse_aggregate(call) for call in aggregate_calls]
+
+        mask, residual = self.split(condition) if condition else (None, None)
+        if residual is not None:
+            return None
+        try:
+            columns = {field: self.column(field) for _, field in specs if field != "*"}
+        except Unsupported:
+            return None
+
+        selected = self.row_count if mask is None else int(np.count_nonzero(mask))
+        if not selected:
+            raise ValueError(f"No values found for field: {specs[0][1]}")
+
+        results = {}
+        for call, (aggregate_name, field) in zip(aggregate_calls, specs):
+            if field == "*":
+                results[call] = selected
+                continue
+
+            values, nulls, pytype = columns[field]
+            keep = mask
+            if nulls is not None:
+                keep = ~nulls if keep is None else keep & ~nulls
+            if keep is not None:
+                values = values[keep]
+            results[call] = self.__reduce(aggregate_name, values, pytype)
+        return results
+
+    def __reduce(self, aggregate_name, values, pytype):
+        # Reduces the non-NULL values of a column like its accumulator would
+        np = self.np
+        count = len(values)
+        if aggregate_name == "COUNT":
+            return count
+        if not count:
+            return ACCUMULATORS[aggregate_name].empty
+
+        if aggregate_name in ("SUM", "AVG"):
+            total = self.__sum(values, pytype)
+            return total if aggregate_name == "SUM" else total / count
+
+        if pytype is float and np.isnan(values).any():
+            # NaN compares false both ways, so the result depends on where it
+            # stands; let the accumulator walk the values in order instead
+            accumulator = ACCUMULATORS[aggregate_name]()
+            for value in values.tolist():
+                accumulator.update(value)
+            return accumulator.result()
+
+        # argmax/argmin return the first of equal values, like the accumulators
+        position = np.argmax(values) if aggregate_name == "MAX" else np.argmin(values)
+        return values[position].item()
+
+    def __sum(self, values, pytype):
+        np = self.np
+        if pytype is int:
+            # int64 sums wrap around, so only use NumPy when they can't
+            # overflow, and Python's unbounded ints otherwise
+            bound = max(abs(int(values.min())), abs(int(values.max())))
+            if bound * len(values) <= INT64_MAX:
+                return int(values.sum())
+            return sum(values.tolist())
+
+        # The interpreted engine adds floats in row order; np.sum adds them
+        # pairwise, which rounds differently, while a running sum does not.
+        # Adding 0.0 turns a -0.0 total into 0.0, as starting from 0 would.
+        with np.errstate(all="ignore"):
+            return np.add.accumulate(values)[-1].item() + 0.0
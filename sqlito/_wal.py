@@ -0,0 +1,186 @@
+import marshal
+import os
+import struct
+import threading
+import zlib
+
+WAL_FILE = "sqlito.wal"
+
+# Each record is framed by its length, its sequence number and the CRC32 of
+# its payload, so that a record torn by a crash is detected and dropped
+FRAME = struct.Struct("<IQI")
+
+# Mutations recorded in the log
+CREATE_TABLE, INSERT, DROP_TABLE, CREATE_INDEX = "CREATE_TABLE", "INSERT", "DROP_TABLE", "CREATE_INDEX"
+
+# When the log is flushed to disk:
+# - "commit": before every commit returns
+# - "group": before every commit returns, with commits waiting at the same
+#   time sharing a single fsync
+# - "interval": every interval_ms, in the background. Commits return as
+#   soon as the OS has the record, so a machine crash (but not a process
+#   crash) may lose the last interval_ms of them.
+SYNC_POLICIES = ["commit", "group", "interval"]
+
+def encode_record(seq, record):
+    # marshal is compact and fast, and, unlike pickle, can't run code on load
+    payload = marshal.dumps(record)
+    return FRAME.pack(len(payload), seq, zlib.crc32(payload)) + payload
+
+def read_records(path):
+    """
+    Reads the records of a log, stopping at the first incomplete or corrupt
+    one (the one a crash interrupted).
+
+    :param path: Path of the log.
+    :type path: str
+
+    :return: Every complete record, as (sequence number, record) pairs, and
+        the offset where they end.
+    :rtype: tuple[list[tuple], int]
+    """
+    records = []
+    end = 0
+    if not os.path.exists(path):
+        return records, end
+
+    with open(path, "rb") as file:
+        data = file.read()
+    while end + FRAME.size <= len(data):
+        length, seq, crc = FRAME.unpack_from(data, end)
+        payload = data[end + FRAME.size:end + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        try:
+            records.append((seq, marshal.loads(payload)))
+        except (EOFError, ValueError, TypeError):
+            break
+        end += FRAME.size + length
+    return records, end
+
+class WriteAheadLog:
+    """
+    Append-only log of the mutations of a database since its last
+    checkpoint. Every mutation is appended as one record before it is
+    applied, and replayed when the database is opened again.
+    """
+    def __init__(self, path, seq=0, end=None, sync="commit", interval_ms=100):
+        """
+        :param path: Path of the log.
+        :type path: str
+        :param seq: Sequence number of the last record already written.
+        :type seq: int
+        :param end: Offset where the complete records of the log end, as
+            returned by `read_records`. Anything after it is dropped.
+        :type end: int, optional
+        :param sync: When the log is flushed to disk (see SYNC_POLICIES).
+        :type sync: str
+        :param interval_ms: How often the log is flushed with "interval".
+        :type interval_ms: int
+
+        :raises ValueError: If sync is not a valid policy.
+        """
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"Invalid sync policy: {sync}. Valid policies: {SYNC_POLICIES}")
+        self.path = path
+        self.sync = sync
+        self.seq = self.durable = seq
+        if end is not None and os.path.exists(path):
+            os.truncate(path, end)
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+        # lock serializes appends; sync_lock elects the one committer that
+        # flushes the log for every other one waiting on it
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+
+        self.stopped = threading.Event()
+        self.flusher = None
+        if sync == "interval":
+            self.flusher = threading.Thread(target=self.__flush_every, args=(interval_ms / 1000,), daemon=True)
+            self.flusher.start()
+
+    def commit(self, record):
+        """
+        Appends a record to the log, returning once it is as durable as the
+        sync policy requires.
+
+        :param record: The mutation, a tuple of values marshal can encode.
+        :type record: tuple
+
+        :return: The sequence number of the record.
+        :rtype: int
+        """
+        seq = self.append(record)
+        self.wait_durable(seq)
+        return seq
+
+    def append(self, record):
+        """
+        Appends a record to the log. With the "group" policy, it is only
+        durable once `wait_durable` returns, which callers should wait for
+        without holding any lock other committers need: the committers
+        waiting at the same time are what share an fsync.
+
+        :param record: The mutation, a tuple of values marshal can encode.
+        :type record: tuple
+
+        :return: The sequence number of the record.
+        :rtype: int
+        """
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            frame = encode_record(seq, record)
+            self.file.write(frame)
+            self.file.flush()
+            self.size += len(frame)
+            if self.sync == "commit":
+                os.fsync(self.file.fileno())
+                self.durable = seq
+        return seq
+
+    def wait_durable(self, seq):
+        # Returns once the record appended as seq is as durable as the sync
+        # policy requires
+        if self.sync == "group":
+            self.__wait_durable(seq)
+
+    def __wait_durable(self, seq):
+        # The first committer to get here flushes everything written so far;
+        # the ones that queued up behind it then find their record durable
+        with self.sync_lock:
+            if self.durable >= seq:
+                return
+            with self.lock:
+                target = self.seq
+            os.fsync(self.file.fileno())
+            self.durable = target
+
+    def __flush_every(self, interval):
+        while not self.stopped.wait(interval):
+            self.flush()
+
+    def flush(self):
+        with self.sync_lock:
+            with self.lock:
+                target = self.seq
+            if self.durable < target:
+                os.fsync(self.file.fileno())
+                self.durable = target
+
+    def truncate(self):
+        # Empties the log, once everything in it is in the table files
+        with self.sync_lock, self.lock:
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.size = 0
+            self.durable = self.seq
+
+    def close(self):
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        self.file.close()
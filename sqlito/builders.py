@@ -1,4 +1,6 @@
 from sqlito.table import Table
+from sqlito._index import HashIndex, INDEX_TYPES
+from sqlito._wal import CREATE_INDEX, INSERT
 
 class RowBuilder:
     def __init__(self, db, name, col_names):
@@ -13,7 +15,7 @@ class RowBuilder:
         for col in col_names:
             if not self.table:
                 raise ValueError(f"Table '{name}' does not exist.")
-            if col not in self.table.get_columns():
+            if not self.table.has_column(col):
                 raise ValueError(f"Column '{col}' does not exist in table '{name}'.")
             
     def VALUES(self, values):
@@ -26,54 +28,133 @@ class RowBuilder:
         # Create a new row with the specified values
         new_row = {col: val for col, val in zip(self.col_names, values)}
 
-        # Check if the number of values is less than the number of columns
-        all_columns = self.table.get_columns()
-        if len(values) < len(all_columns):
-            # If so, then we can (try to) fill in the remaining columns with 
-            # their default values.
-            
-            # Add None values for the remaining columns
-            for col in all_columns:
-                if col not in self.col_names:
-                    values.append(None)
-
-            for col in all_columns:
-                contraints = self.table.types[col]
-                # Set value of column to its default value if it exists and not
-                # already set
-                if contraints["default"] and new_row[col] is None:
-                    new_row[col] = contraints["default"]
-                elif not contraints["allows_null"]:
-                    raise ValueError(f"Column '{col}' does not allow NULL values.")
-        
-        for col, val in new_row.items():
-            constraints = self.table.types[col]
-            if val is None:
-                if constraints["default"]:
-                    new_row[col] = constraints["default"]
-                elif not constraints["allows_null"]:
-                    raise ValueError(f"Column '{col}' does not allow NULL values.")
-
-            col_type = constraints["type"]
-            if not isinstance(val, self.__get_type(col_type)):
-                raise TypeError(f"Value '{val}' for column '{col}' is not of type '{col_type}'.")
+        # Any column not given is filled in below, with its default value if
+        # it has one and NULL otherwise
+        for col in self.table.get_columns():
+            if col not in new_row:
+                new_row[col] = None
+
+        # Constraints are checked and the row logged and inserted under the
+        # database's mutation lock and the table's write lock, so that no
+        # other writer inserts in between. Waiting for the log to be durable
+        # is left until both are released.
+        with self.db.mutation_lock, self.table.write_lock:
+            for col, val in new_row.items():
+                constraints = self.table.types[col]
+                if val is None:
+                    if constraints.get("default") is not None:
+                        val = new_row[col] = constraints["default"]
+                    elif not constraints["allows_null"] and not self.table.inferred:
+                        # Inferred columns only record whether they hold a
+                        # NULL yet, and allow one from then on
+                        raise ValueError(f"Column '{col}' does not allow NULL values.")
+                    else:
+                        continue
+
+                col_type = constraints["type"]
+                if col_type and not isinstance(val, self.__get_type(col_type)):
+                    raise TypeError(f"Value '{val}' for column '{col}' is not of type '{col_type}'.")
             
-            if constraints["unique"]:
-                for row in self.table.get_data():
-                    if row[col] == val:
+                # Unique columns are backed by a hash index, so this is a single
+                # lookup rather than a scan of every row
+                if constraints.get("unique"):
+                    if self.table.get_index(col, HashIndex.kind).contains(val):
                         raise ValueError(f"Value '{val}' for column '{col}' must be unique.")
                     
-        self.table.get_data().append(new_row)
+            seq = self.db.log(INSERT, self.name, {col: [val] for col, val in new_row.items()})
+            self.table.append_row(new_row)
+        self.db.commit(seq)
+
+    def VALUES_MANY(self, rows):
+        """
+        Inserts many rows at once. Every row is validated before any is
+        inserted, so either all the rows are inserted or, if any is invalid,
+        none is. Validation is done a column at a time over the whole batch,
+        and unique columns are checked against a set of the batch's values
+        plus the column's index.
+
+        :param rows: Values of each row, in the order of the column names
+            given to INSERT_INTO. Any iterable works, including a generator.
+        :type rows: iterable[list or tuple]
+
+        :raises TypeError: If a row is not a list or tuple, or a value is not
+            of its column's type.
+        :raises ValueError: If a row has the wrong number of values, or a
+            value breaks a NOT NULL or UNIQUE constraint.
+        """
+        if isinstance(rows, (str, bytes, dict)) or not hasattr(rows, "__iter__"):
+            raise TypeError("Rows must be an iterable of lists.")
+
+        rows = list(rows)
+        if not rows:
+            return
+        # Check the whole batch at once, and only look for the offending row
+        # when there is one
+        if not all(issubclass(row_type, (list, tuple)) for row_type in set(map(type, rows))):
+            i = next(i for i, row in enumerate(rows) if not isinstance(row, (list, tuple)))
+            raise TypeError(f"Row {i} must be a list.")
+        if set(map(len, rows)) != {len(self.col_names)}:
+            i, row = next((i, row) for i, row in enumerate(rows) if len(row) != len(self.col_names))
+            raise ValueError(f"Row {i}: number of values ({len(row)}) does not match number of columns ({len(self.col_names)}).")
+
+        # Transpose the rows into one list of values per column. Any column
+        # not given is filled in below, with its default value if it has one
+        # and NULL otherwise.
+        given = dict(zip(self.col_names, map(list, zip(*rows))))
+        columns = {col: given[col] if col in given else [None] * len(rows) for col in self.table.get_columns()}
+
+        with self.db.mutation_lock, self.table.write_lock:
+            for col, values in columns.items():
+                self.__validate_column(col, values)
+
+            seq = self.db.log(INSERT, self.name, columns)
+            self.table.append_batch(columns)
+        self.db.commit(seq)
+
+    def __validate_column(self, col, values):
+        # Applies the column's constraints to a batch of its values, filling
+        # in its default for NULLs in place
+        constraints = self.table.types[col]
+        if None in values:
+            if constraints.get("default") is not None:
+                default = constraints["default"]
+                values[:] = [default if val is None else val for val in values]
+            elif not constraints["allows_null"] and not self.table.inferred:
+                raise ValueError(f"Column '{col}' does not allow NULL values.")
+
+        col_type = constraints["type"]
+        if col_type:
+            # Check each distinct type once rather than every value
+            python_type = self.__get_type(col_type)
+            for value_type in set(map(type, values)) - {type(None)}:
+                if not issubclass(value_type, python_type):
+                    val = next(val for val in values if type(val) is value_type)
+                    raise TypeError(f"Value '{val}' for column '{col}' is not of type '{col_type}'.")
+
+        # Unique columns are backed by a hash index, so the batch is checked
+        # with set operations rather than a scan of every row
+        if constraints.get("unique"):
+            index = self.table.get_index(col, HashIndex.kind)
+            non_null = [val for val in values if val is not None] if None in values else values
+            batch = set(non_null)
+            if len(batch) == len(non_null) and not index.contains_any(batch):
+                return
+
+            seen = set()
+            for val in non_null:
+                if val in seen or index.contains(val):
+                    raise ValueError(f"Value '{val}' for column '{col}' must be unique.")
+                seen.add(val)
 
     def __get_type(self, type_str):
-        # Map SQL types to Python types
-        sql_to_python = {
-            "TEXT": str,
-            "INTEGER": int,
-            "REAL": float,
-            "BLOB": bytes
+        # Map the Python type names kept in Table.types to Python types
+        name_to_python = {
+            str.__name__: str,
+            int.__name__: int,
+            float.__name__: float,
+            bytes.__name__: bytes
         }
-        return sql_to_python.get(type_str.strip().upper(), str)
+        return name_to_python.get(type_str, str)
     
 class TableBuilder:
     def __init__(self, db, name):
@@ -152,13 +233,55 @@ class TableBuilder:
             else:
                 return self.db.get_table(self.name)
             
-        init_row = {col: None for col in self.columns}
-
-        # Create the new table with the specified columns and types
-        new_table = Table(self.name, [init_row])
-        new_table.types = self.types
+        # Create the new (empty) table with the specified columns and types
+        new_table = Table(self.name, [], types=self.types)
 
         # Add the new table to the database
         self.db.insert_table((self.name, new_table))
 
-        return self.db
\ No newline at end of file
+        return self.db
+
+class IndexBuilder:
+    def __init__(self, db, table_name, column):
+        self.db = db
+        self.table_name = table_name
+        self.column = column
+        self.kind = HashIndex.kind
+        self.will_raise_exists = True
+
+    def IF_NOT_EXISTS(self):
+        self.will_raise_exists = False
+        return self
+
+    def USING(self, kind):
+        # HASH serves point lookups, ORDERED also serves ranges and ORDER BY
+        kind = kind.strip().upper()
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Invalid index type: {kind}. Valid types: {list(INDEX_TYPES)}")
+        self.kind = kind
+        return self
+
+    def execute(self):
+        table = self.db.get_table(self.table_name)
+        if not table:
+            raise ValueError(f"Table '{self.table_name}' does not exist.")
+        if not table.has_column(self.column):
+            raise ValueError(f"Column '{self.column}' does not exist in table '{self.table_name}'.")
+
+        with self.db.mutation_lock, table.write_lock:
+            # does the index exist already?
+            if table.get_index(self.column, self.kind):
+                # if "IF NOT EXISTS" was not called, raise an error
+                if self.will_raise_exists:
+                    raise ValueError(f"{self.kind} index on '{self.table_name}.{self.column}' already exists.")
+                else:
+                    return self.db
+
+            # Build the index over the existing rows. The table keeps it
+            # current on every insert from then on.
+            seq = self.db.log(CREATE_INDEX, self.table_name, self.column, self.kind)
+            table.add_index(INDEX_TYPES[self.kind](self.column, table.get_column(self.column)))
+        self.db.invalidate_plans()
+        self.db.commit(seq)
+
+        return self.db
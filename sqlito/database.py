@@ -1,6 +1,16 @@
-from sqlito.builders import TableBuilder, RowBuilder
+import glob
+import os
+import threading
+
+from sqlito.builders import TableBuilder, RowBuilder, IndexBuilder
 from sqlito.table import Table
-from sqlito.exceptions import 
+from sqlito._disk import FILE_SUFFIX, read_table, write_table
+from sqlito._index import INDEX_TYPES
+from sqlito._output import FORMATTERS
+from sqlito._parallel import default_workers, fork_available
+from sqlito._prepared import PlanCache
+from sqlito._vectorized import load_numpy
+from sqlito._wal import CREATE_INDEX, CREATE_TABLE, DROP_TABLE, INSERT, WAL_FILE, WriteAheadLog, read_records
 
 class Database:
     def __init__(self, tables=[]):
@@ -17,44 +27,368 @@ class Database:
 
         self.mode_setting = "off"
         self.timer_setting = True
+        self.engine_setting = "interpreted"
+        self.workers_setting = 1
+
+        # Prepared queries, keyed by query shape or by the caller's key. Any
+        # change to the schema bumps the version and empties the cache.
+        self.schema_version = 0
+        self.plan_cache = PlanCache()
+
+        # Runs of `Query.execute_async` in progress, keyed by event loop and
+        # query, which identical queries await rather than run again
+        self.in_flight = {}
+
+        # Directory the database was opened from, if any, and its write-ahead
+        # log. lsn is the sequence number of the last mutation logged, and
+        # checkpoints the one each table file was last written at.
+        self.path = None
+        self.wal = None
+        self.lsn = 0
+        self.checkpoints = {}
+        self.dirty_tables = set()
+        self.checkpoint_bytes = None
+
+        # Every mutation is logged and applied under this lock, and every
+        # checkpoint taken under it, so that no record is logged between
+        # the table files being written and the log being emptied
+        self.mutation_lock = threading.RLock()
+
+        # Tables only loaded once first accessed, keyed by name, with their
+        # column types and a callable returning the loaded table
+        self.pending_tables = {}
+
+    @classmethod
+    def open(cls, path, sync="commit", interval_ms=100, checkpoint_bytes=64 * 1024 * 1024):
+        """
+        Opens a database saved with `save`. Table files are mapped into memory
+        rather than read, so opening takes the same time whatever the size of
+        the data, and tables may be larger than memory. Column data is read
+        (and, for TEXT and BLOB columns, decoded a page at a time) as queries
+        touch it.
+
+        Mutations (CREATE TABLE, CREATE INDEX, INSERT, DROP TABLE) are then
+        recorded in a write-ahead log before they are applied, and the log is
+        replayed the next time the database is opened, so that none is lost
+        in a crash. Once the log grows past checkpoint_bytes, the tables it
+        changed are written back to their files and it is emptied.
+
+        :param path: Directory holding the table files. Created if needed.
+        :type path: str
+        :param sync: When the log is flushed to disk: "commit" (before every
+            mutation returns), "group" (likewise, but concurrent mutations
+            share a flush) or "interval" (every interval_ms).
+        :type sync: str, optional
+        :param interval_ms: How often the log is flushed with "interval".
+        :type interval_ms: int, optional
+        :param checkpoint_bytes: Size of the log that triggers a checkpoint,
+            or None to only checkpoint when `checkpoint` is called.
+        :type checkpoint_bytes: int, optional
+
+        :return: The database.
+        :rtype: Database
+
+        :raises ValueError: If a file is not a valid table file, or sync is
+            not a valid policy.
+        """
+        os.makedirs(path, exist_ok=True)
+        files = sorted(glob.glob(os.path.join(glob.escape(path), "*" + FILE_SUFFIX)))
+        tables = [read_table(file, Table) for file in files]
+
+        db = cls([table for table, _ in tables])
+        db.path = path
+        db.checkpoints = {table.get_name(): lsn for table, lsn in tables}
+        db.lsn = max(db.checkpoints.values(), default=0)
+        db.checkpoint_bytes = checkpoint_bytes
+
+        wal_path = os.path.join(path, WAL_FILE)
+        records, end = read_records(wal_path)
+        for seq, record in records:
+            db.__replay(seq, record)
+        db.lsn = max([db.lsn] + [seq for seq, _ in records])
+        db.wal = WriteAheadLog(wal_path, db.lsn, end, sync, interval_ms)
+        return db
+
+    def __replay(self, seq, record):
+        # Applies a logged mutation, unless the table files already reflect it
+        op, name, *args = record
+        table = self.tables.get(name)
+        if table is not None and seq <= self.checkpoints.get(name, 0):
+            return
+
+        if op == CREATE_TABLE:
+            types, = args
+            self.tables[name] = Table(name, [], types=types)
+        elif op == INSERT:
+            columns, = args
+            table.append_batch(columns)
+        elif op == DROP_TABLE:
+            self.tables.pop(name, None)
+        elif op == CREATE_INDEX:
+            column, kind = args
+            if table.get_index(column, kind) is None:
+                table.add_index(INDEX_TYPES[kind](column, table.get_column(column)))
+        self.dirty_tables.add(name)
+        self.invalidate_plans()
+
+    def log(self, op, name, *args):
+        """
+        Records a mutation of a table in the write-ahead log, if the database
+        has one. Must be called with `mutation_lock` held, before the mutation
+        is applied, and followed by `commit` once it is and the lock is
+        released.
+
+        :param op: The kind of mutation, e.g. INSERT.
+        :type op: str
+        :param name: Name of the table mutated.
+        :type name: str
+        :param args: The mutation's arguments (see `__replay`).
+        :type args: tuple
+
+        :return: The sequence number of the record, or None without a log.
+        :rtype: int or None
+        """
+        if self.wal is None:
+            return None
+        self.lsn = self.wal.append((op, name) + args)
+        self.dirty_tables.add(name)
+        return self.lsn
+
+    def commit(self, seq):
+        """
+        Waits for the record of a logged (and applied) mutation to be as
+        durable as the log's sync policy requires, then checkpoints if the
+        log has grown large enough. Called without holding `mutation_lock`,
+        so that concurrent writers share a flush.
+
+        :param seq: Sequence number returned by `log`, or None.
+        :type seq: int or None
+        """
+        if seq is None or self.wal is None:
+            return
+        self.wal.wait_durable(seq)
+        self.maybe_checkpoint()
+
+    def maybe_checkpoint(self):
+        with self.mutation_lock:
+            if self.wal is not None and self.checkpoint_bytes is not None and self.wal.size > self.checkpoint_bytes:
+                self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Writes the tables changed since the last checkpoint to their files,
+        and empties the write-ahead log.
+
+        :return: The database.
+        :rtype: Database
+        """
+        if self.path is None:
+            raise ValueError("Only a database opened from a path can be checkpointed.")
+        with self.mutation_lock:
+            self.__write_tables(self.path, self.dirty_tables)
+            if self.wal is not None:
+                self.wal.truncate()
+            self.dirty_tables = set()
+        return self
+
+    def save(self, path=None):
+        """
+        Writes every table to its own file in a directory, in a format that
+        `Database.open` maps into memory. Each file is replaced only once it
+        is completely written.
+
+        :param path: Directory to write to. Defaults to the directory the
+            database was opened from.
+        :type path: str, optional
+
+        :return: The database.
+        :rtype: Database
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path given to save the database to.")
+        for name in list(self.pending_tables):
+            self.get_table(name)
+        with self.mutation_lock:
+            if path == self.path:
+                # Everything is written, which is a full checkpoint. Tables
+                # dropped since the last one stay dirty, so their files go.
+                self.dirty_tables |= set(self.tables)
+                return self.checkpoint()
+
+            os.makedirs(path, exist_ok=True)
+            # Also remove the files of tables deleted since it was last saved to
+            files = glob.glob(os.path.join(glob.escape(path), "*" + FILE_SUFFIX))
+            self.__write_tables(path, set(self.tables).union(os.path.basename(file)[:-len(FILE_SUFFIX)] for file in files))
+        return self
+
+    def __write_tables(self, path, names):
+        for name in names:
+            file = os.path.join(path, name + FILE_SUFFIX)
+            if name in self.tables:
+                write_table(self.tables[name], file, self.lsn)
+                if path == self.path:
+                    self.checkpoints[name] = self.lsn
+            elif os.path.exists(file):
+                # Dropped since it was last written
+                os.remove(file)
+                if path == self.path:
+                    self.checkpoints.pop(name, None)
+        # Make the new files, and the removal of old ones, durable
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        # Flushes and closes the write-ahead log, if any
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
 
     def CREATE_TABLE(self, name):
         return TableBuilder(self, name)
+
+    def CREATE_INDEX(self, table, column):
+        return IndexBuilder(self, table, column)
     
     def INSERT_INTO(self, name, col_names):
         return RowBuilder(self, name, col_names)
 
+    def ANALYZE(self, *names):
+        # Samples the column statistics of the named tables (all by default)
+        # for the query planner. Stale statistics are otherwise sampled again
+        # when a query first needs them.
+        for name in names or self.get_tables():
+            table = self.get_table(name)
+            if table is None:
+                raise ValueError(f"Table '{name}' does not exist.")
+            table.analyze()
+        return self
+
     def insert_table(self, table):
         name, data = table
-        self.tables[name] = data
+        with self.mutation_lock:
+            seq = None
+            if self.wal is not None:
+                seq = self.log(CREATE_TABLE, name, data.types)
+                if data.get_row_count():
+                    seq = self.log(INSERT, name, {col: list(data.get_column(col)) for col in data.get_columns()})
+            self.tables[name] = data
+            self.pending_tables.pop(name, None)
+            self.invalidate_plans()
+        self.commit(seq)
 
     def delete_table(self, name):
-        return self.tables.pop(name, None)
+        with self.mutation_lock:
+            seq = self.log(DROP_TABLE, name) if name in self.tables else None
+            self.invalidate_plans()
+            self.pending_tables.pop(name, None)
+            table = self.tables.pop(name, None)
+        self.commit(seq)
+        return table
+
+    def add_lazy_table(self, name, types, loader):
+        """
+        Adds a table that is only loaded when first accessed through
+        `get_table`. Until then, it is listed by `get_tables` and `schema`.
+
+        :param name: Name of the table.
+        :type name: str
+        :param types: Type and constraints of each column.
+        :type types: dict
+        :param loader: Callable taking no arguments and returning the table.
+        :type loader: callable
+        """
+        if name in self.tables or name in self.pending_tables:
+            raise ValueError(f"Table '{name}' already exists.")
+        self.pending_tables[name] = (types, loader)
+        self.invalidate_plans()
+
+    def prepare(self, query, key=None):
+        # Returns a reusable PreparedQuery, with `?` or `:name` placeholders
+        # bound when it's executed (e.g., prepare(query).execute(42)). With a
+        # key (e.g., a name), query may be a callable building the query, only
+        # called if no query is prepared under that key yet:
+        #     db.prepare(lambda: Query(db)..., key="person by id").execute(42)
+        return self.plan_cache.prepare(self, query, key)
+
+    def invalidate_plans(self):
+        self.schema_version += 1
+        self.plan_cache.clear()
     
     def drop_table(self, names):
         for name in names:
             self.delete_table(name)
 
     def get_tables(self):
-        return self.tables.keys()
+        return [*self.tables, *self.pending_tables]
     
     def get_table(self, name):
-        for table_name in self.tables:
-            if table_name == name:
-                return self.tables[table_name]
-        return None
+        if name in self.pending_tables:
+            _, loader = self.pending_tables[name]
+            self.tables[name] = loader()
+            del self.pending_tables[name]
+        return self.tables.get(name)
     
     def schema(self):
-        return {name: table.types for name, table in self.tables.items()}
+        schema = {name: table.types for name, table in self.tables.items()}
+        schema.update((name, types) for name, (types, _) in self.pending_tables.items())
+        return schema
     
     def mode(self, mode_str):
-        valid_modes = ['off', 'python', 'table', 'tabs', 'csv']
+        valid_modes = ['off'] + list(FORMATTERS)
 
         if mode_str not in valid_modes:
-            raise ValueError("Invalid mode. Valid modes: {valid_modes}")
+            raise ValueError(f"Invalid mode. Valid modes: {valid_modes}")
         self.mode_setting = mode_str
         return self
 
+    def engine(self, engine_str):
+        # "vectorized" evaluates conditions and aggregates on numeric columns
+        # with NumPy, which must then be installed
+        valid_engines = ['interpreted', 'vectorized']
+
+        if engine_str not in valid_engines:
+            raise ValueError(f"Invalid engine. Valid engines: {valid_engines}")
+        if engine_str == "vectorized":
+            load_numpy()
+        self.engine_setting = engine_str
+        return self
+
+    def parallel(self, workers=None):
+        """
+        Sets the number of worker processes full scans of large tables are
+        split across: their rows are filtered, and aggregated or grouped, a
+        morsel at a time in forked workers, and the partial results merged.
+        Index lookups, joins and small tables are still scanned serially.
+
+        Workers are forked from the process running the query, and a fork
+        copies every lock but only the thread that forked. So while any other
+        thread runs (e.g., queries run with `Query.execute_async`, or the log
+        flusher of a database opened with sync="interval"), scans fall back
+        to being serial rather than risk a worker waiting forever on a lock
+        another thread held.
+
+        :param workers: Number of workers. Defaults to one per available
+            core; 1 scans serially.
+        :type workers: int, optional
+
+        :return: The database.
+        :rtype: Database
+
+        :raises ValueError: If workers is not a positive integer, or worker
+            processes can't be forked on this platform.
+        """
+        workers = default_workers() if workers is None else workers
+        if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+            raise ValueError("Invalid number of workers. It must be a positive integer.")
+        if workers > 1 and not fork_available():
+            raise ValueError("Parallel scans require forking worker processes, which this platform doesn't support.")
+        self.workers_setting = workers
+        return self
+
     def timer(self, timer_str):
         timer_vals = {
             "on": True,
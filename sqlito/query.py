@@ -1,5 +1,23 @@
+import heapq
+import itertools
+import operator
 import re
 import time
+from array import array
+
+from sqlito._aggregate import Aggregation, parse_aggregate
+from sqlito._async import CHUNK_SIZE, iter_async, run_coalesced
+from sqlito._csv import write_csv
+from sqlito._explain import QueryPlan, describe_condition
+from sqlito._index import OrderedIndex, plan_lookup
+from sqlito._join import join_rows
+from sqlito._output import FORMATTERS
+from sqlito._parallel import PARALLEL_MIN_ROWS, fork_safe, map_morsels
+from sqlito._planner import CANDIDATE_COST, ROW_COST, Planner, sort_cost
+from sqlito._predicate import compile_condition
+from sqlito._prepared import bind_parameters, query_shape
+from sqlito._stats import is_stale
+from sqlito._vectorized import Unsupported, VectorScan
 
 class Query:
     def __init__(self, db):
@@ -7,28 +25,30 @@ class Query:
         self.table = None # Table to be queried
 
         self.select_fields = []
-        self.conditional_fields = {"conditions": []}
+        self.conditional_fields = None
         self.aggregate_fields = []
         self.order_by = None
         self.order_direction = "ASC"
         self.limit = None
         self.last_condition_ref = None
+        self.select_items = []
+        self.group_by = []
+        self.having = None
+        self.joins = []
+
+        # Fields resolved so far (see `__resolve`). A prepared query also
+        # keeps the values bound to its Parameters, and its plans (see
+        # `__plan_scan`), shared with every copy it's executed as.
+        self.fields = {}
+        self.parameters = None
+        self.plans = {}
 
     def SELECT(self, *fields):
-        has_aggregates    = any(callable(field) for field in fields)
-        has_no_aggregates = any(not callable(field) for field in fields)
-
-        if has_aggregates and has_no_aggregates:
-            raise ValueError("Cannot mix aggregate functions and fields in SELECT.")
-
-        # Since we validated that they can't mix,
-        # now we just check whether these are aggregate funcs or fields
-        if has_aggregates:
-            self.select_fields = []
-            self.aggregate_fields = [field(self) for field in fields]
-        else:
-            self.select_fields = fields
-            self.aggregate_fields = []
+        # Aggregate funcs and fields can only be mixed when grouping, which is
+        # validated once the whole query is known, in execute()
+        self.select_items = [field(self) if callable(field) else field for field in fields]
+        self.select_fields = [field for field in fields if not callable(field)]
+        self.aggregate_fields = [item for field, item in zip(fields, self.select_items) if callable(field)]
 
         return self
     
@@ -43,8 +63,38 @@ class Query:
             raise ValueError(f"{table_name} is not a valid table in this database.")
         
         self.table = self.db.get_table(table_name)
+        self.fields = {}
         return self
     
+    def JOIN(self, table_name):
+        return self.__add_join(table_name, "INNER")
+
+    def LEFT_JOIN(self, table_name):
+        return self.__add_join(table_name, "LEFT")
+
+    def ON(self, condition):
+        if not self.joins:
+            raise ValueError("ON cannot be used without a preceding JOIN.")
+        join = self.joins[-1]
+        if join["on"]:
+            raise ValueError(f"JOIN on {join['table']} already has an ON condition.")
+
+        # Only equi-joins are supported (e.g., "people.id = orders.person_id")
+        match = re.match(r"([\w.]+)\s*=\s*([\w.]+)$", condition.strip())
+        if not match:
+            raise ValueError(f"Invalid ON condition: {condition}. Only equality joins are supported.")
+
+        # Orient the condition so that the right field is on the joined table
+        joined_index = len(self.joins)
+        left_field, right_field = match.groups()
+        if self.__resolve(left_field)[0] == joined_index:
+            left_field, right_field = right_field, left_field
+        if self.__resolve(right_field)[0] != joined_index or self.__resolve(left_field)[0] == joined_index:
+            raise ValueError(f"ON condition must compare {join['table']} with a table already in the query.")
+
+        join["on"] = (left_field, right_field)
+        return self
+
     def WHERE(self, field_or_condition):
         if not self.table:
             raise ValueError("No table to query. Did you forget to call FROM?")
@@ -88,82 +138,366 @@ class Query:
             raise ValueError(f"Invalid ORDER BY direction: {direction}")
         return self
     
+    def GROUP_BY(self, *fields):
+        if not self.table:
+            raise ValueError("No table to query. Did you forget to call FROM?")
+        for field in fields:
+            self.__resolve(field)
+        self.group_by = list(fields)
+        return self
+
+    def HAVING(self, condition):
+        if not self.group_by:
+            raise ValueError("HAVING cannot be used without a preceding GROUP BY.")
+        if self.having:
+            raise ValueError("Cannot chain multiple HAVING conditions.")
+
+        # Parse condition on a group field or an aggregate (e.g., "COUNT(*) > 1")
+        pattern = r"(\w+\s*\(\s*[\w.*]+\s*\)|[\w.]+)\s*([=|!=|<|>|<=|>=|<>]+)\s*(.+)"
+        match = re.match(pattern, condition)
+        if not match:
+            raise ValueError(f"Invalid HAVING condition: {condition}")
+
+        field, op, value = match.groups()
+        field = re.sub(r"\s+", "", field)
+        if "(" in field:
+            # Aggregate names are case-insensitive, e.g. "sum(x)" is "SUM(x)"
+            field = field[:field.find("(")].upper() + field[field.find("("):]
+        if field not in self.group_by:
+            # Validates the aggregate, raising for an unknown one
+            parse_aggregate(field)
+        self.having = (field, op, value)
+        return self
+
     def LIMIT(self, limit):
         self.limit = limit
         return self
     
     def tables(self):
-        return list(self.db.tables.keys())
+        return list(self.db.get_tables())
     
     def columns(self):
-        return self.table.get_columns() if self.table else []
+        if not self.joins:
+            return self.table.get_columns() if self.table else []
+        # Once tables are joined, columns are qualified by their table name
+        return [
+            f"{table.get_name()}.{col}" for table in self.__sources() for col in table.get_columns()
+        ]
     
     def execute(self):
-        if not self.db:
-            raise ValueError("No database given.")
-        if not self.table:
-            raise ValueError("No table given.")
-        if not self.select_fields and not self.aggregate_fields:
-            raise ValueError("No fields to select.")
+        self.__validate()
         
         if self.db.mode_setting != "off":
             pass
         if self.db.timer_setting:
             start_time = time.time()
 
-        # Get all data from table
-        table_data = self.table.get_data()
-
-        # Filter data based on WHERE conditions
-        filtered_data = self.__apply_conditions(table_data)
-
-        # Order data based on ORDER BY
-        ordered_data = self.__apply_order(filtered_data)
-
-        # Limit data based on LIMIT
-        limited_data = self.__apply_limit(ordered_data)
-
-        # Select only the fields specified
-        selected_data = self.__apply_select(limited_data)
+        selected_data = self.__run()
+        if not isinstance(selected_data, dict):
+            selected_data = list(selected_data)
 
         # Stop timer (to not include printing time)
         if self.db.timer_setting:
             end_time = time.time()
 
-        # Check for mode settings and print appropriately ('off' to disable)
-        if self.db.mode_setting == 'python':
-            print(selected_data)
-        elif self.db.mode_setting == 'tabs':
-            if isinstance(selected_data, dict):
-                print("\t".join(str(val) for val in selected_data.values()))
-            else:
-                for item in selected_data:
-                    print("\t".join(str(val) for val in item.values()))
+        # Print the result according to the mode ('off' to disable)
+        if self.db.mode_setting in FORMATTERS:
+            FORMATTERS[self.db.mode_setting](self.select_items).write(selected_data)
 
         # Print timer after printing results
         if self.db.timer_setting and end_time and start_time:
             print(f"real: {end_time - start_time} seconds")
 
         return selected_data
-    
+
+    def iter(self):
+        """
+        Executes the query lazily, returning an iterator over the result rows.
+        Rows are pulled through the filter, LIMIT and projection one at a
+        time, so without ORDER BY the scan stops as soon as LIMIT is reached.
+        ORDER BY (and GROUP BY) are the only stages that consume all of their
+        input before producing a row. Nothing is printed or timed.
+
+        :return: An iterator over the result rows. A query with only aggregate
+            functions yields a single row.
+        :rtype: iterator[dict]
+        """
+        self.__validate()
+        selected_data = self.__run()
+        return iter([selected_data]) if isinstance(selected_data, dict) else selected_data
+
+    def __iter__(self):
+        return self.iter()
+
+    async def execute_async(self, executor=None, coalesce=True):
+        """
+        Coroutine counterpart to `execute`, for asyncio applications: the
+        query runs in an executor thread, so the event loop keeps serving
+        other tasks while it does. Queries read a snapshot of their tables,
+        so they may run alongside inserts.
+
+        Identical queries (same tables, fields, conditions and values) over
+        the same rows, awaited on the same event loop while one of them runs,
+        await that run rather than starting their own, and get the same
+        result object. A query awaited after an insert or a schema change
+        never awaits a run started before it.
+
+        :param executor: Executor to run the query in. Must run threads.
+            Defaults to the event loop's default executor.
+        :type executor: concurrent.futures.Executor, optional
+        :param coalesce: Whether to share the run of identical queries.
+        :type coalesce: bool, optional
+
+        :return: The result, as returned by `execute`.
+        :rtype: list[dict] or dict
+        """
+        self.__validate()
+        key = None
+        if coalesce:
+            # The rows each table has (they're only ever appended) and the
+            # schema version tell whether a run reads the same data
+            key = (query_shape(self), self.db.schema_version, tuple(table.get_row_count() for table in self.__sources()))
+        try:
+            hash(key)
+        except TypeError:
+            # A literal that can't be hashed; run it on its own
+            key = None
+        return await run_coalesced(self.db.in_flight, key, self.execute, executor)
+
+    def iter_async(self, chunk_size=CHUNK_SIZE, executor=None):
+        """
+        Asynchronous counterpart to `iter`, for `async for`. Rows are pulled
+        through the query in an executor thread, chunk_size at a time, so the
+        event loop is only held to hand each chunk on.
+
+        :param chunk_size: Rows pulled at a time.
+        :type chunk_size: int, optional
+        :param executor: Executor to run the query in. Must run threads.
+            Defaults to the event loop's default executor.
+        :type executor: concurrent.futures.Executor, optional
+
+        :return: An asynchronous iterator over the result rows.
+        :rtype: AsyncIterator[dict]
+        """
+        self.__validate()
+        return iter_async(self.iter, chunk_size, executor)
+
+    def __aiter__(self):
+        return self.iter_async()
+
+    def to_csv(self, path, delimiter=",", encoding="utf-8"):
+        """
+        Executes the query and writes its result to a CSV file with a header
+        row. Rows are written as the query produces them (see `iter`), a
+        chunk at a time, so the result is never held in memory as a whole.
+        NULLs are written as empty fields.
+
+        :param path: Path of the file.
+        :type path: str
+        :param delimiter: Field delimiter.
+        :type delimiter: str, optional
+        :param encoding: Encoding of the file.
+        :type encoding: str, optional
+
+        :return: The number of rows written.
+        :rtype: int
+        """
+        return write_csv(path, self.select_items, self.iter(), delimiter, encoding)
+
+    def execute_stream(self):
+        """
+        Streaming counterpart to `execute`: returns an iterator over the result
+        rows, printing each row as it is produced according to the database's
+        mode. The timer, if on, is printed once the rows are exhausted.
+
+        :return: An iterator over the result rows.
+        :rtype: iterator[dict]
+        """
+        start_time = time.time()
+        return self.__print_stream(self.iter(), start_time)
+
+    def __print_stream(self, rows, start_time):
+        if self.db.mode_setting in FORMATTERS:
+            rows = FORMATTERS[self.db.mode_setting](self.select_items).iter(rows)
+        yield from rows
+
+        if self.db.timer_setting:
+            print(f"real: {time.time() - start_time} seconds")
+
+    def __validate(self):
+        if not self.db:
+            raise ValueError("No database given.")
+        if not self.table:
+            raise ValueError("No table given.")
+        if not self.select_fields and not self.aggregate_fields:
+            raise ValueError("No fields to select.")
+        if self.group_by:
+            for field in self.select_fields:
+                if field not in self.group_by:
+                    raise ValueError(f"{field} must appear in GROUP BY to be selected alongside aggregate functions.")
+        elif self.select_fields and self.aggregate_fields:
+            raise ValueError("Cannot mix aggregate functions and fields in SELECT.")
+        for join in self.joins:
+            if not join["on"]:
+                raise ValueError(f"JOIN on {join['table']} is missing an ON condition.")
+
+    def __run(self, plan=None):
+        # Builds the execution pipeline. Every stage is lazy except ordering,
+        # grouping and the build side of a join, so rows are only read (and
+        # materialized as dictionaries) as the result is consumed. Returns an
+        # iterator over the result rows, or a dict for aggregate-only queries.
+        # With a QueryPlan, every stage is also recorded (and profiled) on it.
+        stage = plan.stage if plan is not None else lambda operator, detail, make, lazy=True: make(None)
+
+        # With the vectorized engine, numeric conditions and aggregates are
+        # evaluated over whole columns at once
+        scan = self.__vector_scan()
+        if scan is not None and self.aggregate_fields and not (self.select_fields or self.group_by or self.order_by or self.limit):
+            condition = self.__bind(self.conditional_fields)
+            detail = f"{', '.join(self.aggregate_fields)} on {self.table}"
+            if condition:
+                detail += f" where {describe_condition(condition)}"
+            if plan is not None and not plan.analyze:
+                # Whether it applies is only known once it runs
+                return stage("Vector Aggregate", detail + " (or as below, if it can't be vectorized)", lambda node: {}, lazy=False)
+            aggregates = stage("Vector Aggregate", detail, lambda node: scan.aggregate(self.aggregate_fields, condition), lazy=False)
+            if aggregates is not None:
+                return aggregates
+            if plan is not None:
+                plan.root = None
+
+        # Scan the table's columns by row position, or only the candidate
+        # positions from an index when a condition allows it.
+        scan_rows, presorted, condition, (scan_operator, scan_detail) = self.__scan_positions(scan)
+        dry_run = plan is not None and not plan.analyze
+
+        # With parallel scans, full scans of large tables are split into
+        # morsels filtered (and aggregated, or grouped) by worker processes.
+        # They scan the same rows as the full scan would (the table may grow
+        # in the meantime).
+        workers = self.__parallel_workers(scan_operator)
+        row_count = len(scan_rows(None)) if workers else None
+        if workers and self.aggregate_fields and not (self.select_fields or self.group_by or self.order_by or self.limit):
+            detail = f"{', '.join(self.aggregate_fields)} on {self.table}"
+            if condition:
+                detail += f" where {describe_condition(condition)}"
+            return stage("Parallel Aggregate", f"{detail} ({workers} workers)",
+                         lambda node: {} if dry_run else self.__parallel_aggregate(condition, row_count, workers), lazy=False)
+        if workers and not self.group_by:
+            if condition:
+                scan_detail = f"on {self.table} for {describe_condition(condition)}"
+            scan_operator, scan_detail = "Parallel Seq Scan", f"{scan_detail} ({workers} workers)"
+            positions = self.__parallel_filter(condition, row_count, workers)
+            scan_rows = lambda node: positions
+            condition = None
+
+        filtered_data = None
+        if not (workers and self.group_by):
+            scanned = stage(scan_operator, scan_detail, (lambda node: ()) if dry_run else scan_rows)
+
+            # Filter data based on (the rest of) the WHERE conditions
+            filtered_data = scanned
+            if condition:
+                filtered_data = stage("Filter", describe_condition(condition),
+                                      lambda node: self.__apply_conditions(scanned, condition, node and node.count))
+
+        if self.group_by:
+            # Aggregate each group (and filter them on HAVING). ORDER BY and
+            # LIMIT then apply to the groups rather than to the rows.
+            detail = f"by {', '.join(self.group_by)}"
+            if self.having:
+                detail += f" having {describe_condition(self.__bind(self.having))}"
+            aggregation = self.__group_aggregation()
+            if workers:
+                # Each worker groups the rows of its morsels, and the groups
+                # of every morsel are then merged
+                detail += f" on {self.table}"
+                if condition:
+                    detail += f" where {describe_condition(condition)}"
+                groups = lambda: {} if dry_run else self.__parallel_groups(condition, aggregation, row_count, workers)
+                grouped_data = stage("Parallel Group", f"{detail} ({workers} workers)",
+                                     lambda node: self.__apply_group(groups(), aggregation, node and node.count))
+            else:
+                grouped_data = stage("Group", detail,
+                                     lambda node: self.__apply_group(self.__group_states(filtered_data, aggregation), aggregation, node and node.count))
+            key = operator.itemgetter(self.order_by) if self.order_by else None
+            ordered_data = self.__order_stage(stage, grouped_data, key, False)
+            limited_data = self.__limit_stage(stage, ordered_data)
+            return stage("Project", ", ".join(self.select_items),
+                         lambda node: ({item: row[item] for item in self.select_items} for row in limited_data), lazy=False)
+
+        # Order data based on ORDER BY, unless it was read in index order.
+        # With a LIMIT, only the top rows are kept rather than sorting all.
+        key = self.__getter(self.order_by) if self.order_by else None
+        ordered_data = self.__order_stage(stage, filtered_data, key, presorted)
+
+        # Limit data based on LIMIT
+        limited_data = self.__limit_stage(stage, ordered_data)
+
+        # Select only the fields specified. A dry run has no rows for the
+        # aggregates to run over, so it only shows where they'd be computed.
+        detail = ", ".join(map(str, self.select_items))
+        if self.aggregate_fields and not self.select_fields:
+            return stage("Aggregate", detail, lambda node: {} if dry_run else self.__apply_select(limited_data), lazy=False)
+        return stage("Project", detail, lambda node: self.__apply_select(limited_data), lazy=False)
+
+    def __order_stage(self, stage, data, key, presorted):
+        if presorted or not self.order_by:
+            return data
+        if self.limit:
+            return stage("Top-K", f"by {self.order_by} {self.order_direction} keeping {self.limit}",
+                         lambda node: self.__apply_top_k(data, key))
+        return stage("Sort", f"by {self.order_by} {self.order_direction}", lambda node: self.__apply_order(data, key))
+
+    def __limit_stage(self, stage, data):
+        if not self.limit:
+            return data
+        return stage("Limit", str(self.limit), lambda node: self.__apply_limit(data))
+
+    def explain(self, analyze=False):
+        """
+        Returns the plan of the query: the tree of operators (scans, index
+        lookups, filters, sorts, limits, projections, aggregations) its
+        result goes through, each fed by its children.
+
+        With analyze, the query is also run (its result is discarded), and
+        every operator reports how many rows it took in and produced, the
+        time spent in it (from `time.perf_counter_ns`), and how many times
+        each of its conditions was evaluated and matched. Profiling every row
+        adds some overhead of its own.
+
+        :param analyze: Whether to run the query and measure each operator.
+        :type analyze: bool, optional
+
+        :return: The plan. Print it to see it as a tree, or walk its root
+            `PlanNode` (or `to_dict()`) to read it programmatically.
+        :rtype: QueryPlan
+        """
+        self.__validate()
+        plan = QueryPlan(analyze)
+        result = self.__run(plan)
+        if not isinstance(result, dict):
+            for _ in result:
+                pass
+        return plan
+
     def __add_condition(self, field_or_condition, logic_operator=None):
         # Use regex to parse condition (e.g., "age > 30")
-        pattern = r"(\w+)\s*([=|!=|<|>|<=|>=|<>]+)\s*(.+)"
+        pattern = r"([\w.]+)\s*([=|!=|<|>|<=|>=|<>]+)\s*(.+)"
         match = re.match(pattern, field_or_condition)
         
         if match:
             field, operator, value = match.groups()
 
-            if field not in self.columns():
-                raise ValueError(f"{field} is not a valid field.")
+            # Validates the field, raising for an unknown one
+            self.__resolve(field)
 
             new_condition = (field, operator, value)
         else:
             # If no match, then assume it's some kind of field and validate it.
             field = field_or_condition
 
-            if field not in self.columns():
-                raise ValueError(f"{field} is not a valid field.")
+            self.__resolve(field)
 
             new_condition = (field, None, None)
 
@@ -219,171 +553,408 @@ class Query:
 
         return self
     
-    def __like_match(self, field_value, pattern):
-        """
-        Matches field_value against a SQL-like pattern using regex.
-        SQL LIKE uses `%` for any number of characters and `_` for exactly one character.
-        """
-
-        # Convert SQL LIKE pattern to Python regex pattern
-        # - `%` becomes `.*` (zero or more characters)
-        # - `_` becomes `.` (exactly one character)
-        regex_pattern = "^" + pattern.replace("%", ".*").replace("_", ".") + "$"
-
-        # Match the field value using the regex pattern
-        return re.match(regex_pattern, field_value) is not None
-
-    def __apply_conditions(self, data):
-        if not self.conditional_fields:
-            return data
-        
-        def evaluate_condition(row, condition):
-            if isinstance(condition, tuple):
-                field, operator, value, = condition
-                value = value.strip("'").strip('"') if isinstance(value, str) else value
-                field_value = row.get(field)
-
-                # Map operator strings to funcs
-                operators = {
-                    '='          : lambda x, y: x == y,
-                    '!='         : lambda x, y: x != y,
-                    '<>'         : lambda x, y: x != y,
-                    '<'          : lambda x, y: x < y,
-                    '<='         : lambda x, y: x <= y,
-                    '>'          : lambda x, y: x > y,
-                    '>='         : lambda x, y: x >= y,
-                    'LIKE'       : lambda x, y: self.__like_match(x, y),
-                    'IN'         : lambda x, y: x in y,
-                    'BETWEEN'    : lambda x, y: y[0] <= x <= y[1],
-                    'IS NULL'    : lambda x, y: x is None,
-                    'IS NOT NULL': lambda x, y: x is not None,
-                }
-
-                # Try to get equivalent operator function, otherwise leave as is
-                operator_func = operators.get(operator)
-
-                # Convert value to the same type as row[field]
-                if isinstance(value, tuple):
-                    if isinstance(field_value, (int, float)):
-                        value = tuple(float(val) if isinstance(val, str) and '.' in val else int(val) for val in value)
+    def __compile_conditions(self, condition, wrap=None):
+        # Compile the whole condition tree once into a single predicate over
+        # row positions, with literals coerced to each column's type
+        return compile_condition(condition, self.__getter, self.__type, wrap)
+
+    def __vector_scan(self):
+        # Joined rows are only ever interpreted
+        if self.db.engine_setting != "vectorized" or self.joins:
+            return None
+        return VectorScan(self.table)
+
+    def __parallel_workers(self, scan_operator):
+        # Number of worker processes to scan with, or None to scan serially:
+        # only full scans of large tables are split, and only when no other
+        # thread runs (see `fork_safe`). A LIMIT without ORDER BY stops a
+        # serial scan early, so it is left serial too.
+        workers = self.db.workers_setting
+        if workers <= 1 or scan_operator != "Seq Scan" or self.table.get_row_count() < PARALLEL_MIN_ROWS:
+            return None
+        if not fork_safe():
+            return None
+        if self.limit and not self.order_by:
+            return None
+        return workers
+
+    def __parallel_filter(self, condition, row_count, workers):
+        # Positions of the rows matching condition, in order. Workers return
+        # them as arrays of integers, which pickle as raw bytes.
+        predicate = self.__compile_conditions(condition) if condition else None
+        def work(start, stop):
+            return array("q", filter(predicate, range(start, stop)) if predicate else range(start, stop))
+        for matches in map_morsels(work, row_count, workers):
+            yield from matches
+
+    def __parallel_aggregate(self, condition, row_count, workers):
+        aggregation = Aggregation(self.aggregate_fields, self.__getter)
+        predicate = self.__compile_conditions(condition) if condition else None
+        def work(start, stop):
+            return aggregation.accumulate(filter(predicate, range(start, stop)) if predicate else range(start, stop))
+
+        state, rows = aggregation.new_state(), 0
+        for partial, partial_rows in map_morsels(work, row_count, workers):
+            aggregation.merge(state, partial)
+            rows += partial_rows
+        return aggregation.finish(state, rows)
+
+    def __parallel_groups(self, condition, aggregation, row_count, workers):
+        predicate = self.__compile_conditions(condition) if condition else None
+        def work(start, stop):
+            return self.__group_states(filter(predicate, range(start, stop)) if predicate else range(start, stop), aggregation)
+
+        # Groups keep the order they are first seen in, as when grouped serially
+        groups = {}
+        for partial in map_morsels(work, row_count, workers):
+            for key, state in partial.items():
+                if key in groups:
+                    aggregation.merge(groups[key], state)
                 else:
-                    if field_value is not None:  # Only attempt conversion if value is not None
-                        if isinstance(field_value, (int, float)):
-                            if value is not None:
-                                value = float(value) if isinstance(value, str) and '.' in value else int(value)
-
-                try:
-                    if field_value is not None and operator not in ["IS NULL", "IS NOT NULL"]:
-                        return operator_func(field_value, value) if operator_func else False
-                    elif operator in ["IS NULL", "IS NOT NULL"]:
-                        return operator_func(field_value, value)
-                    else:
-                        return False
-                except SyntaxError:
-                    raise ValueError(f"Invalid operator: {operator}")
-            elif isinstance(condition, dict):
-                logic = condition.get("logic")
-                conditions = condition.get("conditions")
-
-                if logic == "AND" or logic is None:
-                    return all(evaluate_condition(row, cond) for cond in conditions)
-                elif logic == "OR":
-                    return any(evaluate_condition(row, cond) for cond in conditions)
-                else:
-                    raise ValueError(f"Invalid logic operator: {logic}")
-            else:
-                raise ValueError(f"Invalid condition: {condition}")
+                    groups[key] = state
+        return groups
+
+    def __scan_positions(self, scan=None):
+        # Returns a callable taking the scan's plan node (or None) and
+        # returning the row positions to scan, whether they are in ORDER BY
+        # order, the WHERE condition still to be applied to them, and the name
+        # and detail of the scan for the query plan. Joined rows are tuples of
+        # positions instead. Index lookups and vectorized masks are only
+        # computed once the callable is called, so a query plan times them
+        # with the scan, and a dry run skips them.
+        condition, kind, cond, rows = self.__plan_scan()
+        condition = self.__bind(condition)
+        if self.joins:
+            joins = " ".join(
+                f"{join['kind']} JOIN {join['table']} ON {join['on'][0]} = {join['on'][1]}" for join in self.joins
+            )
+            return lambda node: self.__apply_joins(), False, condition, ("Join", f"{self.table} {joins}")
+
+        row_count = self.table.get_row_count()
+        estimate = f"(estimated {round(rows)} rows)"
+        if kind == "lookup":
+            cond = self.__bind(cond)
+            lookup = plan_lookup(self.table, cond, row_count)
+            return self.__lookup_rows(lookup, row_count), False, condition, ("Index Lookup", f"on {self.table} for {describe_condition(cond)} {estimate}")
+        if kind == "ordered":
+            detail = f"on {self.table} using {OrderedIndex.kind}({self.order_by}) {self.order_direction} {estimate}"
+            index = self.table.get_index(self.order_by, OrderedIndex.kind)
+            return lambda node: index.ordered(self.order_direction, row_count), True, condition, ("Index Scan", detail)
+
+        if condition and scan is not None:
+            mask, vectorized, residual = scan.plan(condition)
+            if mask is not None:
+                detail = describe_condition(condition) if residual is None else f"all but {describe_condition(residual)}"
+                return self.__mask_rows(scan, mask, vectorized), False, residual, ("Vector Filter", f"on {self.table} for {detail}")
+        return lambda node: range(row_count), False, condition, ("Seq Scan", f"on {self.table} {estimate}")
+
+    def __plan_scan(self):
+        # Returns the WHERE condition tree with its conditions reordered, how
+        # to read the rows ("scan", "lookup" or "ordered"), the condition an
+        # index lookup answers, and the estimated number of rows read.
+        #
+        # The planner estimates, from column statistics, how many rows each
+        # way of reading them yields, and picks the cheapest: a full scan, an
+        # index lookup for one of the conditions, or a scan of the ordered
+        # index of the ORDER BY column. It also orders the conditions so the
+        # most selective and cheapest are evaluated first.
+        #
+        # A prepared query is planned with its Parameters unbound, and its
+        # plan reused until the schema changes or the table grows enough to
+        # make the statistics it was made from stale.
+        row_count = self.table.get_row_count()
+        if self.parameters is not None:
+            cached = self.plans.get("scan")
+            if cached is not None:
+                schema_version, planned_rows, scan_plan = cached
+                if schema_version == self.db.schema_version and not is_stale(planned_rows, row_count):
+                    return scan_plan
+
+        planner = Planner(self.__column_for)
+        condition = planner.order(self.conditional_fields) if self.conditional_fields else None
+        scan_plan = (condition, "scan", None, row_count)
+        if not self.joins:
+            scan_plan = self.__choose_scan(planner, condition, row_count)
+        if self.parameters is not None:
+            self.plans["scan"] = (self.db.schema_version, row_count, scan_plan)
+        return scan_plan
+
+    def __choose_scan(self, planner, condition, row_count):
+        selectivity = planner.selectivity(condition) if condition else 1.0
+        row_cost = ROW_COST + (planner.cost(condition) if condition else 0.0)
+        matching = row_count * selectivity
+        sorting = sort_cost(matching, self.limit) if self.order_by and not self.group_by else 0.0
+
+        # (cost, estimated rows read, kind, condition answered by an index)
+        options = [(row_count * row_cost + sorting, row_count, "scan", None)]
+        if condition:
+            for cond in planner.lookups(condition):
+                rows = row_count * planner.selectivity(cond)
+                options.append((rows * (CANDIDATE_COST + row_cost) + sorting, rows, "lookup", cond))
+        if self.order_by and not self.group_by and self.table.get_index(self.order_by, OrderedIndex.kind):
+            # Rows are read in order, past those the conditions on the ORDER BY
+            # column rule out, until LIMIT of them match. The index yields
+            # them as they are pulled, so the rows past those are never read.
+            rows = row_count
+            if self.limit:
+                skipped = planner.skipped(condition, self.order_by, self.order_direction == "DESC") if condition else 0.0
+                rows = min(row_count, row_count * skipped + self.limit / max(selectivity, 1 / max(row_count, 1)))
+            options.append((rows * row_cost, rows, "ordered", None))
+
+        for _, rows, kind, cond in sorted(options, key=operator.itemgetter(0)):
+            if kind == "lookup" and plan_lookup(self.table, cond, row_count) is None:
+                # No index answers this condition
+                continue
+            return condition, kind, cond, rows
+
+    def __bind(self, condition):
+        # The condition tree with the values bound to a prepared query's
+        # Parameters in place of them
+        if self.parameters is None or condition is None:
+            return condition
+        return bind_parameters(condition, self.parameters)
+
+    def __lookup_rows(self, lookup, row_count):
+        def look_up(node):
+            candidates = lookup() if lookup is not None else None
+            if candidates is None:
+                # A literal the index can't look up after all. The whole
+                # condition is still applied to the rows, so scan them all.
+                if node is not None:
+                    node.operator, node.detail = "Seq Scan", f"on {self.table}"
+                return range(row_count)
+            return candidates
+        return look_up
+
+    def __mask_rows(self, scan, mask, vectorized):
+        def filter_rows(node):
+            try:
+                return scan.np.flatnonzero(mask()).tolist()
+            except Unsupported:
+                # A column stopped being stored as an array since the query
+                # was planned (a value of another type was inserted)
+                return list(filter(self.__compile_conditions(vectorized), range(scan.row_count)))
+        return filter_rows
+
+    def __apply_joins(self):
+        # Only the size of the FROM table is known up front; later joins always
+        # build on the joined table and stream the rows joined so far
+        row_count = self.table.get_row_count()
+        rows = ((position,) for position in range(row_count))
+        for join in self.joins:
+            left_field, right_field = join["on"]
+            _, table, column = self.__resolve(right_field)
+            rows = join_rows(rows, self.__getter(left_field), table, column, join["kind"], row_count)
+            row_count = None
+        return rows
+
+    def __apply_conditions(self, data, condition, wrap=None):
+        if not condition:
+            return data
 
-        return [row for row in data if evaluate_condition(row, self.conditional_fields)]
+        return filter(self.__compile_conditions(condition, wrap), data)
     
-    def __apply_order(self, data):
+    def __apply_order(self, data, key):
         if self.order_by:
-            if self.order_direction == "ASC":
-                return sorted(data, key=lambda x: x[self.order_by])
-            else:
-                return sorted(data, key=lambda x: x[self.order_by], reverse=True)
+            reverse = self.order_direction == "DESC"
+            data = data if isinstance(data, list) else list(data)
+            try:
+                return sorted(data, key=key, reverse=reverse)
+            except TypeError:
+                # NULLs can't be compared, so sort the other values and put
+                # the NULLs first when ascending and last when descending
+                nulls = [position for position in data if key(position) is None]
+                values = sorted((position for position in data if key(position) is not None), key=key, reverse=reverse)
+                return values + nulls if reverse else nulls + values
         else:
             return data
     
+    def __apply_top_k(self, data, key):
+        # Returns the same rows, in the same order, as sorting everything and
+        # keeping the first self.limit, but with a heap bounded to that size.
+        # heapq.nsmallest/nlargest are stable, so ties keep their row order.
+
+        # NULLs sort first when ascending and last when descending, and tie
+        # among themselves, so only the first self.limit of them can matter
+        nulls = []
+        def non_null(data):
+            for position in data:
+                if key(position) is None:
+                    if len(nulls) < self.limit:
+                        nulls.append(position)
+                else:
+                    yield position
+
+        if self.order_direction == "ASC":
+            values = heapq.nsmallest(self.limit, non_null(data), key=key)
+            return (nulls + values)[:self.limit]
+        else:
+            values = heapq.nlargest(self.limit, non_null(data), key=key)
+            return (values + nulls)[:self.limit]
+
+    def __group_aggregation(self):
+        # The aggregates computed per group, including the one HAVING tests
+        aggregate_calls = list(self.aggregate_fields)
+        if self.having and self.having[0] not in self.group_by and self.having[0] not in aggregate_calls:
+            aggregate_calls.append(self.having[0])
+        return Aggregation(aggregate_calls, self.__getter)
+
+    def __group_states(self, data, aggregation):
+        # Hash aggregation: one set of accumulators per distinct group key, so
+        # memory grows with the number of groups rather than of rows
+        key_getters = [self.__getter(field) for field in self.group_by]
+
+        groups = {}
+        updaters = {}
+        for position in data:
+            key = tuple(get(position) for get in key_getters)
+            update = updaters.get(key)
+            if update is None:
+                state = groups[key] = aggregation.new_state()
+                update = updaters[key] = aggregation.updater(state)
+            update(position)
+        return groups
+
+    def __apply_group(self, groups, aggregation, wrap=None):
+        # Turns the accumulators of each group into its row, and filters the
+        # rows on HAVING
+        grouped_data = []
+        for key, state in groups.items():
+            row = dict(zip(self.group_by, key))
+            row.update(aggregation.results(state))
+            grouped_data.append(row)
+
+        if self.having:
+            grouped_data = list(filter(self.__compile_having(wrap), grouped_data))
+        return grouped_data
+
+    def __compile_having(self, wrap=None):
+        def type_for(field):
+            if field in self.group_by:
+                return self.__type(field)
+            aggregate_name, field_name = parse_aggregate(field)
+            if aggregate_name == "COUNT":
+                return int.__name__
+            elif aggregate_name == "AVG":
+                return float.__name__
+            return self.__type(field_name)
+
+        return compile_condition(self.__bind(self.having), operator.itemgetter, type_for, wrap)
+
     def __apply_limit(self, data):
-        # Returns the top n (self.limit) rows 
-        return data[:self.limit] if self.limit else data
+        # Returns the top n (self.limit) rows, without reading any further
+        return itertools.islice(data, self.limit) if self.limit else data
     
     def __apply_select(self, data):
         # Returns only the fields specified in self.select_fields, or all fields if * is specified.
         if '*' in self.select_fields:
-            if len(self.select_fields) == 1:
+            if len(self.select_fields) == 1 and self.joins:
+                # Every column of every joined table, qualified by table name
+                getters = [(field, self.__getter(field)) for field in self.columns()]
+                return ({field: get(row) for field, get in getters} for row in data)
+            elif len(self.select_fields) == 1:
                 # Since the length is 1, the only selected field is '*'
-                return data
+                return map(self.table.get_row, data)
             else:
                 raise ValueError("Cannot simultaneously select all fields and specific fields.")
         elif self.select_fields:
-            return [
-                {field: row[field] for field in self.select_fields} for row in data
-            ]
+            getters = [(field, self.__getter(field)) for field in self.select_fields]
+            return (
+                {field: get(position) for field, get in getters} for position in data
+            )
         elif self.aggregate_fields:
-            result = {}
-            for field in self.aggregate_fields:
-                aggregate_results = self.__apply_aggregate(field, data)
-                result[field] = aggregate_results
-            return result
+            # Every aggregate is computed in the same pass over the rows
+            return Aggregation(self.aggregate_fields, self.__getter).run(data)
         else:
             raise ValueError("No fields were selected. Did you forget to call SELECT?")
         
-    def __apply_aggregate(self, aggregate_call, data):
-        # Find name of function by finding first parenthesis
-        aggregate_name = aggregate_call[:aggregate_call.find('(')]
-        # Find name of field in between paraenthesis
-        field_name = aggregate_call[aggregate_call.find('(')+1:aggregate_call.find(')')]
-        
-        # Extract values for specified field from field_name
-        values = []
-        if field_name in self.columns():
-            values = [row[field_name] for row in data]
-        elif field_name == "*":
-            values = data 
+    def __add_join(self, table_name, kind):
+        if not self.table:
+            raise ValueError("No table to join with. Did you forget to call FROM?")
+        if self.conditional_fields:
+            raise ValueError("JOIN must come before WHERE.")
+        if table_name not in self.tables():
+            raise ValueError(f"{table_name} is not a valid table in this database.")
+        if table_name in [table.get_name() for table in self.__sources()]:
+            raise ValueError(f"Table {table_name} is already part of this query. Self-joins are not supported.")
+
+        self.joins.append({"table": self.db.get_table(table_name), "kind": kind, "on": None})
+        # Fields may resolve differently (or become ambiguous) with the table
+        self.fields = {}
+        return self
+
+    def __sources(self):
+        # Tables read by this query, in the order of the positions in a row
+        return [self.table] + [join["table"] for join in self.joins]
+
+    def __resolve(self, field):
+        # Returns (index in __sources(), table, column) of a field, which may be
+        # qualified by its table name (e.g., "people.id"). Tables never gain
+        # or lose columns, so a field resolves the same way until the query's
+        # tables change.
+        resolved = self.fields.get(field)
+        if resolved is None:
+            resolved = self.fields[field] = self.__resolve_field(field)
+        return resolved
+
+    def __resolve_field(self, field):
+        if "." in field:
+            table_name, col = field.split(".", 1)
+            candidates = [
+                (i, table, col) for i, table in enumerate(self.__sources())
+                if table.get_name() == table_name and table.has_column(col)
+            ]
         else:
-            raise ValueError(f"{field_name} is not a valid field.")
-            
-        if not values:
-            raise ValueError(f"No values found for field: {field_name}")
-        
-        # Filter out NULL (None) values
-        values = [val for val in values if val is not None]
+            candidates = [
+                (i, table, field) for i, table in enumerate(self.__sources())
+                if table.has_column(field)
+            ]
 
-        if not values:
-            # If no values are left after filtering out NULL values, some aggregate functions return 0, others return None
-            if aggregate_name in ["COUNT", "SUM"]:
-                return 0
-            else:
-                return None
-        
-        # Apply aggregate function to values
-        try:
-            if aggregate_name == "COUNT":
-                return len(values)
-            elif aggregate_name == "SUM":
-                return sum(values)
-            elif aggregate_name == "AVG":
-                return sum(values) / len(values)
-            elif aggregate_name == "MAX":
-                return max(values)
-            elif aggregate_name == "MIN":
-                return min(values)
-            else:
-                raise ValueError(f"Invalid aggregate function: {aggregate_name}")
-        except Exception as e:
-            raise ValueError(f"Failed to apply aggregate function: {aggregate_name}. Error: {e}")
+        if not candidates:
+            raise ValueError(f"{field} is not a valid field.")
+        if len(candidates) > 1:
+            raise ValueError(f"{field} is ambiguous. Qualify it with its table name.")
+        return candidates[0]
+
+    def __column_for(self, field):
+        _, table, col = self.__resolve(field)
+        return table, col
+
+    def __type(self, field):
+        _, table, col = self.__resolve(field)
+        return table.types[col]["type"]
+
+    def __getter(self, field):
+        # Returns a callable mapping a row position to the value of field. For
+        # joined rows, the row is a tuple of positions, None for a table that
+        # had no match in a LEFT JOIN.
+        i, table, col = self.__resolve(field)
+        get = table.get_column(col).getter()
+        if not self.joins:
+            return get
+
+        def get_joined(row):
+            position = row[i]
+            return None if position is None else get(position)
+        return get_joined
 
     def __str__(self):
         query = "SELECT "
-        query += ", ".join(self.select_fields or self.aggregate_fields)
+        query += ", ".join(self.select_items)
         query += " FROM " + self.table.get_name()
+        for join in self.joins:
+            query += (" LEFT JOIN " if join["kind"] == "LEFT" else " JOIN ") + join["table"].get_name()
+            if join["on"]:
+                query += " ON " + " = ".join(join["on"])
         # if self.conditional_fields:
         #     for (field, operator, value) in self.conditional_fields:
         #         query += f" WHERE {field} "
         #         if operator:
         #             query += f"{operator} {value}"
+        if self.group_by:
+            query += " GROUP BY " + ", ".join(self.group_by)
+        if self.having:
+            query += " HAVING " + " ".join(self.having)
         if self.order_by:
             query += " ORDER BY " + self.order_by
         if self.limit:
@@ -1,66 +1,356 @@
+import itertools
+import operator
+
+import os
+import threading
+
+from sqlito._column import make_column
+from sqlito._csv import CHUNK_SIZE, SAMPLE_SIZE, read_csv
+from sqlito._index import HashIndex, INDEX_TYPES
+from sqlito._stats import analyze_column
+
 class Table:
-    def __init__(self, name: str, data: list[dict]):
+    def __init__(self, name: str, data: list[dict], types: dict | None = None, trusted: bool = False):
+        """
+        :param name: Name of the table.
+        :type name: str
+        :param data: Rows of the table, all with the same keys.
+        :type data: list[dict]
+        :param types: Type and constraints of each column. Inferred from the
+            data when not given.
+        :type types: dict, optional
+        :param trusted: Whether data is known to be well formed (e.g., rows
+            generated by SQLito itself), in which case it is not validated,
+            and each column's type is that of its first non-NULL value.
+        :type trusted: bool, optional
+        """
         self.name = name
-        if self.__validate_table(data):
-            self.data = data
-        else:
+        if trusted and not data and types is None:
+            # The column names come from the first row, so even trusted data
+            # needs one when the types are not given
+            raise ValueError("Table data cannot be empty. There should be at least one row with column names, even if each column is empty.")
+        if not trusted and not self.__validate_table(data, types):
             raise ValueError("Invalid table data.")
-        
-        self.types = self.__determine_types()
+
+        # Every check, the type inference and the storage below work from the
+        # same column-wise copy of the data, read in a single pass per column
+        col_names = list(types) if types is not None else list(data[0].keys())
+        columns = {col_name: list(map(operator.itemgetter(col_name), data)) for col_name in col_names}
+
+        # Inferred types also track the data as it grows: a column that only
+        # held NULLs takes the type of its first value, and one without NULLs
+        # allows them once one is inserted.
+        self.inferred = types is None
+        self.types = types if types is not None else self.__determine_types(columns, trusted)
+
+        # Columnar storage: one container per column, picked from its type
+        self.storage = {
+            col_name: make_column(self.types[col_name]["type"], columns[col_name])
+            for col_name in self.types
+        }
+        self.row_count = len(data)
+
+        # Tables have a single writer at a time. Readers take no lock: rows
+        # are only ever appended, and row_count is only raised once a row
+        # (or batch) is completely written, so the rows below the row_count a
+        # reader saw form a consistent snapshot of the table.
+        self.write_lock = threading.RLock()
+
+        # Column statistics for the query planner, sampled when first needed
+        # and again once the table has grown enough to make them stale
+        self.stats = {}
+
+        # Secondary indexes, keyed by column name and then by index kind.
+        # UNIQUE and PRIMARY KEY columns always get a hash index, which is
+        # what their constraints are checked against on insert.
+        self.indexes = {}
+        self.pending_indexes = {}
+        for col_name, col_type in self.types.items():
+            if col_type.get("unique"):
+                self.add_index(HashIndex(col_name, self.storage[col_name]))
+
+    @classmethod
+    def from_storage(cls, name, types, storage, row_count, index_kinds=None):
+        """
+        Creates a table around existing column storage (e.g., columns mapped
+        from a file) without reading any of it. Its indexes are only built
+        from the columns when first needed.
+
+        :param name: Name of the table.
+        :type name: str
+        :param types: Type and constraints of each column.
+        :type types: dict
+        :param storage: Storage of each column, each holding row_count rows.
+        :type storage: dict[str, Column]
+        :param row_count: Number of rows.
+        :type row_count: int
+        :param index_kinds: Kinds of the indexes of each column.
+        :type index_kinds: dict[str, list[str]], optional
+
+        :return: The table.
+        :rtype: Table
+        """
+        table = cls.__new__(cls)
+        table.name = name
+        table.inferred = False
+        table.types = types
+        table.storage = storage
+        table.row_count = row_count
+        table.write_lock = threading.RLock()
+        table.stats = {}
+        table.indexes = {}
+        table.pending_indexes = {col_name: list(kinds) for col_name, kinds in (index_kinds or {}).items()}
+        for col_name, col_type in types.items():
+            if col_type.get("unique") and HashIndex.kind not in table.pending_indexes.get(col_name, []):
+                table.pending_indexes.setdefault(col_name, []).append(HashIndex.kind)
+        return table
+
+    @classmethod
+    def from_csv(cls, path, name=None, types=None, delimiter=",", encoding="utf-8", sample_size=SAMPLE_SIZE, chunk_size=CHUNK_SIZE):
+        """
+        Creates a table from a CSV file with a header row. The file is read a
+        chunk of rows at a time, and each chunk is converted and appended a
+        column at a time, so it is never held in memory as a whole.
+
+        Columns not given a type take the narrowest of INTEGER, REAL and TEXT
+        that holds every value in the first sample_size rows. Empty fields
+        (and NULL tokens like "null") are NULL.
+
+        :param path: Path of the file.
+        :type path: str
+        :param name: Name of the table. Defaults to the file name, without
+            its extension.
+        :type name: str, optional
+        :param types: SQL type of some or all columns, e.g. {"id": "INTEGER"}.
+        :type types: dict, optional
+        :param delimiter: Field delimiter.
+        :type delimiter: str, optional
+        :param encoding: Encoding of the file.
+        :type encoding: str, optional
+        :param sample_size: Number of rows column types are inferred from.
+        :type sample_size: int, optional
+        :param chunk_size: Number of rows read at a time.
+        :type chunk_size: int, optional
+
+        :return: The table.
+        :rtype: Table
+
+        :raises ValueError: If the file has no header, or a row has the wrong
+            number of fields.
+        :raises SQLitoTypeError: If a value doesn't fit the type of its
+            column, e.g. a TEXT value after the sample of an INTEGER column.
+        """
+        col_types, chunks = read_csv(path, types, delimiter, encoding, sample_size, chunk_size)
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        table = cls(name, [], types={
+            col: {"type": col_type, "allows_null": True, "primary_key": False, "default": None, "unique": False}
+            for col, col_type in col_types.items()
+        })
+        for columns in chunks:
+            table.append_batch(columns)
+        return table
 
     def get_name(self):
         return self.name
-    
+
     def get_columns(self):
-        return list(self.data[0].keys()) if self.data else [] 
+        return list(self.storage)
+
+    def has_column(self, name):
+        return name in self.storage
+
+    def get_column(self, name):
+        return self.storage[name]
+
+    def get_row_count(self):
+        return self.row_count
 
     def get_data(self):
-        return self.data
+        return RowView(self)
+
+    def get_row(self, position):
+        return {col_name: column[position] for col_name, column in self.storage.items()}
+
+    def get_index(self, column, kind):
+        if self.pending_indexes:
+            with self.write_lock:
+                self.__build_pending_indexes()
+        return self.indexes.get(column, {}).get(kind)
+
+    def add_index(self, index):
+        self.indexes.setdefault(index.column_name, {})[index.kind] = index
+
+    def index_kinds(self):
+        # Kinds of the indexes of each column, built or not
+        kinds = {col_name: list(indexes) for col_name, indexes in self.indexes.items()}
+        for col_name, pending in self.pending_indexes.items():
+            kinds.setdefault(col_name, []).extend(kind for kind in pending if kind not in kinds[col_name])
+        return kinds
 
-    def __validate_table(self, table):
+    def analyze(self, columns=None):
+        """
+        Samples the statistics of columns (all of them by default), which the
+        query planner estimates the rows matching a condition from. Columns
+        with a hash index get their exact number of distinct values from it.
+
+        :param columns: Names of the columns to analyze.
+        :type columns: list[str], optional
+
+        :return: The table.
+        :rtype: Table
+        """
+        for col_name in columns if columns is not None else self.storage:
+            index = self.get_index(col_name, HashIndex.kind)
+            distinct = len(index.buckets) - (None in index.buckets) if index is not None else None
+            self.stats[col_name] = analyze_column(self.storage[col_name], self.row_count, distinct)
+        return self
+
+    def get_stats(self, column):
+        """
+        Returns the statistics of a column, sampling them first if they were
+        never sampled or the table has grown too much since.
+
+        :param column: The column name.
+        :type column: str
+
+        :return: The statistics.
+        :rtype: ColumnStats
+        """
+        stats = self.stats.get(column)
+        if stats is None or stats.is_stale(self.row_count):
+            self.analyze([column])
+        return self.stats[column]
+
+    def append_row(self, row):
+        with self.write_lock:
+            if self.pending_indexes:
+                self.__build_pending_indexes()
+            position = self.row_count
+            for col_name, column in self.storage.items():
+                column.append(row[col_name])
+            if self.inferred:
+                for col_name, col_type in self.types.items():
+                    self.__update_type(col_type, row[col_name])
+            for col_name, indexes in self.indexes.items():
+                for index in indexes.values():
+                    index.insert(row[col_name], position)
+            # Publishes the row to readers
+            self.row_count += 1
+
+    def append_batch(self, columns):
+        """
+        Appends a batch of rows, given a column at a time.
+
+        :param columns: The values of every column, all of the same length.
+        :type columns: dict[str, list]
+        """
+        with self.write_lock:
+            if self.pending_indexes:
+                self.__build_pending_indexes()
+            position = self.row_count
+            count = len(next(iter(columns.values()), ()))
+            for col_name, column in self.storage.items():
+                column.extend(columns[col_name])
+            if self.inferred:
+                for col_name, col_type in self.types.items():
+                    values = columns[col_name]
+                    if None in values:
+                        self.__update_type(col_type, None)
+                    if col_type["type"] is None:
+                        self.__update_type(col_type, next((val for val in values if val is not None), None))
+            for col_name, indexes in self.indexes.items():
+                for index in indexes.values():
+                    index.insert_many(columns[col_name], position)
+            # Publishes the whole batch to readers at once
+            self.row_count += count
+
+    def __build_pending_indexes(self):
+        pending, self.pending_indexes = self.pending_indexes, {}
+        for col_name, kinds in pending.items():
+            for kind in kinds:
+                self.add_index(INDEX_TYPES[kind](col_name, self.storage[col_name]))
+
+    def __validate_table(self, table, types=None):
         # Ensure table is a list
         if not isinstance(table, list):
             raise ValueError("Table data must be a list.")
-        
-        # Check for empty table
-        if not table:
+
+        # Check for empty table. If the column types are given, the column
+        # names are known and the table may start out empty.
+        if not table and types is None:
             raise ValueError("Table data cannot be empty. There should be at least one row with column names, even if each column is empty.")
-        
+
         # Ensure all rows are dictionaries
-        if not all(isinstance(row, dict) for row in table):
+        if not all(issubclass(row_type, dict) for row_type in set(map(type, table))):
             raise ValueError("Table data must be a list of dictionaries.")
-        
-        # Ensure all rows have the same keys
-        expected_keys = set(table[0].keys())
-        for i, row in enumerate(table):
-            if set(row.keys()) != expected_keys:
-                raise ValueError(f"Row {i + 1} has inconsistent keys. Expected: {expected_keys}, Got: {set(row.keys())}")
-            
+
+        # Ensure all rows have the same keys. The keys of every row are
+        # compared as they are, without building a set per row, and the
+        # offending row is only looked for if there is one.
+        expected_keys = set(types) if types is not None else set(table[0].keys())
+        if not all(map(operator.eq, map(dict.keys, table), itertools.repeat(expected_keys))):
+            for i, row in enumerate(table):
+                if row.keys() != expected_keys:
+                    raise ValueError(f"Row {i + 1} has inconsistent keys. Expected: {expected_keys}, Got: {set(row.keys())}")
+
         # Ensure table has a valid name
         if not self.get_name():
             raise ValueError("Table must have a name.")
-            
+
         return True
-    
-    def __determine_types(self):
+
+    def __determine_types(self, columns, trusted=False):
         # Determine the type of the column based on the first non-None value
         # If there exists None values, add "None"
         results = {}
-        for col_name in self.get_columns(): 
-            col_type = {"type": None, "allows_null": False}
-            for row in self.data:
-                entry = row[col_name]
-                if entry is None:
-                    col_type["allows_null"] = True
-                else:
-                    if col_type["type"] is None:
-                        col_type["type"] = type(entry).__name__
-                    else:
-                        if col_type["type"] != type(entry).__name__:
-                            raise TypeError(f"Encountered a {col_type['type']} in column '{col_name}', but it is already set to {col_type['type']}.")
+        for col_name, values in columns.items():
+            col_type = {"type": None, "allows_null": None in values}
+            first = next((val for val in values if val is not None), None)
+            if first is not None:
+                col_type["type"] = type(first).__name__
+
+            if not trusted:
+                # Every value must be of the same type (or None)
+                value_types = set(map(type, values)) - {type(None)}
+                if len(value_types) > 1:
+                    entry = next(val for val in values if val is not None and type(val) is not type(first))
+                    raise TypeError(f"Encountered a {type(entry).__name__} in column '{col_name}', but it is already set to {col_type['type']}.")
             results[col_name] = col_type
         return results
-    
+
+    def __update_type(self, col_type, value):
+        # Keeps an inferred column type current as values are inserted
+        if value is None:
+            col_type["allows_null"] = True
+        elif col_type["type"] is None:
+            col_type["type"] = type(value).__name__
+
     def __str__(self):
         return self.name
-    
+
+class RowView:
+    """
+    Lazy sequence of the rows of a Table. Each row is materialized as a
+    dictionary only when it is accessed.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.get_row_count()
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.table.get_row(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("Row index out of range.")
+        return self.table.get_row(position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.table.get_row(position)
+
+    def append(self, row):
+        self.table.append_row(row)
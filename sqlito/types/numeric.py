@@ -1,4 +1,7 @@
-from . import TEXT, INTEGER, REAL, NONE
+from .integer import INTEGER
+from .none import NONE
+from .real import REAL
+from .text import TEXT
 from sqlito.exceptions import SQLitoTypeError
 
 class NUMERIC:
@@ -9,7 +12,20 @@ class NUMERIC:
 
     @classmethod
     def validate(cls, value):
-        cls.storage.validate(value)
+        """
+        Validates the type of the value against the valid types for this class.
+
+        :param value: Value to validate.
+        :type value: any
+
+        :raises SQLitoTypeError: If the value is not of a valid type.
+        """
+        if not isinstance(value, cls.valid_types):
+            raise SQLitoTypeError(
+                f"Invalid type for {cls.__name__} field.",
+                expected_type=cls.valid_types,
+                received_type=type(value).__name__
+            )
 
 
     @classmethod
@@ -0,0 +1,179 @@
+
+import contextlib
+import os
+import sqlite3
+
+from sqlito.builders import TableBuilder
+from sqlito.database import Database
+from sqlito.table import Table
+from sqlito._index import HashIndex
+
+__all__ = ["sqlite_to_db"]
+
+# Rows fetched from SQLite per batch
+FETCH_SIZE = 10_000
+
+# SQLite storage classes, as reported by typeof(), and the SQLito types
+# they are stored as
+STORAGE_CLASS_TYPES = {
+    "integer": "INTEGER",
+    "real": "REAL",
+    "text": "TEXT",
+    "blob": "BLOB",
+}
+
+def sqlite_to_db(file, lazy=False, fetch_size=FETCH_SIZE):
+    """
+    Imports the tables of a SQLite database file into a new database. Rows
+    are read in batches of fetch_size with `fetchmany` and appended a column
+    at a time, without being validated again: SQLite has already enforced
+    the constraints they were inserted with.
+
+    Each column's type comes from the affinity of its declared type, following
+    SQLite's own rules (e.g., VARCHAR(255) is TEXT, and BIGINT is INTEGER).
+    Columns with NUMERIC affinity, or without a declared type, take the type
+    of their first non-NULL value. Only STRICT tables enforce column types,
+    though, so the values of every column are checked as they are fetched:
+    a column whose values all have another type takes that type, one mixing
+    INTEGER and REAL values becomes REAL, and one mixing any other types is
+    left untyped (None). A single-column PRIMARY KEY, NOT NULL and
+    UNIQUE constraints and simple defaults are carried over, and every
+    single-column index is rebuilt as a hash index.
+
+    :param file: Path of the SQLite database file.
+    :type file: str
+    :param lazy: Whether to only import each table when it is first accessed
+        with `Database.get_table`, rather than all of them up front.
+    :type lazy: bool, optional
+    :param fetch_size: Number of rows read from SQLite at a time.
+    :type fetch_size: int, optional
+
+    :return: The database.
+    :rtype: Database
+
+    :raises FileNotFoundError: If the file does not exist.
+    """
+    if not os.path.exists(file):
+        raise FileNotFoundError(f"No SQLite database at {file}.")
+
+    db = Database()
+    with contextlib.closing(_connect(file)) as connection:
+        names = [name for name, in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        for name in names:
+            types = _import_types(connection, name)
+            if lazy:
+                # Loaded, with a connection of its own, from whichever thread
+                # first accesses it
+                db.add_lazy_table(name, types, lambda name=name, types=types: _load_table(file, name, types, fetch_size))
+            else:
+                db.insert_table((name, _import_table(connection, name, types, fetch_size)))
+    return db
+
+def _connect(file):
+    return sqlite3.connect(f"file:{file}?mode=ro", uri=True)
+
+def _load_table(file, name, types, fetch_size):
+    with contextlib.closing(_connect(file)) as connection:
+        return _import_table(connection, name, types, fetch_size)
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _affinity(declared):
+    # https://www.sqlite.org/datatype3.html#determination_of_column_affinity
+    declared = declared.upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "TEXT"
+    if "BLOB" in declared or not declared:
+        return None
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "REAL"
+    return None
+
+def _default(literal):
+    # Only plain literals are carried over, not expressions like
+    # CURRENT_TIMESTAMP, which SQLito has no way to evaluate
+    if literal is None:
+        return None
+    if len(literal) >= 2 and literal[0] == literal[-1] == "'":
+        return literal[1:-1].replace("''", "'")
+    for convert in (int, float):
+        try:
+            return convert(literal)
+        except ValueError:
+            pass
+    return None
+
+def _single_column_indexes(connection, name):
+    # Yields the column and uniqueness of each index on a single column.
+    # Partial indexes only cover some rows, so their uniqueness doesn't hold
+    # for the column as a whole.
+    for _, index, is_unique, _, partial in connection.execute(f"PRAGMA index_list({_quote(name)})").fetchall():
+        index_columns = connection.execute(f"PRAGMA index_info({_quote(index)})").fetchall()
+        if len(index_columns) == 1 and index_columns[0][2] is not None:
+            yield index_columns[0][2], bool(is_unique and not partial)
+
+def _import_types(connection, name):
+    # Type and constraints of each column, in the form TableBuilder builds
+    table = _quote(name)
+    columns = connection.execute(f"PRAGMA table_info({table})").fetchall()
+    primary_key = [col for col in columns if col[5]]
+    unique = {col for col, is_unique in _single_column_indexes(connection, name) if is_unique}
+
+    builder = TableBuilder(None, name)
+    for _, col, declared, not_null, default, _ in columns:
+        col_type = _affinity(declared)
+        if col_type is None:
+            # Type of the column's first value, if it has any
+            first = connection.execute(
+                f"SELECT typeof({_quote(col)}) FROM {table} WHERE {_quote(col)} IS NOT NULL LIMIT 1"
+            ).fetchone()
+            col_type = STORAGE_CLASS_TYPES[first[0]] if first else "TEXT"
+
+        builder.COLUMN(col, col_type)
+        if len(primary_key) == 1 and primary_key[0][1] == col:
+            builder.PRIMARY_KEY()
+        if not_null:
+            builder.NOT_NULL()
+        if col in unique:
+            builder.UNIQUE()
+        if _default(default) is not None:
+            builder.DEFAULT(_default(default))
+    return builder.types
+
+def _value_type(declared, value_types):
+    # Type of a column given the types of its (non-NULL) values
+    if not value_types:
+        return declared
+    if len(value_types) == 1:
+        return next(iter(value_types)).__name__
+    if value_types == {int, float}:
+        # SQLite compares INTEGER and REAL values as numbers, and so do REAL
+        # columns once their literals are coerced
+        return float.__name__
+    return None
+
+def _import_table(connection, name, types, fetch_size):
+    table = Table(name, [], types=types)
+    col_names = list(types)
+    # Types of the values of each column, which its declared type doesn't
+    # guarantee. Checked a batch at a time, once per distinct type.
+    value_types = {col: set() for col in col_names}
+    cursor = connection.execute(f"SELECT {', '.join(map(_quote, col_names))} FROM {_quote(name)}")
+    while rows := cursor.fetchmany(fetch_size):
+        columns = dict(zip(col_names, zip(*rows)))
+        for col, values in columns.items():
+            value_types[col].update(map(type, values))
+        table.append_batch(columns)
+    for col, col_types in value_types.items():
+        types[col]["type"] = _value_type(types[col]["type"], col_types - {type(None)})
+
+    # Other single-column indexes, built once every row is in
+    for col, _ in _single_column_indexes(connection, name):
+        if not table.get_index(col, HashIndex.kind):
+            table.add_index(HashIndex(col, table.get_column(col)))
+    return table
@@ -0,0 +1,25 @@
+import pytest
+
+from sqlito import Database, Table
+
+PEOPLE = [
+    {"id": 1, "name": "John", "age": 30, "role": "Engineer", "salary": 1000, "warnings": None},
+    {"id": 2, "name": "Jane", "age": 25, "role": "Manager", "salary": 2000, "warnings": None},
+    {"id": 3, "name": "Alice", "age": 35, "role": "Engineer", "salary": 3000, "warnings": None},
+    {"id": 4, "name": "Bob", "age": 40, "role": "Manager", "salary": 4000, "warnings": 1},
+    {"id": 5, "name": "Charlie", "age": 45, "role": "Engineer", "salary": 5000, "warnings": None},
+    {"id": 6, "name": "David", "age": 50, "role": "Manager", "salary": 1000, "warnings": 2},
+    {"id": 7, "name": "Eve", "age": 55, "role": "Engineer", "salary": 2000, "warnings": None},
+    {"id": 8, "name": "Frank", "age": 60, "role": "Manager", "salary": 2000, "warnings": None},
+    {"id": 9, "name": "Grace", "age": 65, "role": "Engineer", "salary": 5000, "warnings": None},
+    {"id": 10, "name": "Heidi", "age": 70, "role": "Manager", "salary": 4000, "warnings": 2},
+]
+
+@pytest.fixture
+def people():
+    return Table("people", [dict(row) for row in PEOPLE])
+
+@pytest.fixture
+def people_db(people):
+    # Nothing is printed or timed, so results can be compared directly
+    return Database([people]).timer("off")
@@ -0,0 +1,93 @@
+import pytest
+
+from sqlito import Query
+from sqlito.query import AVG, COUNT, MAX, MIN, SUM
+from sqlito._aggregate import Aggregation, parse_aggregate
+
+def test_parse_aggregate():
+    assert parse_aggregate("SUM(salary)") == ("SUM", "salary")
+    assert parse_aggregate("COUNT(*)") == ("COUNT", "*")
+    with pytest.raises(ValueError):
+        parse_aggregate("MEDIAN(salary)")
+    with pytest.raises(ValueError):
+        parse_aggregate("SUM(*)")
+
+def test_aggregation_reads_each_field_once_per_row():
+    reads = []
+    def getter_for(field):
+        def get(row):
+            reads.append(field)
+            return row[field]
+        return get
+    aggregation = Aggregation(["COUNT(*)", "SUM(x)", "AVG(x)", "MIN(x)", "MAX(x)", "COUNT(x)"], getter_for)
+    rows = [{"x": 3}, {"x": None}, {"x": 1}, {"x": 2}]
+    assert aggregation.run(rows) == {
+        "COUNT(*)": 4, "SUM(x)": 6, "AVG(x)": 2, "MIN(x)": 1, "MAX(x)": 3, "COUNT(x)": 3,
+    }
+    assert reads == ["x"] * 4
+
+def test_aggregates_in_one_query(people_db):
+    result = (
+        Query(people_db)
+        .SELECT(COUNT("*"), COUNT("warnings"), SUM("salary"), AVG("warnings"), MIN("age"), MAX("name"))
+        .FROM("people").execute()
+    )
+    assert result == {
+        "COUNT(*)": 10, "COUNT(warnings)": 3, "SUM(salary)": 29000,
+        "AVG(warnings)": 5 / 3, "MIN(age)": 25, "MAX(name)": "John",
+    }
+
+def test_aggregates_over_no_rows(people_db):
+    query = Query(people_db).SELECT(COUNT("*"), SUM("salary")).FROM("people").WHERE("age > 100")
+    with pytest.raises(ValueError, match="No values found"):
+        query.execute()
+
+def test_aggregates_skip_nulls(people_db):
+    result = (
+        Query(people_db).SELECT(SUM("warnings"), MIN("warnings"), MAX("warnings"))
+        .FROM("people").WHERE("warnings").IS_NULL().execute()
+    )
+    assert result == {"SUM(warnings)": 0, "MIN(warnings)": None, "MAX(warnings)": None}
+
+def test_aggregates_cannot_mix_with_fields(people_db):
+    with pytest.raises(ValueError):
+        Query(people_db).SELECT("name", COUNT("*")).FROM("people").execute()
+
+def test_group_by(people_db):
+    rows = (
+        Query(people_db).SELECT("role", COUNT("*"), SUM("salary"), MAX("warnings"))
+        .FROM("people").GROUP_BY("role").execute()
+    )
+    assert rows == [
+        {"role": "Engineer", "COUNT(*)": 5, "SUM(salary)": 16000, "MAX(warnings)": None},
+        {"role": "Manager", "COUNT(*)": 5, "SUM(salary)": 13000, "MAX(warnings)": 2},
+    ]
+
+def test_group_by_several_fields_with_where_order_and_limit(people_db):
+    rows = (
+        Query(people_db).SELECT("role", "salary", COUNT("*"))
+        .FROM("people").WHERE("age > 25").GROUP_BY("role", "salary")
+        .ORDER_BY("COUNT(*)", "DESC").LIMIT(2).execute()
+    )
+    assert rows == [
+        {"role": "Manager", "salary": 4000, "COUNT(*)": 2},
+        {"role": "Engineer", "salary": 5000, "COUNT(*)": 2},
+    ]
+
+def test_having(people_db):
+    query = lambda having: (
+        Query(people_db).SELECT("salary", COUNT("*")).FROM("people").GROUP_BY("salary").HAVING(having).execute()
+    )
+    assert query("count(*) > 1") == [
+        {"salary": 1000, "COUNT(*)": 2}, {"salary": 2000, "COUNT(*)": 3},
+        {"salary": 4000, "COUNT(*)": 2}, {"salary": 5000, "COUNT(*)": 2},
+    ]
+    assert query("salary >= 4000") == [{"salary": 4000, "COUNT(*)": 2}, {"salary": 5000, "COUNT(*)": 2}]
+
+def test_group_by_validation(people_db):
+    with pytest.raises(ValueError, match="must appear in GROUP BY"):
+        Query(people_db).SELECT("name", COUNT("*")).FROM("people").GROUP_BY("role").execute()
+    with pytest.raises(ValueError):
+        Query(people_db).SELECT("role").FROM("people").HAVING("COUNT(*) > 1")
+    with pytest.raises(ValueError):
+        Query(people_db).SELECT("role").FROM("people").GROUP_BY("role").HAVING("MEDIAN(age) > 1")
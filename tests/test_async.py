@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sqlito import Query
+from sqlito.query import COUNT
+from sqlito._async import iter_async
+
+@pytest.fixture
+def runs(monkeypatch):
+    # Records every query actually run, each taking long enough for the
+    # others to be awaited meanwhile
+    runs = []
+    execute = Query.execute
+    def slow_execute(query):
+        runs.append(str(query))
+        time.sleep(0.05)
+        return execute(query)
+    monkeypatch.setattr(Query, "execute", slow_execute)
+    return runs
+
+async def gather(*coroutines):
+    return await asyncio.gather(*coroutines)
+
+def test_execute_async_matches_execute(people_db):
+    query = lambda: Query(people_db).SELECT("name").FROM("people").WHERE("age > 50")
+    assert asyncio.run(query().execute_async()) == query().execute()
+
+def test_identical_queries_are_coalesced(people_db, runs):
+    query = lambda: Query(people_db).SELECT("name").FROM("people").WHERE("age > 50")
+    first, second, third = asyncio.run(gather(query().execute_async(), query().execute_async(), query().execute_async()))
+    assert len(runs) == 1
+    assert first is second is third
+
+    # Once it's done, the next one runs again
+    asyncio.run(query().execute_async())
+    assert len(runs) == 2
+
+def test_different_queries_are_not_coalesced(people_db, runs):
+    older, younger = asyncio.run(gather(
+        Query(people_db).SELECT("name").FROM("people").WHERE("age > 50").execute_async(),
+        Query(people_db).SELECT("name").FROM("people").WHERE("age < 50").execute_async(),
+    ))
+    assert len(runs) == 2
+    assert older != younger
+
+def test_prepared_queries_with_different_values_are_not_coalesced(people_db, runs):
+    prepared = people_db.prepare(Query(people_db).SELECT("name").FROM("people").WHERE("id = ?"))
+    results = asyncio.run(gather(
+        prepared.bind(1).execute_async(), prepared.bind(2).execute_async(), prepared.bind(1).execute_async(),
+    ))
+    assert results == [[{"name": "John"}], [{"name": "Jane"}], [{"name": "John"}]]
+    assert len(runs) == 2
+
+def test_query_after_insert_does_not_await_older_run(people_db, runs):
+    query = lambda: Query(people_db).SELECT(COUNT("*")).FROM("people")
+    async def main():
+        before = asyncio.create_task(query().execute_async())
+        await asyncio.sleep(0.01)
+        people_db.INSERT_INTO("people", ["id", "name"]).VALUES([11, "Ivan"])
+        after = await query().execute_async()
+        return await before, after
+    before, after = asyncio.run(main())
+    assert len(runs) == 2
+    assert after == {"COUNT(*)": 11}
+
+def test_coalescing_can_be_turned_off(people_db, runs):
+    query = lambda: Query(people_db).SELECT("name").FROM("people")
+    asyncio.run(gather(query().execute_async(coalesce=False), query().execute_async(coalesce=False)))
+    assert len(runs) == 2
+
+def test_cancelled_waiter_does_not_cancel_the_run(people_db, runs):
+    query = lambda: Query(people_db).SELECT("name").FROM("people")
+    async def main():
+        cancelled = asyncio.create_task(query().execute_async())
+        waiter = asyncio.create_task(query().execute_async())
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        return await waiter
+    assert len(asyncio.run(main())) == 10
+    assert len(runs) == 1
+
+def test_event_loop_keeps_running(people_db, runs):
+    async def main():
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+        ticker = asyncio.create_task(tick())
+        await Query(people_db).SELECT("name").FROM("people").execute_async()
+        ticker.cancel()
+        return ticks
+    assert asyncio.run(main()) > 3
+
+def test_iter_async(people_db):
+    async def collect(query, chunk_size, stop=None):
+        rows = []
+        async for row in query.iter_async(chunk_size=chunk_size):
+            rows.append(row)
+            if len(rows) == stop:
+                break
+        return rows
+    query = lambda: Query(people_db).SELECT("id").FROM("people").WHERE("age > 30")
+    assert asyncio.run(collect(query(), 3)) == query().execute()
+    assert asyncio.run(collect(query(), 3, stop=4)) == query().execute()[:4]
+
+    async def default_chunks():
+        return [row async for row in Query(people_db).SELECT("id").FROM("people")]
+    assert len(asyncio.run(default_chunks())) == 10
+
+def test_iter_async_rows_pulled_off_the_loop(people_db):
+    threads = set()
+    async def main():
+        loop_thread = threading.get_ident()
+        def make_rows():
+            for row in Query(people_db).SELECT("id").FROM("people").iter():
+                threads.add(threading.get_ident())
+                yield row
+        rows = [row async for row in iter_async(make_rows, chunk_size=2)]
+        return loop_thread, rows
+    loop_thread, rows = asyncio.run(main())
+    assert len(rows) == 10
+    assert loop_thread not in threads
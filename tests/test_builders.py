@@ -0,0 +1,93 @@
+import gc
+
+import pytest
+
+from sqlito import Database, Table
+
+@pytest.fixture
+def db():
+    return Database([Table("people", [{"id": 1, "name": "John", "role": "Engineer"}])])
+
+def test_inferred_column_allows_null_once_inserted(db):
+    table = db.get_table("people")
+    assert not table.types["role"]["allows_null"]
+
+    db.INSERT_INTO("people", ["id", "name"]).VALUES([2, "Jane"])
+    db.INSERT_INTO("people", ["id", "name"]).VALUES_MANY([[3, "Alice"], [4, "Bob"]])
+    assert table.types["role"]["allows_null"]
+    assert list(table.get_column("role")) == ["Engineer", None, None, None]
+
+def test_declared_not_null_column_rejects_null(db):
+    db.CREATE_TABLE("passwords").COLUMN("id", "INTEGER").PRIMARY_KEY().COLUMN("password", "TEXT").NOT_NULL().execute()
+    with pytest.raises(ValueError, match="does not allow NULL"):
+        db.INSERT_INTO("passwords", ["id"]).VALUES([1])
+    with pytest.raises(ValueError, match="does not allow NULL"):
+        db.INSERT_INTO("passwords", ["id"]).VALUES_MANY([[1], [2]])
+    assert db.get_table("passwords").get_row_count() == 0
+
+@pytest.fixture
+def accounts(db):
+    db.CREATE_TABLE("accounts").COLUMN("id", "INTEGER").PRIMARY_KEY().COLUMN("email", "TEXT").UNIQUE().execute()
+    return db
+
+def test_unique_violation_raises(accounts):
+    insert = accounts.INSERT_INTO("accounts", ["id", "email"])
+    insert.VALUES([1, "a@example.com"])
+    with pytest.raises(ValueError, match="must be unique"):
+        insert.VALUES([1, "b@example.com"])
+    with pytest.raises(ValueError, match="must be unique"):
+        insert.VALUES([2, "a@example.com"])
+    insert.VALUES([2, None])
+    insert.VALUES([3, None])
+    assert accounts.get_table("accounts").get_row_count() == 3
+
+def test_unique_checked_against_batch_and_table(accounts):
+    insert = accounts.INSERT_INTO("accounts", ["id", "email"])
+    insert.VALUES_MANY([[i, f"{i}@example.com"] for i in range(1000)])
+    with pytest.raises(ValueError, match="Value '1000'"):
+        insert.VALUES_MANY([[1000, "x"], [1001, "y"], [1000, "z"]])
+    with pytest.raises(ValueError, match="Value '999'"):
+        insert.VALUES([999, "x"])
+    assert accounts.get_table("accounts").get_row_count() == 1000
+
+def test_values_many_inserts_generator(accounts):
+    accounts.CREATE_INDEX("accounts", "email").USING("ORDERED").execute()
+    accounts.INSERT_INTO("accounts", ["id", "email"]).VALUES_MANY((i, f"{i}@example.com") for i in range(5))
+    table = accounts.get_table("accounts")
+    assert list(table.get_column("id")) == [0, 1, 2, 3, 4]
+    assert table.get_index("email", "ORDERED").range("2", "4") == [2, 3]
+
+@pytest.mark.parametrize("rows, error", [
+    ([[1, "a"], [2, 3]], TypeError),
+    ([[1, "a"], [2]], ValueError),
+    ([[1, "a"], "row"], TypeError),
+    ([[1, "a"], [1, "b"]], ValueError),
+])
+def test_values_many_is_atomic(accounts, rows, error):
+    with pytest.raises(error):
+        accounts.INSERT_INTO("accounts", ["id", "email"]).VALUES_MANY(rows)
+    table = accounts.get_table("accounts")
+    assert table.get_row_count() == 0
+    assert not table.get_index("id", "HASH").contains(1)
+
+def test_values_many_fills_defaults(db):
+    db.CREATE_TABLE("tasks").COLUMN("id", "INTEGER").COLUMN("state", "TEXT").DEFAULT("open").execute()
+    db.INSERT_INTO("tasks", ["id"]).VALUES_MANY([[1], [2]])
+    db.INSERT_INTO("tasks", ["id", "state"]).VALUES_MANY([[3, None], [4, "done"]])
+    assert list(db.get_table("tasks").get_column("state")) == ["open", "open", "open", "done"]
+
+def test_values_many_leaves_gc_alone(db):
+    def rows():
+        for i in range(5, 10):
+            # Still collecting while the batch is read
+            assert gc.isenabled()
+            yield [i, f"name {i}", None]
+    db.INSERT_INTO("people", ["id", "name", "role"]).VALUES_MANY(rows())
+
+    gc.disable()
+    try:
+        db.INSERT_INTO("people", ["id", "name", "role"]).VALUES_MANY([[10, "Ivan", None]])
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+    assert db.get_table("people").get_row_count() == 7
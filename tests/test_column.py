@@ -0,0 +1,48 @@
+from array import array
+
+from sqlito import Query, Table
+from sqlito._column import ArrayColumn, ObjectColumn, make_column
+
+def test_make_column_picks_storage_from_type():
+    assert isinstance(make_column("int"), ArrayColumn)
+    assert make_column("int").typecode == "q"
+    assert make_column("float").typecode == "d"
+    assert isinstance(make_column("str"), ObjectColumn)
+    assert isinstance(make_column(None), ObjectColumn)
+
+def test_array_column_tracks_nulls_in_a_bitmap():
+    column = ArrayColumn("q", [1, 2, 3])
+    assert column.nulls is None
+
+    column.extend([None, 5, None])
+    column.append(7)
+    assert list(column) == [1, 2, 3, None, 5, None, 7]
+    assert [column[i] for i in range(len(column))] == list(column)
+    assert column[-4] is None
+    get = column.getter()
+    assert [get(i) for i in range(len(column))] == list(column)
+    assert isinstance(column.values, array)
+
+def test_array_column_degrades_instead_of_altering_values():
+    column = ArrayColumn("q", [1, None])
+    column.append(2**70)
+    assert list(column) == [1, None, 2**70]
+    assert not isinstance(column.values, array)
+
+    column = ArrayColumn("d", [1.5])
+    column.extend([2.5, "text"])
+    assert list(column) == [1.5, 2.5, "text"]
+
+def test_table_stores_columns_by_type(people):
+    assert isinstance(people.get_column("id"), ArrayColumn)
+    assert isinstance(people.get_column("name"), ObjectColumn)
+    assert people.get_row(3) == {"id": 4, "name": "Bob", "age": 40, "role": "Manager", "salary": 4000, "warnings": 1}
+    assert people.get_data()[-1]["name"] == "Heidi"
+    assert len(people.get_data()) == 10
+
+def test_appended_rows_are_stored_by_column(people_db):
+    table = people_db.get_table("people")
+    table.get_data().append({"id": 11, "name": "Ivan", "age": 20, "role": "Intern", "salary": None, "warnings": None})
+    assert list(table.get_column("salary"))[-2:] == [4000, None]
+    rows = Query(people_db).SELECT("name").FROM("people").WHERE("salary").IS_NULL().execute()
+    assert rows == [{"name": "Ivan"}]
@@ -0,0 +1,44 @@
+import pytest
+
+from sqlito import Database, Query, SQLitoTypeError, Table
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_from_csv_infers_types(tmp_path):
+    path = write(tmp_path / "people.csv", "id,name,height,note\n1,John,1.8,\n2,Jane,2,NULL\n3,,1.65,hi\n")
+    table = Table.from_csv(path, chunk_size=2)
+    assert table.get_name() == "people"
+    assert {col: col_type["type"] for col, col_type in table.types.items()} == {
+        "id": "int", "name": "str", "height": "float", "note": "str",
+    }
+    assert list(table.get_data()) == [
+        {"id": 1, "name": "John", "height": 1.8, "note": None},
+        {"id": 2, "name": "Jane", "height": 2.0, "note": None},
+        {"id": 3, "name": None, "height": 1.65, "note": "hi"},
+    ]
+
+def test_from_csv_with_declared_types(tmp_path):
+    path = write(tmp_path / "codes.csv", "code;label\n007;x\n010;y\n")
+    table = Table.from_csv(path, name="codes", types={"code": "TEXT"}, delimiter=";")
+    assert list(table.get_column("code")) == ["007", "010"]
+
+def test_value_after_the_sample_must_fit(tmp_path):
+    path = write(tmp_path / "ids.csv", "id\n1\n2\nthree\n")
+    with pytest.raises(SQLitoTypeError):
+        Table.from_csv(path, sample_size=2, chunk_size=1)
+
+def test_ragged_row_rejected(tmp_path):
+    path = write(tmp_path / "ragged.csv", "a,b\n1,2\n3\n")
+    with pytest.raises(ValueError):
+        Table.from_csv(path)
+
+def test_to_csv_round_trip(tmp_path, people_db):
+    path = str(tmp_path / "out.csv")
+    query = Query(people_db).SELECT("id", "name", "warnings").FROM("people").WHERE("age < 50")
+    assert query.to_csv(path) == 5
+    with open(path, encoding="utf-8") as file:
+        assert file.readline() == "id,name,warnings\n"
+    table = Table.from_csv(path)
+    assert list(table.get_data()) == Query(people_db).SELECT("id", "name", "warnings").FROM("people").WHERE("age < 50").execute()
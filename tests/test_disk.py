@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from sqlito import Database, Query, Table
+import sqlito._disk as disk
+
+PAGES = 8
+
+@pytest.fixture
+def mapped(tmp_path):
+    rows = [{"id": i, "name": f"name {i}"} for i in range(disk.PAGE_ROWS * PAGES)]
+    Database([Table("people", rows)]).save(str(tmp_path))
+    db = Database.open(str(tmp_path)).timer("off")
+    yield db
+    db.close()
+
+def test_round_trip(tmp_path):
+    rows = [
+        {"id": 1, "score": 1.5, "name": "John", "blob": b"\x00\xff", "tag": None},
+        {"id": None, "score": None, "name": None, "blob": None, "tag": "x\x00y"},
+        {"id": 2**40, "score": -0.0, "name": "Zoë", "blob": b"", "tag": ""},
+    ]
+    db = Database([Table("things", rows)])
+    db.CREATE_INDEX("things", "name").USING("ORDERED").execute()
+    db.save(str(tmp_path))
+
+    opened = Database.open(str(tmp_path))
+    table = opened.get_table("things")
+    assert isinstance(table.get_column("id"), disk.MappedArrayColumn)
+    assert isinstance(table.get_column("name"), disk.MappedObjectColumn)
+    assert list(table.get_data()) == rows
+    assert table.types == db.get_table("things").types
+    assert table.get_index("name", "ORDERED").range("A", "Z") == [0]
+    opened.close()
+
+def test_pages_are_decoded_when_touched(mapped):
+    column = mapped.get_table("people").get_column("name")
+    assert len(column.cache) == 0
+    rows = Query(mapped).SELECT("name").FROM("people").WHERE("id = 5000").execute()
+    assert rows == [{"name": "name 5000"}]
+    assert list(column.cache) == [5000 // disk.PAGE_ROWS]
+    assert len(list(column)) == disk.PAGE_ROWS * PAGES
+
+def test_mapped_table_takes_inserts(mapped):
+    mapped.INSERT_INTO("people", ["id", "name"]).VALUES([-1, "new"])
+    table = mapped.get_table("people")
+    assert table.get_row(table.get_row_count() - 1) == {"id": -1, "name": "new"}
+    assert Query(mapped).SELECT("id").FROM("people").WHERE("name = 'new'").execute() == [{"id": -1}]
+
+def test_invalid_file_rejected(tmp_path):
+    (tmp_path / ("broken" + disk.FILE_SUFFIX)).write_bytes(b"not a table")
+    with pytest.raises(ValueError):
+        Database.open(str(tmp_path))
+
+class SlowCache(OrderedDict):
+    # Gives other threads the chance to run between a lookup and whatever
+    # the reader does with its result
+    def get(self, key, default=None):
+        page = super().get(key, default)
+        time.sleep(0.0001)
+        return page
+
+def test_concurrent_readers_share_page_cache(mapped, monkeypatch):
+    # Fewer cached pages than the readers use, so they keep evicting the
+    # pages other readers just looked up
+    monkeypatch.setattr(disk, "PAGE_CACHE_SIZE", 2)
+    column = mapped.get_table("people").get_column("name")
+    column.cache = SlowCache()
+
+    errors = []
+    def read(offset):
+        try:
+            for _ in range(20):
+                for number in range(PAGES):
+                    number = (number * offset + offset) % PAGES
+                    page = column.page(number)
+                    assert page[0] == f"name {number * disk.PAGE_ROWS}"
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=read, args=(offset,)) for offset in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(column.cache) <= 2
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from sqlito import Database, Query, Table
+from sqlito.query import COUNT, SUM
+from sqlito._index import HashIndex
+from sqlito._vectorized import VectorScan
+
+@pytest.fixture
+def db():
+    people = Table("people", [
+        {"id": i, "name": f"name {i}", "age": 20 + i % 50, "role": "Engineer" if i % 2 else "Manager"}
+        for i in range(1, 1001)
+    ])
+    return Database([people]).timer("off")
+
+def operators(node):
+    return [node.operator] + [op for child in node.children for op in operators(child)]
+
+def nodes(node):
+    # The nodes of a plan without joins, from its root down to its scan
+    return [node] + (nodes(node.children[0]) if node.children else [])
+
+@pytest.mark.parametrize("analyze", [False, True])
+def test_explain_aggregate(db, analyze):
+    plan = Query(db).SELECT(COUNT("*"), SUM("age")).FROM("people").explain(analyze)
+    assert operators(plan.root) == ["Aggregate", "Seq Scan"]
+    if analyze:
+        assert plan.root.rows_out == 1
+        assert plan.root.children[0].rows_out == 1000
+
+def test_explain_defers_index_lookup(db, monkeypatch):
+    db.CREATE_INDEX("people", "age").execute()
+    lookups = []
+    original = HashIndex.lookup
+    def slow_lookup(index, value, rows=None):
+        lookups.append(value)
+        time.sleep(0.02)
+        return original(index, value, rows)
+    monkeypatch.setattr(HashIndex, "lookup", slow_lookup)
+
+    query = lambda: Query(db).SELECT("name").FROM("people").WHERE("age = 30")
+    plan = query().explain()
+    assert operators(plan.root) == ["Project", "Filter", "Index Lookup"]
+    assert lookups == []
+
+    plan = query().explain(analyze=True)
+    lookup = plan.root.children[0].children[0]
+    assert lookups == [30]
+    assert lookup.rows_out == 20
+    assert lookup.time_ns >= 20_000_000
+
+def test_explain_defers_vector_mask(db, monkeypatch):
+    pytest.importorskip("numpy")
+    db.engine("vectorized")
+    masks = []
+    original = VectorScan.column
+    def column(scan, name):
+        masks.append(name)
+        return original(scan, name)
+    monkeypatch.setattr(VectorScan, "column", column)
+
+    query = lambda: Query(db).SELECT("name").FROM("people").WHERE("age > 60").AND("role = 'Engineer'")
+    plan = query().explain()
+    assert operators(plan.root) == ["Project", "Filter", "Vector Filter"]
+    assert masks == []
+
+    plan = query().explain(analyze=True)
+    assert masks == ["age"]
+    assert plan.root.rows_out == len(query().execute())
+
+def test_explain_analyze_counts_rows_and_predicates(db):
+    plan = (
+        Query(db).SELECT("name").FROM("people")
+        .WHERE("age >= 60").AND("role = 'Manager'").ORDER_BY("age", "DESC").LIMIT(5)
+        .explain(analyze=True)
+    )
+    assert operators(plan.root) == ["Project", "Limit", "Top-K", "Filter", "Seq Scan"]
+    project, limit, top_k, filtered, scan = nodes(plan.root)
+    assert (scan.rows_out, filtered.rows_in, filtered.rows_out) == (1000, 1000, 100)
+    assert (top_k.rows_out, limit.rows_out, project.rows_out) == (5, 5, 5)
+    evaluated = {stats["condition"]: (stats["evaluations"], stats["matches"]) for stats in filtered.predicates}
+    assert sum(matches for _, matches in evaluated.values()) > 100
+    assert sorted(evaluated.values())[0][1] == 100
+    assert all(node.time_ns >= node.self_time_ns >= 0 for node in (project, limit, top_k, filtered))
+    assert project.time_ns >= scan.time_ns
+
+def test_explain_without_analyze_runs_nothing(db):
+    plan = Query(db).SELECT("name").FROM("people").WHERE("age > 30").ORDER_BY("name").explain()
+    assert operators(plan.root) == ["Project", "Sort", "Filter", "Seq Scan"]
+    assert all(stats["evaluations"] == 0 for stats in plan.root.children[0].children[0].predicates)
+    assert "rows=" not in str(plan)
+    assert plan.to_dict() == {
+        "operator": "Project", "detail": "name", "children": [{
+            "operator": "Sort", "detail": "by name ASC", "children": [{
+                "operator": "Filter", "detail": "age > 30", "children": [{
+                    "operator": "Seq Scan", "detail": "on people (estimated 1000 rows)", "children": [],
+                }],
+            }],
+        }],
+    }
+
+def test_explain_renders_tree(db, capsys):
+    plan = Query(db).SELECT("name").FROM("people").WHERE("age > 68").explain(analyze=True)
+    lines = str(plan).splitlines()
+    assert lines[0].startswith("Project name (rows=20 ")
+    assert lines[1].startswith("  -> Filter age > 68 (rows=20 ")
+    assert lines[2].strip() == "age > 68: evaluated 1000, matched 20"
+    assert lines[3].startswith("    -> Seq Scan on people")
+    node = plan.to_dict()["children"][0]
+    assert (node["rows_in"], node["rows_out"], node["predicates"]) == (
+        1000, 20, [{"condition": "age > 68", "evaluations": 1000, "matches": 20}],
+    )
+    # Explaining prints nothing, whatever the database's mode
+    assert capsys.readouterr().out == ""
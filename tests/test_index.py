@@ -0,0 +1,130 @@
+import itertools
+
+import pytest
+
+from sqlito import Query, RowBuilder
+import sqlito._index as index_module
+from sqlito._column import make_column
+from sqlito._index import HashIndex, OrderedIndex, lookup_condition
+
+def operators(node):
+    return [node.operator] + [op for child in node.children for op in operators(child)]
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+def test_hash_index_buckets(people):
+    index = HashIndex("salary", people.get_column("salary"))
+    assert index.lookup(2000) == [1, 6, 7]
+    assert index.lookup(2000, rows=7) == [1, 6]
+    assert index.lookup(123) == []
+    assert index.lookup_many([5000, 1000, 5000]) == [0, 4, 5, 8]
+
+def test_lookup_condition(people):
+    people.add_index(HashIndex("warnings", people.get_column("warnings")))
+    assert lookup_condition(people, ("warnings", "IS NULL", None)) == [0, 1, 2, 4, 6, 7, 8]
+    assert lookup_condition(people, ("warnings", "=", "2")) == [5, 9]
+    assert lookup_condition(people, ("warnings", ">", "1")) is None
+    assert lookup_condition(people, {"logic": "OR", "conditions": [
+        ("warnings", "=", "1"), ("warnings", "=", "2"),
+    ]}) == [3, 5, 9]
+
+@pytest.mark.parametrize("where", [
+    lambda query: query.WHERE("salary = 2000"),
+    lambda query: query.WHERE("salary").IN([1000, 5000]),
+    lambda query: query.WHERE("salary = 2000").AND("age > 30"),
+])
+def test_index_lookup_matches_scan(people_db, where):
+    query = lambda: where(Query(people_db).SELECT("name").FROM("people"))
+    scanned = query().execute()
+    people_db.CREATE_INDEX("people", "salary").execute()
+    people_db.CREATE_INDEX("people", "warnings").execute()
+    assert "Index Lookup" in operators(query().explain().root)
+    assert query().execute() == scanned
+
+def test_unindexed_condition_scans(people_db):
+    people_db.CREATE_INDEX("people", "salary").execute()
+    plan = Query(people_db).SELECT("name").FROM("people").WHERE("salary > 2000").explain()
+    assert "Seq Scan" in operators(plan.root)
+    # OR groups only use indexes if every child can
+    plan = Query(people_db).SELECT("name").FROM("people").WHERE("salary = 2000").OR("age = 30").explain()
+    assert "Seq Scan" in operators(plan.root)
+
+def test_index_kept_current_on_insert(people_db):
+    people_db.CREATE_INDEX("people", "salary").execute()
+    RowBuilder(people_db, "people", ["id", "name", "age", "role", "salary", "warnings"]).VALUES(
+        [11, "Ivan", 20, "Intern", 2000, None]
+    )
+    rows = Query(people_db).SELECT("name").FROM("people").WHERE("salary = 2000").execute()
+    assert names(rows) == ["Jane", "Eve", "Frank", "Ivan"]
+
+def test_duplicate_index_rejected(people_db):
+    people_db.CREATE_INDEX("people", "salary").execute()
+    with pytest.raises(ValueError):
+        people_db.CREATE_INDEX("people", "salary").execute()
+    people_db.CREATE_INDEX("people", "salary").IF_NOT_EXISTS().execute()
+    with pytest.raises(ValueError):
+        people_db.CREATE_INDEX("people", "missing").execute()
+
+def test_uncomparable_literal_falls_back_to_scan(people):
+    people.add_index(HashIndex("name", people.get_column("name")))
+    assert lookup_condition(people, ("name", "IN", [["unhashable"]])) is None
+
+def test_ordered_index_ranges_and_order(people):
+    index = OrderedIndex("warnings", people.get_column("warnings"))
+    assert index.range(1, 2) == [3, 5, 9]
+    assert index.range(low=1, include_low=False) == [5, 9]
+    assert index.range(high=2, include_high=False) == [3]
+    assert index.range(1, 2, rows=6) == [3, 5]
+    assert list(index.ordered("ASC")) == [0, 1, 2, 4, 6, 7, 8, 3, 5, 9]
+    assert list(index.ordered("DESC")) == [5, 9, 3, 0, 1, 2, 4, 6, 7, 8]
+    assert index.lookup(None) == [0, 1, 2, 4, 6, 7, 8]
+
+@pytest.mark.parametrize("direction", ["ASC", "DESC"])
+def test_ordered_index_is_read_lazily(monkeypatch, direction):
+    index = OrderedIndex("id", make_column("int", range(100_000)))
+    bisects = []
+    bisect_left = index_module.bisect_left
+    def counted(*args):
+        bisects.append(args)
+        return bisect_left(*args)
+    monkeypatch.setattr(index_module, "bisect_left", counted)
+
+    first = list(itertools.islice(index.ordered(direction), 3))
+    assert first == ([0, 1, 2] if direction == "ASC" else [99_999, 99_998, 99_997])
+    # At most one run of equal keys looked up per row pulled
+    assert len(bisects) <= 3
+
+def test_ordered_index_merges_inserts(people):
+    index = OrderedIndex("age", people.get_column("age"))
+    index.insert_many([33, 80, None], 10)
+    index.insert(20, 13)
+    assert index.range(30, 35) == [0, 10, 2]
+    assert list(index.ordered("DESC"))[:2] == [11, 9]
+    assert list(index.ordered("ASC"))[:2] == [12, 13]
+
+@pytest.mark.parametrize("where", [
+    lambda query: query.WHERE("age").BETWEEN(35, 55),
+    lambda query: query.WHERE("age < 40"),
+    lambda query: query.WHERE("age >= 60"),
+    lambda query: query.WHERE("age > 50").AND("role = 'Manager'"),
+])
+def test_range_scan_matches_scan(people_db, where):
+    query = lambda: where(Query(people_db).SELECT("name").FROM("people"))
+    scanned = query().execute()
+    people_db.CREATE_INDEX("people", "age").USING("ORDERED").execute()
+    assert "Index Lookup" in operators(query().explain().root)
+    assert query().execute() == scanned
+
+@pytest.mark.parametrize("direction", ["ASC", "DESC"])
+def test_order_by_uses_index_order(people_db, direction):
+    query = lambda: Query(people_db).SELECT("name", "warnings").FROM("people").ORDER_BY("warnings", direction)
+    sorted_rows = query().execute()
+    people_db.CREATE_INDEX("people", "warnings").USING("ORDERED").execute()
+    ops = operators(query().explain().root)
+    assert "Index Scan" in ops and "Sort" not in ops
+    assert query().execute() == sorted_rows
+
+def test_invalid_index_kind(people_db):
+    with pytest.raises(ValueError):
+        people_db.CREATE_INDEX("people", "age").USING("BTREE")
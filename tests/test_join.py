@@ -0,0 +1,65 @@
+import pytest
+
+from sqlito import Database, Query, Table
+from sqlito._join import join_rows
+
+ORDERS = [
+    {"order_id": 1, "person_id": 2, "total": 10},
+    {"order_id": 2, "person_id": 4, "total": 20},
+    {"order_id": 3, "person_id": 2, "total": 30},
+    {"order_id": 4, "person_id": None, "total": 40},
+    {"order_id": 5, "person_id": 99, "total": 50},
+]
+
+@pytest.fixture
+def db(people):
+    return Database([people, Table("orders", [dict(row) for row in ORDERS])]).timer("off")
+
+def nested_loop(db, kind):
+    # What the join should return, by comparing every pair of rows
+    rows = []
+    for person in db.get_table("people").get_data():
+        matches = [order for order in ORDERS if order["person_id"] == person["id"]]
+        for order in matches:
+            rows.append({"people.name": person["name"], "orders.total": order["total"]})
+        if not matches and kind == "LEFT":
+            rows.append({"people.name": person["name"], "orders.total": None})
+    return rows
+
+def join(db, kind):
+    query = Query(db).SELECT("people.name", "orders.total").FROM("people")
+    query = query.JOIN("orders") if kind == "INNER" else query.LEFT_JOIN("orders")
+    return query.ON("people.id = orders.person_id")
+
+@pytest.mark.parametrize("kind", ["INNER", "LEFT"])
+@pytest.mark.parametrize("index", [None, "HASH", "ORDERED"])
+def test_join_matches_nested_loop(db, kind, index):
+    if index:
+        db.CREATE_INDEX("orders", "person_id").USING(index).execute()
+    rows = join(db, kind).execute()
+    key = lambda row: (row["people.name"], row["orders.total"] or 0)
+    assert sorted(rows, key=key) == sorted(nested_loop(db, kind), key=key)
+    if kind == "LEFT":
+        # The output follows the order of the left rows
+        assert rows == nested_loop(db, kind)
+
+def test_join_with_where_and_order(db):
+    rows = (
+        join(db, "INNER").WHERE("orders.total > 10").ORDER_BY("orders.total", "DESC").execute()
+    )
+    assert rows == [{"people.name": "Jane", "orders.total": 30}, {"people.name": "Bob", "orders.total": 20}]
+
+def test_join_builds_on_smaller_input(people):
+    orders = Table("orders", [dict(row) for row in ORDERS])
+    person_id = orders.get_column("person_id").getter()
+    # Two left rows, probed by the ten rows of people
+    joined = join_rows([(0,), (1,)], lambda row: person_id(row[0]), people, "id", row_count=2)
+    assert sorted(joined) == [(0, 1), (1, 3)]
+
+def test_on_validation(db):
+    with pytest.raises(ValueError):
+        Query(db).SELECT("people.name").FROM("people").ON("people.id = orders.person_id")
+    with pytest.raises(ValueError):
+        Query(db).SELECT("people.name").FROM("people").JOIN("orders").ON("people.id < orders.person_id")
+    with pytest.raises(ValueError):
+        Query(db).SELECT("people.name").FROM("people").JOIN("orders").execute()
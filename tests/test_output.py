@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+import sqlito._output as output
+from sqlito import Query
+from sqlito.query import COUNT
+
+ROWS = [{"id": 1, "name": "John, Jr.", "score": None}, {"id": 10, "name": "Jane", "score": 2.5}]
+
+class CountingStream(io.StringIO):
+    # Counts the writes the formatter makes
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+def render(mode, rows=ROWS, fields=("id", "name", "score")):
+    stream = io.StringIO()
+    output.FORMATTERS[mode](fields, stream).write(rows)
+    return stream.getvalue()
+
+def test_csv():
+    assert render("csv") == 'id,name,score\n1,"John, Jr.",\n10,Jane,2.5\n'
+
+def test_tabs():
+    assert render("tabs") == "1\tJohn, Jr.\tNone\n10\tJane\t2.5\n"
+
+def test_table():
+    assert render("table").splitlines() == [
+        "id | name      | score",
+        "---+-----------+------",
+        " 1 | John, Jr. | NULL ",
+        "10 | Jane      |   2.5",
+    ]
+
+def test_table_keeps_values_past_the_sample(monkeypatch):
+    monkeypatch.setattr(output, "WIDTH_SAMPLE_SIZE", 1)
+    rows = [{"name": "Jo", "id": 1}, {"name": "Johnny", "id": 2}]
+    lines = render("table", rows, ["name", "id"]).splitlines()
+    assert lines[-2:] == ["Jo   |  1", "Johnny |  2"]
+    # Nothing outside ASCII, so any stdout can print it
+    lines[-1].encode("ascii")
+
+def test_aggregate_result():
+    assert render("csv", {"COUNT(*)": 2}, ["COUNT(*)"]) == "COUNT(*)\n2\n"
+    assert render("csv", [], ["id"]) == "id\n"
+
+def test_rows_written_a_chunk_at_a_time(monkeypatch):
+    monkeypatch.setattr(output, "CHUNK_SIZE", 100)
+    stream = CountingStream()
+    output.CsvFormatter(["id"], stream).write([{"id": i} for i in range(1000)])
+    # The header, then one write per chunk
+    assert stream.writes == 11
+    assert len(stream.getvalue().splitlines()) == 1001
+
+@pytest.mark.parametrize("mode", ["python", "tabs", "csv", "table"])
+def test_query_prints_in_mode(people_db, capsys, mode):
+    people_db.mode(mode)
+    rows = Query(people_db).SELECT("id", "name").FROM("people").LIMIT(2).execute()
+    out = capsys.readouterr().out
+    assert out == render(mode, rows, ["id", "name"])
+    Query(people_db).SELECT(COUNT("*")).FROM("people").execute()
+    assert "10" in capsys.readouterr().out
+
+def test_invalid_mode(people_db):
+    with pytest.raises(ValueError):
+        people_db.mode("json")
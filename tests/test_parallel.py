@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from sqlito import Database, Query, Table
+from sqlito.query import AVG, COUNT, MAX, MIN, SUM
+import sqlito._parallel as parallel
+import sqlito.query
+
+pytestmark = pytest.mark.skipif(not parallel.fork_available(), reason="worker processes can't be forked")
+
+@pytest.fixture
+def db(monkeypatch):
+    # Small morsels, so that even a small table is split across workers
+    monkeypatch.setattr(parallel, "MORSEL_SIZE", 100)
+    monkeypatch.setattr(sqlito.query, "PARALLEL_MIN_ROWS", 500)
+    people = Table("people", [
+        {"id": i, "age": 20 + i % 50, "role": "Engineer" if i % 3 else "Manager", "salary": None if i % 7 == 0 else i * 10}
+        for i in range(1000)
+    ])
+    return Database([people]).timer("off")
+
+def scan_operator(plan):
+    node = plan.root
+    while node.children:
+        node = node.children[0]
+    return node.operator
+
+QUERIES = [
+    lambda db: Query(db).SELECT("id", "salary").FROM("people").WHERE("age > 40").OR("salary").IS_NULL(),
+    lambda db: Query(db).SELECT("id").FROM("people").WHERE("role = 'Manager'").ORDER_BY("salary", "DESC").LIMIT(15),
+    lambda db: Query(db).SELECT(COUNT("*"), COUNT("salary"), SUM("salary"), AVG("salary"), MIN("age"), MAX("role")).FROM("people"),
+    lambda db: Query(db).SELECT(SUM("salary"), MAX("salary")).FROM("people").WHERE("age").BETWEEN(30, 35),
+    lambda db: (
+        Query(db).SELECT("age", "role", COUNT("*"), AVG("salary")).FROM("people")
+        .WHERE("id > 100").GROUP_BY("age", "role").HAVING("COUNT(*) > 6").ORDER_BY("age")
+    ),
+]
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_matches_serial(db, query, workers):
+    expected = query(db).execute()
+    db.parallel(workers)
+    assert scan_operator(query(db).explain()).startswith("Parallel")
+    assert query(db).execute() == expected
+
+def test_small_tables_scanned_serially(db, monkeypatch):
+    monkeypatch.setattr(sqlito.query, "PARALLEL_MIN_ROWS", 5000)
+    db.parallel(2)
+    assert scan_operator(Query(db).SELECT("id").FROM("people").explain()) == "Seq Scan"
+
+def test_falls_back_to_serial_while_other_threads_run(db):
+    db.parallel(2)
+    query = lambda: Query(db).SELECT("id").FROM("people").WHERE("age > 40")
+    assert scan_operator(query().explain()) == "Parallel Seq Scan"
+    expected = query().execute()
+
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        assert scan_operator(query().explain()) == "Seq Scan"
+        assert query().execute() == expected
+    finally:
+        stop.set()
+        thread.join()
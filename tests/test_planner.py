@@ -0,0 +1,103 @@
+import pytest
+
+from sqlito import Database, Query, Table
+from sqlito._column import make_column
+from sqlito._stats import analyze_column, estimate_distinct, is_stale
+
+@pytest.fixture
+def db():
+    table = Table("events", [
+        {"id": i, "kind": "click" if i % 2 else "view", "user": i % 1000, "score": None if i % 4 == 0 else i % 100}
+        for i in range(10_000)
+    ])
+    db = Database([table]).timer("off")
+    db.CREATE_INDEX("events", "id").USING("ORDERED").execute()
+    db.CREATE_INDEX("events", "kind").execute()
+    db.CREATE_INDEX("events", "user").execute()
+    return db
+
+def nodes(node):
+    return [node] + (nodes(node.children[0]) if node.children else [])
+
+def scan(plan):
+    return nodes(plan.root)[-1]
+
+def test_column_statistics():
+    column = make_column("int", [None if i % 4 == 0 else i % 100 for i in range(10_000)])
+    stats = analyze_column(column, 10_000)
+    assert stats.null_fraction == pytest.approx(0.25)
+    assert stats.distinct == pytest.approx(75, rel=0.1)
+    assert stats.range_fraction(high=49) == pytest.approx(0.375, abs=0.03)
+    assert stats.range_fraction(low=10, high=19) == pytest.approx(0.075, abs=0.02)
+    assert stats.range_fraction(low="x") is None
+
+def test_estimate_distinct():
+    assert estimate_distinct([1, 2, 3, 1, 2, 3], 6) == 3
+    # Values each seen once in a small sample are likely to have unseen peers
+    assert estimate_distinct(list(range(100)), 10_000) > 1_000
+
+def test_statistics_refreshed_once_stale(db):
+    table = db.get_table("events")
+    stats = table.get_stats("user")
+    assert table.get_stats("user") is stats
+    assert not is_stale(10_000, 12_000) and is_stale(10_000, 13_001)
+    db.INSERT_INTO("events", ["id", "kind", "user", "score"]).VALUES_MANY(
+        [[i, "view", 5, None] for i in range(10_000, 13_500)]
+    )
+    assert table.get_stats("user") is not stats
+    db.ANALYZE("events")
+    with pytest.raises(ValueError):
+        db.ANALYZE("missing")
+
+@pytest.mark.parametrize("where, operator, detail", [
+    (lambda query: query.WHERE("user = 5"), "Index Lookup", "user = 5"),
+    # Every row matches: reading them through the index costs more
+    (lambda query: query.WHERE("kind").IN(["view", "click"]), "Seq Scan", None),
+    (lambda query: query.WHERE("kind = 'view'").AND("user = 5"), "Index Lookup", "user = 5"),
+    (lambda query: query.WHERE("id").BETWEEN(100, 120), "Index Lookup", "id BETWEEN"),
+    (lambda query: query.WHERE("id > 100"), "Seq Scan", None),
+    (lambda query: query.WHERE("id > 9990").AND("user < 500"), "Index Lookup", "id > 9990"),
+])
+def test_planner_picks_cheapest_scan(db, where, operator, detail):
+    query = lambda: where(Query(db).SELECT("id").FROM("events"))
+    node = scan(query().explain())
+    assert node.operator == operator
+    if detail:
+        assert detail in node.detail
+    # The same rows as scanning a copy of the table without indexes
+    unindexed = Database([Table("events", list(db.get_table("events").get_data()))]).timer("off")
+    assert query().execute() == where(Query(unindexed).SELECT("id").FROM("events")).execute()
+
+def test_planner_scans_ordered_index_for_small_limit(db):
+    plan = Query(db).SELECT("id").FROM("events").WHERE("kind = 'view'").ORDER_BY("id", "DESC").LIMIT(5).explain()
+    assert scan(plan).operator == "Index Scan"
+    # Without LIMIT the whole index would be read in order, which costs more
+    # than reading the few matching rows and sorting them
+    plan = Query(db).SELECT("id").FROM("events").WHERE("user = 5").ORDER_BY("id").explain()
+    assert scan(plan).operator == "Index Lookup"
+
+def test_planner_prefers_top_k_over_selective_lookup(db):
+    # Ten rows match: looking them up and keeping the top 3 beats reading
+    # the ordered index until 3 of them are found
+    query = lambda: Query(db).SELECT("id").FROM("events").WHERE("user = 5").ORDER_BY("id", "DESC").LIMIT(3)
+    plan = query().explain(analyze=True)
+    assert [node.operator for node in nodes(plan.root)] == ["Project", "Limit", "Top-K", "Filter", "Index Lookup"]
+    assert query().execute() == [{"id": 9005}, {"id": 8005}, {"id": 7005}]
+
+def test_ordered_scan_reads_about_its_estimate(db):
+    plan = Query(db).SELECT("id").FROM("events").WHERE("kind = 'view'").ORDER_BY("id", "DESC").LIMIT(3).explain(analyze=True)
+    node = scan(plan)
+    assert node.operator == "Index Scan"
+    assert "(estimated 6 rows)" in node.detail
+    assert node.rows_out == 6
+
+def test_planner_orders_conditions(db):
+    plan = (
+        Query(db).SELECT("id").FROM("events")
+        .WHERE("kind = 'view'").AND("score").IS_NOT_NULL().AND("score = 7").explain(analyze=True)
+    )
+    filtered = plan.root.children[0]
+    conditions = [stats["condition"] for stats in filtered.predicates]
+    # Every predicate is counted, in the order it's evaluated in
+    assert conditions[0] == "score = 7"
+    assert filtered.rows_out == 0
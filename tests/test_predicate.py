@@ -0,0 +1,106 @@
+import sys
+
+import pytest
+
+from sqlito import Query
+from sqlito._predicate import coerce_literal, compile_condition, like_matcher, like_prefix, prefix_successor
+
+ROWS = [
+    {"name": "John", "age": 30},
+    {"name": "Jane", "age": None},
+    {"name": "Alice", "age": 35},
+]
+TYPES = {"name": "str", "age": "int"}
+
+def matches(condition):
+    predicate = compile_condition(condition, lambda field: lambda row: row[field], TYPES.get)
+    return [row["name"] for row in ROWS if predicate(row)]
+
+def test_coerce_literal():
+    assert coerce_literal("30", "int") == 30
+    assert coerce_literal("30.5", "float") == 30.5
+    assert coerce_literal("30", "str") == "30"
+    with pytest.raises(ValueError):
+        coerce_literal("thirty", "int")
+
+@pytest.mark.parametrize("condition, expected", [
+    (("age", ">", "30"), ["Alice"]),
+    (("age", "<>", "30"), ["Alice"]),
+    (("name", "=", "'Jane'"), ["Jane"]),
+    (("age", "IN", ["30", "35"]), ["John", "Alice"]),
+    (("age", "BETWEEN", ("31", "40")), ["Alice"]),
+    (("age", "IS NULL", None), ["Jane"]),
+    (("age", "IS NOT NULL", None), ["John", "Alice"]),
+    (("name", "LIKE", "J%"), ["John", "Jane"]),
+])
+def test_comparisons(condition, expected):
+    assert matches(condition) == expected
+
+def test_null_never_compares():
+    assert matches(("age", "!=", "30")) == ["Alice"]
+
+def test_logic_groups_short_circuit():
+    evaluated = []
+    def getter_for(field):
+        def get(row):
+            evaluated.append(field)
+            return row[field]
+        return get
+    condition = {"logic": "OR", "conditions": [
+        ("name", "=", "John"),
+        {"logic": "AND", "conditions": [("age", ">", "30"), ("name", "LIKE", "A%")]},
+    ]}
+    predicate = compile_condition(condition, getter_for, TYPES.get)
+    assert predicate(ROWS[0])
+    assert evaluated == ["name"]
+    assert [row["name"] for row in ROWS if predicate(row)] == ["John", "Alice"]
+
+def test_invalid_operator():
+    with pytest.raises(ValueError):
+        compile_condition(("age", "~", "1"), lambda field: None, TYPES.get)
+    with pytest.raises(ValueError):
+        compile_condition({"logic": "XOR", "conditions": [("age", "=", "1")]}, lambda field: None, TYPES.get)
+
+def test_where_filters_with_compiled_predicate(people_db):
+    rows = (
+        Query(people_db).SELECT("name").FROM("people")
+        .WHERE("role = 'Engineer'").AND("age > 40").OR("warnings").IS_NOT_NULL()
+        .execute()
+    )
+    assert [row["name"] for row in rows] == ["Bob", "Charlie", "David", "Eve", "Grace", "Heidi"]
+
+@pytest.mark.parametrize("pattern, value, expected", [
+    ("John", "John", True),
+    ("John", "Johnny", False),
+    ("Jo%", "Johnny", True),
+    ("%ny", "Johnny", True),
+    ("%hn%", "Johnny", True),
+    ("J_hn", "John", True),
+    ("J_hn", "Jhn", False),
+    ("a.c%", "abc", False),
+    ("a.c%", "a.cd", True),
+    ("(%)", "(x)", True),
+    ("%", "", True),
+])
+def test_like_matcher(pattern, value, expected):
+    assert bool(like_matcher(pattern)(value)) is expected
+
+def test_like_prefix():
+    assert like_prefix("abc%") == "abc"
+    assert like_prefix("a_c%") == "a"
+    assert like_prefix("%abc") == ""
+    assert prefix_successor("abc") == "abd"
+    assert prefix_successor(chr(sys.maxunicode)) is None
+
+@pytest.mark.parametrize("pattern, operator", [
+    ("'Ja%'", "Index Lookup"),
+    ("'Jane'", "Index Lookup"),
+    ("'%e'", "Seq Scan"),
+])
+def test_like_uses_ordered_index(people_db, pattern, operator):
+    query = lambda: Query(people_db).SELECT("name").FROM("people").WHERE("name").LIKE(pattern)
+    scanned = query().execute()
+    people_db.CREATE_INDEX("people", "name").USING("ORDERED").execute()
+    plan = query().explain()
+    assert plan.root.children[-1].children[-1].operator == operator
+    assert query().execute() == scanned
@@ -0,0 +1,84 @@
+import pytest
+
+from sqlito import Database, Query, Table
+from sqlito.query import COUNT
+
+@pytest.fixture
+def db():
+    people = Table("people", [
+        {"id": i, "name": f"name {i}", "age": 20 + i % 50, "role": "Engineer" if i % 3 else "Manager"}
+        for i in range(1, 2001)
+    ])
+    return Database([people]).timer("off")
+
+def scan_operator(query):
+    node = query.explain().root
+    while node.children:
+        node = node.children[0]
+    return node.operator
+
+def test_binds_positional_and_named_placeholders(db):
+    prepared = db.prepare(
+        Query(db).SELECT("id").FROM("people").WHERE("age").BETWEEN("?", "?").AND("role = :role").AND("id").IN(["?", "?", "?"])
+    )
+    expected = Query(db).SELECT("id").FROM("people").WHERE("age").BETWEEN("30", "40") \
+                        .AND("role = 'Manager'").AND("id").IN([12, 30, 60]).execute()
+    assert prepared.execute(30, 40, 12, 30, 60, role="Manager") == expected
+    assert prepared.execute(20, 21, 1, 2, 3, role="Engineer") == [{"id": 1}]
+
+    with pytest.raises(ValueError, match="positional"):
+        prepared.execute(30, 40, role="Manager")
+    with pytest.raises(ValueError, match="Missing named"):
+        prepared.execute(30, 40, 12, 30, 60)
+
+def test_binds_having(db):
+    prepared = db.prepare(
+        Query(db).SELECT("role", COUNT("*")).FROM("people").WHERE("age > ?").GROUP_BY("role").HAVING("COUNT(*) > ?")
+    )
+    assert prepared.execute(60, 0) == [{"role": "Engineer", "COUNT(*)": 240}, {"role": "Manager", "COUNT(*)": 120}]
+    assert prepared.execute(60, 200) == [{"role": "Engineer", "COUNT(*)": 240}]
+
+def test_plan_is_reused_until_the_schema_changes(db):
+    prepared = db.prepare(Query(db).SELECT("name").FROM("people").WHERE("id = ?"))
+    assert scan_operator(prepared.bind(5)) == "Seq Scan"
+    assert prepared.execute(5) == [{"name": "name 5"}]
+
+    db.CREATE_INDEX("people", "id").execute()
+    assert scan_operator(prepared.bind(5)) == "Index Lookup"
+    assert prepared.execute(7) == [{"name": "name 7"}]
+
+def test_plan_is_made_again_once_the_table_grows(db):
+    db.CREATE_TABLE("orders").COLUMN("id", "INTEGER").PRIMARY_KEY().COLUMN("total", "INTEGER").execute()
+    prepared = db.prepare(Query(db).SELECT("total").FROM("orders").WHERE("id = ?"))
+    assert prepared.execute(3) == []
+    assert scan_operator(prepared.bind(3)) == "Seq Scan"
+
+    db.INSERT_INTO("orders", ["id", "total"]).VALUES_MANY([[i, i * 10] for i in range(5000)])
+    assert scan_operator(prepared.bind(3)) == "Index Lookup"
+    assert prepared.execute(3) == [{"total": 30}]
+
+def test_prepared_by_key_without_building(db):
+    built = []
+    def build():
+        built.append(True)
+        return Query(db).SELECT("name").FROM("people").WHERE("id = ?")
+
+    assert db.prepare(build, key="person").execute(3) == [{"name": "name 3"}]
+    assert db.prepare(build, key="person").execute(4) == [{"name": "name 4"}]
+    assert len(built) == 1
+
+    # A schema change empties the cache, and the query is built again
+    db.CREATE_INDEX("people", "age").execute()
+    assert db.prepare(build, key="person").execute(5) == [{"name": "name 5"}]
+    assert len(built) == 2
+
+def test_same_shape_shares_prepared_query(db):
+    build = lambda: Query(db).SELECT("name").FROM("people").WHERE("id = ?")
+    assert db.prepare(build()) is db.prepare(build())
+
+def test_replaced_table_raises(db):
+    prepared = db.prepare(Query(db).SELECT("name").FROM("people").WHERE("id = ?"))
+    db.drop_table(["people"])
+    db.insert_table(("people", Table("people", [{"id": 1, "name": "John", "age": 30, "role": "Engineer"}])))
+    with pytest.raises(ValueError, match="changed since the query was prepared"):
+        prepared.execute(1)
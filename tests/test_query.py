@@ -0,0 +1,48 @@
+import pytest
+
+from sqlito import Query
+from sqlito.query import COUNT
+
+def operators(node):
+    return [node.operator] + [op for child in node.children for op in operators(child)]
+
+@pytest.mark.parametrize("direction", ["ASC", "DESC"])
+@pytest.mark.parametrize("field", ["salary", "warnings", "role"])
+@pytest.mark.parametrize("limit", [1, 3, 7, 20])
+def test_top_k_matches_stable_sort(people_db, field, direction, limit):
+    sorted_rows = Query(people_db).SELECT("id", field).FROM("people").ORDER_BY(field, direction).execute()
+    query = lambda: Query(people_db).SELECT("id", field).FROM("people").ORDER_BY(field, direction).LIMIT(limit)
+    assert "Top-K" in operators(query().explain().root)
+    assert query().execute() == sorted_rows[:limit]
+
+def test_order_by_puts_nulls_first_ascending(people_db):
+    rows = Query(people_db).SELECT("name").FROM("people").ORDER_BY("warnings").execute()
+    assert [row["name"] for row in rows] == ["John", "Jane", "Alice", "Charlie", "Eve", "Frank", "Grace", "Bob", "David", "Heidi"]
+
+def test_iter_is_lazy(people_db):
+    rows = Query(people_db).SELECT("name").FROM("people").WHERE("age > 30").iter()
+    assert next(rows) == {"name": "Alice"}
+    assert list(rows) == [{"name": name} for name in ["Bob", "Charlie", "David", "Eve", "Frank", "Grace", "Heidi"]]
+    assert list(Query(people_db).SELECT("name").FROM("people").LIMIT(2)) == [{"name": "John"}, {"name": "Jane"}]
+
+def test_iter_of_aggregates_yields_one_row(people_db):
+    assert list(Query(people_db).SELECT(COUNT("*")).FROM("people").iter()) == [{"COUNT(*)": 10}]
+
+def test_limit_stops_the_scan(people_db):
+    plan = Query(people_db).SELECT("name").FROM("people").WHERE("age > 30").LIMIT(2).explain(analyze=True)
+    filtered = plan.root.children[0].children[0]
+    assert (filtered.operator, filtered.rows_out) == ("Filter", 2)
+    assert filtered.children[0].rows_out == 4
+
+    # With ORDER BY, every row must be read before the first is produced
+    plan = Query(people_db).SELECT("name").FROM("people").ORDER_BY("age").LIMIT(2).explain(analyze=True)
+    top_k = plan.root.children[0].children[0]
+    assert (top_k.operator, top_k.rows_in, top_k.rows_out) == ("Top-K", 10, 2)
+
+def test_execute_stream_prints_rows_as_produced(people_db, capsys):
+    people_db.mode("tabs")
+    rows = Query(people_db).SELECT("name").FROM("people").LIMIT(3).execute_stream()
+    assert capsys.readouterr().out == ""
+    assert [row["name"] for row in rows] == ["John", "Jane", "Alice"]
+    out = capsys.readouterr().out
+    assert "John" in out and "Alice" in out and "Bob" not in out
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from sqlito import Database, Query
+from sqlito.query import COUNT, SUM
+
+BATCH = 100
+
+@pytest.fixture
+def db():
+    db = Database().timer("off")
+    db.CREATE_TABLE("events").COLUMN("id", "INTEGER").COLUMN("batch", "INTEGER").COLUMN("label", "TEXT").execute()
+    db.CREATE_INDEX("events", "batch").execute()
+    db.CREATE_INDEX("events", "id").USING("ORDERED").execute()
+    return db
+
+def insert_batch(db, batch):
+    start = batch * BATCH
+    db.INSERT_INTO("events", ["id", "batch", "label"]).VALUES_MANY(
+        [[i, batch, f"event {i}"] for i in range(start, start + BATCH)]
+    )
+
+def test_query_reads_the_rows_there_when_it_started(db):
+    insert_batch(db, 0)
+    rows = Query(db).SELECT("id").FROM("events").iter()
+    lookup = Query(db).SELECT("id").FROM("events").WHERE("batch = 0").OR("batch = 1").iter()
+    ordered = Query(db).SELECT("id").FROM("events").ORDER_BY("id", "DESC").LIMIT(3).iter()
+    assert next(rows) == {"id": 0}
+    insert_batch(db, 1)
+    db.INSERT_INTO("events", ["id", "batch", "label"]).VALUES([10_000, 0, "late"])
+    assert len(list(rows)) == BATCH - 1
+    assert len(list(lookup)) == BATCH
+    assert list(ordered) == [{"id": 99}, {"id": 98}, {"id": 97}]
+
+def test_readers_never_see_half_a_batch(db):
+    insert_batch(db, 0)
+    done = threading.Event()
+    errors = []
+
+    def write():
+        try:
+            for batch in range(1, 60):
+                insert_batch(db, batch)
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                result = Query(db).SELECT(COUNT("*"), SUM("batch")).FROM("events").execute()
+                count = result["COUNT(*)"]
+                batches = count // BATCH
+                assert count % BATCH == 0
+                assert result["SUM(batch)"] == BATCH * batches * (batches - 1) // 2
+
+                # The last batch counted is complete in any later snapshot
+                rows = Query(db).SELECT("id", "label").FROM("events").WHERE(f"batch = {batches - 1}").execute()
+                assert len(rows) == BATCH
+                assert all(row["label"] == f"event {row['id']}" for row in rows)
+
+                top = Query(db).SELECT("id").FROM("events").ORDER_BY("id", "DESC").LIMIT(1).execute()
+                assert top[0]["id"] % BATCH == BATCH - 1
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer = threading.Thread(target=write)
+    for thread in readers + [writer]:
+        thread.start()
+    for thread in readers + [writer]:
+        thread.join()
+    assert errors == []
+    assert db.get_table("events").get_row_count() == 60 * BATCH
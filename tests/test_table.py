@@ -0,0 +1,49 @@
+import pytest
+
+from sqlito import Table
+
+def test_types_are_inferred_in_one_pass():
+    table = Table("t", [{"a": 1, "b": None, "c": "x"}, {"a": 2, "b": 1.5, "c": None}])
+    assert table.types == {
+        "a": {"type": "int", "allows_null": False},
+        "b": {"type": "float", "allows_null": True},
+        "c": {"type": "str", "allows_null": True},
+    }
+
+@pytest.mark.parametrize("data, error", [
+    ({"a": 1}, ValueError),
+    ([], ValueError),
+    ([{"a": 1}, [1]], ValueError),
+    ([{"a": 1}, {"b": 1}], ValueError),
+    ([{"a": 1}, {"a": "x"}], TypeError),
+])
+def test_invalid_data_rejected(data, error):
+    with pytest.raises(error):
+        Table("t", data)
+
+def test_trusted_data_skips_validation():
+    table = Table("t", [{"a": None}, {"a": 1}, {"a": "x"}], trusted=True)
+    assert table.types == {"a": {"type": "int", "allows_null": True}}
+    assert list(table.get_column("a")) == [None, 1, "x"]
+
+def test_trusted_empty_data_needs_types():
+    with pytest.raises(ValueError):
+        Table("t", [], trusted=True)
+    assert Table("t", [], {"a": {"type": "int"}}, trusted=True).get_row_count() == 0
+
+def test_inferred_types_follow_inserts():
+    table = Table("t", [{"a": None, "b": 1}])
+    assert table.types["a"]["type"] is None
+    table.append_row({"a": "x", "b": 2})
+    assert table.types["a"] == {"type": "str", "allows_null": True}
+    assert not table.types["b"]["allows_null"]
+    table.append_batch({"a": ["y", "z"], "b": [3, None]})
+    assert table.types["b"] == {"type": "int", "allows_null": True}
+    assert table.get_row_count() == 4
+
+def test_declared_types_allow_empty_table():
+    types = {"a": {"type": "int", "allows_null": True}}
+    table = Table("t", [], types)
+    assert table.get_row_count() == 0
+    table.append_row({"a": None})
+    assert table.types is types and not table.inferred
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+
+import pytest
+
+import sqlito.utils
+from sqlito import Query, sqlite_to_db
+
+@pytest.fixture
+def sqlite_file(tmp_path):
+    path = str(tmp_path / "shows.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE shows (id INTEGER PRIMARY KEY, title TEXT NOT NULL, misc, rating NUMERIC, year INTEGER)")
+    connection.executemany("INSERT INTO shows VALUES (?, ?, ?, ?, ?)", [
+        (1, "Friends", 1, 8, 1994),
+        (2, "Seinfeld", "str", 9, 1989.5),
+        (3, "Frasier", 2.5, 7.5, 1993),
+        (4, "Cheers", None, None, None),
+    ])
+    connection.commit()
+    connection.close()
+    return path
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_import_mixed_types(sqlite_file, lazy):
+    db = sqlite_to_db(sqlite_file, lazy=lazy, fetch_size=2).timer("off")
+    table = db.get_table("shows")
+    types = {col: col_type["type"] for col, col_type in table.types.items()}
+    assert types == {"id": "int", "title": "str", "misc": None, "rating": "float", "year": "float"}
+    assert table.get_row(1) == {"id": 2, "title": "Seinfeld", "misc": "str", "rating": 9, "year": 1989.5}
+
+    rows = Query(db).SELECT("title").FROM("shows").WHERE("year > 1990").ORDER_BY("year").execute()
+    assert rows == [{"title": "Frasier"}, {"title": "Friends"}]
+
+@pytest.fixture
+def typed_file(tmp_path):
+    path = str(tmp_path / "typed.db")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE people (
+            id BIGINT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email TEXT UNIQUE,
+            height DOUBLE,
+            photo BLOB,
+            status TEXT DEFAULT 'active'
+        );
+        CREATE INDEX people_height ON people (height);
+        INSERT INTO people VALUES (1, 'John', 'j@example.com', 1.8, x'00ff', 'active');
+        INSERT INTO people VALUES (2, 'Jane', NULL, NULL, NULL, 'away');
+    """)
+    connection.close()
+    return path
+
+def test_import_constraints_and_indexes(typed_file):
+    table = sqlite_to_db(typed_file).get_table("people")
+    assert {col: col_type["type"] for col, col_type in table.types.items()} == {
+        "id": "int", "name": "str", "email": "str", "height": "float", "photo": "bytes", "status": "str",
+    }
+    assert table.types["id"]["unique"] and table.types["email"]["unique"]
+    assert not table.types["name"]["allows_null"]
+    assert table.types["status"]["default"] == "active"
+    assert table.get_index("height", "HASH").lookup(1.8) == [0]
+    assert table.get_row(0)["photo"] == b"\x00\xff"
+
+def test_lazy_import_waits_for_first_access(typed_file):
+    db = sqlite_to_db(typed_file, lazy=True)
+    assert "people" in db.pending_tables and "people" not in db.tables
+    assert list(db.get_tables()) == ["people"]
+    assert db.get_table("people").get_row_count() == 2
+    assert "people" not in db.pending_tables
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_import_closes_its_connections(typed_file, monkeypatch, lazy):
+    connections = []
+    connect = sqlite3.connect
+    def tracked_connect(*args, **kwargs):
+        connections.append(connect(*args, **kwargs))
+        return connections[-1]
+    monkeypatch.setattr(sqlito.utils.sqlite3, "connect", tracked_connect)
+
+    db = sqlite_to_db(typed_file, lazy=lazy)
+    # Lazy tables may be loaded from another thread
+    loader = threading.Thread(target=db.get_table, args=("people",))
+    loader.start()
+    loader.join()
+    assert db.tables["people"].get_row_count() == 2
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        sqlite_to_db(str(tmp_path / "missing.db"))
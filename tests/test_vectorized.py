@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from sqlito import Database, Query, Table
+from sqlito.query import AVG, COUNT, MAX, MIN, SUM
+
+@pytest.fixture
+def db():
+    table = Table("readings", [
+        {
+            "id": i,
+            "sensor": f"s{i % 7}",
+            "value": None if i % 11 == 0 else (i * 37) % 101,
+            "ratio": None if i % 13 == 0 else ((i * 17) % 29) / 4,
+        }
+        for i in range(1, 2001)
+    ])
+    return Database([table]).timer("off")
+
+def both(db, build):
+    # The result of the query run by each engine
+    interpreted = build(Query(db.engine("interpreted"))).execute()
+    vectorized = build(Query(db.engine("vectorized"))).execute()
+    return interpreted, vectorized
+
+CONDITIONS = [
+    lambda query: query.WHERE("value > 50"),
+    lambda query: query.WHERE("value <= 10").OR("ratio >= 6.5"),
+    lambda query: query.WHERE("value != 3"),
+    lambda query: query.WHERE("ratio").BETWEEN(1.5, 3),
+    lambda query: query.WHERE("value").IN([1, 2, 3, 50]),
+    lambda query: query.WHERE("value").IS_NULL(),
+    lambda query: query.WHERE("ratio").IS_NOT_NULL().AND("value < 20"),
+    # TEXT and LIKE conditions are left to the interpreted path
+    lambda query: query.WHERE("value > 50").AND("sensor = 's3'"),
+    lambda query: query.WHERE("sensor").LIKE("s1%").AND("ratio > 2"),
+]
+
+@pytest.mark.parametrize("where", CONDITIONS)
+def test_filters_match_interpreted(db, where):
+    interpreted, vectorized = both(db, lambda query: where(query.SELECT("id", "value", "ratio").FROM("readings")))
+    assert vectorized == interpreted
+
+@pytest.mark.parametrize("where", [lambda query: query] + CONDITIONS)
+def test_aggregates_match_interpreted(db, where):
+    interpreted, vectorized = both(db, lambda query: where(
+        query.SELECT(COUNT("*"), COUNT("value"), SUM("value"), AVG("ratio"), MIN("ratio"), MAX("value")).FROM("readings")
+    ))
+    assert vectorized == pytest.approx(interpreted)
+    assert type(vectorized["SUM(value)"]) is type(interpreted["SUM(value)"])
+    assert type(vectorized["MAX(value)"]) is type(interpreted["MAX(value)"])
+
+def test_vectorized_plan(db):
+    plan = Query(db.engine("vectorized")).SELECT("id").FROM("readings").WHERE("value > 50").AND("sensor = 's3'").explain()
+    assert plan.root.children[0].operator == "Filter"
+    assert plan.root.children[0].children[0].operator == "Vector Filter"
+
+def test_invalid_engine(db):
+    with pytest.raises(ValueError):
+        db.engine("gpu")
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+import pytest
+
+from sqlito import Database, Query
+import sqlito._wal as wal
+from sqlito._wal import INSERT, WAL_FILE, WriteAheadLog, read_records
+
+def names(db):
+    return [row["name"] for row in Query(db.timer("off")).SELECT("name").FROM("people").execute()]
+
+@pytest.fixture
+def path(tmp_path):
+    db = Database.open(str(tmp_path))
+    db.CREATE_TABLE("people").COLUMN("id", "INTEGER").PRIMARY_KEY().COLUMN("name", "TEXT").execute()
+    db.INSERT_INTO("people", ["id", "name"]).VALUES([1, "John"])
+    db.INSERT_INTO("people", ["id", "name"]).VALUES_MANY([[2, "Jane"], [3, "Alice"]])
+    # The database is never closed, as if the process had crashed
+    return str(tmp_path)
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / WAL_FILE)
+    log = WriteAheadLog(path)
+    assert log.commit((INSERT, "people", {"id": [1]})) == 1
+    assert log.commit((INSERT, "people", {"id": [2, None]})) == 2
+    log.close()
+    records, end = read_records(path)
+    assert records == [(1, (INSERT, "people", {"id": [1]})), (2, (INSERT, "people", {"id": [2, None]}))]
+    assert end == os.path.getsize(path)
+
+def test_torn_record_is_dropped(tmp_path):
+    path = str(tmp_path / WAL_FILE)
+    log = WriteAheadLog(path)
+    log.commit((INSERT, "people", {"id": [1]}))
+    log.commit((INSERT, "people", {"id": [2]}))
+    log.close()
+    size = os.path.getsize(path)
+    os.truncate(path, size - 1)
+    records, end = read_records(path)
+    assert [seq for seq, _ in records] == [1]
+
+    # Reopening the log drops the torn record before appending
+    log = WriteAheadLog(path, seq=1, end=end)
+    log.commit((INSERT, "people", {"id": [3]}))
+    log.close()
+    assert [record[2] for _, record in read_records(path)[0]] == [{"id": [1]}, {"id": [3]}]
+
+def test_replay_after_crash(path):
+    db = Database.open(path)
+    assert names(db) == ["John", "Jane", "Alice"]
+    # Constraints and their indexes are replayed too
+    with pytest.raises(ValueError, match="must be unique"):
+        db.INSERT_INTO("people", ["id", "name"]).VALUES([1, "Bob"])
+    db.CREATE_INDEX("people", "name").execute()
+    db.close()
+
+    db = Database.open(path)
+    assert db.get_table("people").get_index("name", "HASH").lookup("Jane") == [1]
+    db.drop_table(["people"])
+    db.close()
+    assert list(Database.open(path).get_tables()) == []
+
+def test_crash_mid_record_keeps_earlier_mutations(path):
+    wal = os.path.join(path, WAL_FILE)
+    os.truncate(wal, os.path.getsize(wal) - 3)
+    db = Database.open(path)
+    assert names(db) == ["John"]
+    db.INSERT_INTO("people", ["id", "name"]).VALUES([4, "Bob"])
+    assert names(Database.open(path)) == ["John", "Bob"]
+
+def test_checkpoint_empties_the_log(path):
+    db = Database.open(path)
+    db.checkpoint()
+    assert os.path.getsize(os.path.join(path, WAL_FILE)) == 0
+    db.INSERT_INTO("people", ["id", "name"]).VALUES([4, "Bob"])
+    # Only what came after the checkpoint is replayed on top of the files
+    assert names(Database.open(path)) == ["John", "Jane", "Alice", "Bob"]
+
+def test_checkpoint_once_the_log_is_large(tmp_path):
+    db = Database.open(str(tmp_path), checkpoint_bytes=1024)
+    db.CREATE_TABLE("people").COLUMN("id", "INTEGER").COLUMN("name", "TEXT").execute()
+    for i in range(100):
+        db.INSERT_INTO("people", ["id", "name"]).VALUES([i, f"name {i}"])
+    assert os.path.getsize(tmp_path / WAL_FILE) <= 1024
+    assert len(names(Database.open(str(tmp_path)))) == 100
+
+@pytest.mark.parametrize("sync", ["commit", "group", "interval"])
+def test_concurrent_commits_are_recovered(tmp_path, sync):
+    db = Database.open(str(tmp_path), sync=sync, interval_ms=5)
+    db.CREATE_TABLE("people").COLUMN("id", "INTEGER").COLUMN("name", "TEXT").execute()
+    def insert(start):
+        for i in range(start, start + 25):
+            db.INSERT_INTO("people", ["id", "name"]).VALUES([i, f"name {i}"])
+    threads = [threading.Thread(target=insert, args=(start,)) for start in range(0, 100, 25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.close()
+    assert sorted(names(Database.open(str(tmp_path)))) == sorted(f"name {i}" for i in range(100))
+
+def test_dropped_table_stays_dropped_after_save(tmp_path):
+    db = Database.open(str(tmp_path))
+    db.CREATE_TABLE("t").COLUMN("id", "INTEGER").execute()
+    db.INSERT_INTO("t", ["id"]).VALUES([1])
+    db.checkpoint()
+    db.delete_table("t")
+    db.save()
+    db.close()
+    assert list(Database.open(str(tmp_path)).get_tables()) == []
+
+def test_group_commit_shares_fsyncs(tmp_path, monkeypatch):
+    db = Database.open(str(tmp_path), sync="group")
+    db.CREATE_TABLE("people").COLUMN("id", "INTEGER").COLUMN("name", "TEXT").execute()
+
+    fsyncs = []
+    fsync = os.fsync
+    def slow_fsync(fd):
+        # As slow as a disk, so commits queue up behind each flush
+        fsyncs.append(fd)
+        time.sleep(0.001)
+        fsync(fd)
+    monkeypatch.setattr(wal.os, "fsync", slow_fsync)
+
+    def insert(start):
+        for i in range(start, start + 50):
+            db.INSERT_INTO("people", ["id", "name"]).VALUES([i, f"name {i}"])
+    threads = [threading.Thread(target=insert, args=(start,)) for start in range(0, 400, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.close()
+    assert len(fsyncs) < 400 / 2
+    assert len(names(Database.open(str(tmp_path)))) == 400
+
+def test_checkpoint_loses_no_concurrent_mutation(tmp_path):
+    db = Database.open(str(tmp_path), sync="group")
+    for name in ("a", "b"):
+        db.CREATE_TABLE(name).COLUMN("id", "INTEGER").execute()
+    done = threading.Event()
+
+    def insert(name):
+        for i in range(200):
+            db.INSERT_INTO(name, ["id"]).VALUES([i])
+    def checkpoint():
+        while not done.is_set():
+            db.checkpoint()
+    checkpointer = threading.Thread(target=checkpoint)
+    writers = [threading.Thread(target=insert, args=(name,)) for name in ("a", "b")]
+    checkpointer.start()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    checkpointer.join()
+
+    lsn = db.lsn
+    # Abandoned without closing, as if the process had crashed
+    opened = Database.open(str(tmp_path))
+    for name in ("a", "b"):
+        assert list(opened.get_table(name).get_column("id")) == list(range(200))
+    assert opened.lsn == lsn
+
+def test_invalid_sync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        Database.open(str(tmp_path), sync="never")